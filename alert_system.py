@@ -1,38 +1,234 @@
-import requests
 import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+import requests
+from providers.http import get_session
+from file_lock import locked
+from profiling import timed
+
+CRITICAL_FLAGS = [
+    "SCENARIO_2_FLUSH_FAVORED",
+    "SCENARIO_3_BREAKDOWN_RISK",
+    "SCENARIO_4_BREAKOUT_POTENTIAL",
+    "LIQUIDATION_PULSE_DETECTED"
+]
+# Discord rejects messages longer than this; batches are split to fit
+MAX_MESSAGE_CHARS = 2000
 
 class AlertSystem:
-    def __init__(self, webhook_url=None):
+    """
+    Critical scenario alerts, printed at once and delivered to an optional
+    webhook by a background thread, so a slow or hung endpoint never blocks
+    the monitor:
+    - per-(symbol, flag) cooldown: a flag alerts again for the same symbol
+      only `cooldown` seconds after it was last delivered (kept in
+      `state_path` across runs when given); an alert that is dropped or
+      still queued at exit does not start the cooldown
+    - alerts arriving within `batch_window` seconds are coalesced into one post
+    - posts use the pooled session with a timeout; connection errors, 429 and
+      5xx are retried with exponential backoff (Retry-After honoured), other
+      4xx are dropped
+    Call flush() before exiting to let queued alerts go out.
+    """
+    def __init__(self, webhook_url=None, symbol: Optional[str] = None, cooldown: float = 3600.0,
+                 state_path: Optional[str] = None,
+                 batch_window: float = 2.0, max_batch: int = 20, timeout: float = 5.0, max_retries: int = 4,
+                 backoff: float = 1.0, payload_key: str = "content", session: Optional[requests.Session] = None):
         self.webhook_url = webhook_url
+        self.symbol = symbol
+        self.cooldown = cooldown
+        self.state_path = state_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.payload_key = payload_key  # "content" for Discord, "text" for Slack
+        self.session = session or get_session()
+        self.stats = {"alerts": 0, "suppressed": 0, "posts": 0, "retries": 0, "dropped": 0}
+        # Delivered alerts (persisted) and those also counting queued ones (in memory)
+        self._delivered: Dict[str, float] = self._load_state()
+        self._last_alert: Dict[str, float] = dict(self._delivered)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
 
+    @timed()
     def check_and_alert(self, scenario_result: dict):
         """
         Check flags and send alert if critical.
+        Flags still in their cooldown are left out; returns True if an alert went out.
         """
         flags = scenario_result.get("scenario_flags", [])
         liq_pulse = scenario_result.get("liquidation_pulse", "NORMAL")
-        
-        critical_flags = [
-            "SCENARIO_2_FLUSH_FAVORED", 
-            "SCENARIO_3_BREAKDOWN_RISK",
-            "SCENARIO_4_BREAKOUT_POTENTIAL",
-            "LIQUIDATION_PULSE_DETECTED"
-        ]
-        
-        triggered = [f for f in flags if f in critical_flags]
+
+        triggered = [f for f in flags if f in CRITICAL_FLAGS]
         if liq_pulse != "NORMAL":
             triggered.append(f"LIQ_PULSE_{liq_pulse}")
-            
-        if triggered:
-            msg = f"🚨 ALERT: {', '.join(triggered)} @ {scenario_result.get('price')}"
-            self._send(msg)
-            return True
-        return False
+        if not triggered:
+            return False
+
+        now = time.time()
+        with self._idle:
+            fresh = [f for f in triggered if now - self._last_alert.get(self._key(f), float("-inf")) >= self.cooldown]
+            self.stats["suppressed"] += len(triggered) - len(fresh)
+            if not fresh:
+                return False
+            keys = [self._key(f) for f in fresh]
+            for key in keys:
+                self._last_alert[key] = now
 
-    def _send(self, message):
+        where = f" {self.symbol}" if self.symbol else ""
+        msg = f"🚨 ALERT{where}: {', '.join(fresh)} @ {scenario_result.get('price')}"
+        self._send(msg, keys, now)
+        return True
+
+    def _key(self, flag: str) -> str:
+        return f"{self.symbol}:{flag}" if self.symbol else flag
+
+    def _send(self, message, keys: List[str], ts: float):
         print(f"\n[ALERT SYSTEM] {message}\n")
-        if self.webhook_url:
+        self.stats["alerts"] += 1
+        if not self.webhook_url:
+            # Printing is the delivery
+            self._settle([(message, keys, ts)], True)
+            return
+        with self._idle:
+            self._pending += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._queue.put((message, keys, ts))
+
+    def _settle(self, items: List[tuple], delivered: bool):
+        """
+        Start the cooldowns of delivered alerts (and persist them); undo the
+        provisional cooldowns of failed ones so the next evaluation retries.
+        """
+        with self._idle:
+            for _, keys, ts in items:
+                for key in keys:
+                    if delivered:
+                        self._delivered[key] = max(ts, self._delivered.get(key, ts))
+                    elif self._last_alert.get(key) == ts:
+                        if key in self._delivered:
+                            self._last_alert[key] = self._delivered[key]
+                        else:
+                            del self._last_alert[key]
+            if delivered:
+                self._save_state()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued alert was delivered or given up on.
+        Returns False if `timeout` ran out first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Coalesce whatever else arrives within the batch window
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # An unexpected error costs one post, never the worker or a waiting flush()
+            try:
+                messages = [message for message, _, _ in batch]
+                for group in _group(messages, MAX_MESSAGE_CHARS):
+                    content = "\n".join(messages[i][:MAX_MESSAGE_CHARS] for i in group)
+                    delivered = False
+                    try:
+                        delivered = self._deliver(content)
+                    except Exception as e:
+                        print(f"Failed to send webhook: {e}")
+                        self.stats["dropped"] += 1
+                    try:
+                        self._settle([batch[i] for i in group], delivered)
+                    except Exception as e:
+                        print(f"Could not record alert delivery: {e}")
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    @timed("AlertSystem.deliver")
+    def _deliver(self, content: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt
             try:
-                requests.post(self.webhook_url, json={"content": message})
-            except Exception as e:
+                response = self.session.post(self.webhook_url, json={self.payload_key: content}, timeout=self.timeout)
+                if response.status_code < 400:
+                    self.stats["posts"] += 1
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"Webhook rejected alert (HTTP {response.status_code}); dropping it")
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.replace(".", "", 1).isdigit():
+                    delay = float(retry_after)
+            except requests.RequestException as e:
                 print(f"Failed to send webhook: {e}")
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                time.sleep(delay)
+        self.stats["dropped"] += 1
+        return False
+
+    def _load_state(self) -> Dict[str, float]:
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return {flag: float(ts) for flag, ts in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_state(self):
+        # Monitors for other symbols share the file: merge with what they saved meanwhile
+        if not self.state_path:
+            return
+        try:
+            with locked(self.state_path):
+                stored = self._load_state()
+                for key, ts in stored.items():
+                    self._delivered[key] = max(ts, self._delivered.get(key, ts))
+                tmp_path = self.state_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self._delivered, f)
+                os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not persist alert cooldowns to {self.state_path}: {e}")
+
+def coalesce(messages: List[str], max_chars: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """
+    Join messages line by line into as few posts as fit in max_chars each.
+    """
+    return ["\n".join(messages[i][:max_chars] for i in group) for group in _group(messages, max_chars)]
+
+def _group(messages: List[str], max_chars: int) -> List[List[int]]:
+    """
+    Message indices per post, in order; each post's lines (messages cut to
+    max_chars) fit in max_chars.
+    """
+    groups, length = [], 0
+    for i, message in enumerate(messages):
+        size = min(len(message), max_chars)
+        if groups and length + 1 + size <= max_chars:
+            groups[-1].append(i)
+            length += 1 + size
+        else:
+            groups.append([i])
+            length = size
+    return groups
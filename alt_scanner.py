@@ -1,14 +1,27 @@
 import pandas as pd
+from typing import Dict, Optional
 from providers.market_data import MarketDataProvider
+from profiling import timed
+
+DEFAULT_WATCHLIST = ["ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", "ADAUSDT", "DOGEUSDT", "AVAXUSDT"]
 
 class AltScanner:
-    def __init__(self):
-        self.provider = MarketDataProvider()
-        self.watchlist = ["ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", "ADAUSDT", "DOGEUSDT", "AVAXUSDT"]
+    def __init__(self, watchlist=None, provider=None):
+        self.provider = provider or MarketDataProvider()
+        self.watchlist = list(watchlist) if watchlist else list(DEFAULT_WATCHLIST)
 
-    def scan_rotation(self, btc_df: pd.DataFrame) -> pd.DataFrame:
+    def fetch_alts(self) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch every alt concurrently over the pooled session;
+        just enough data (48h) for the 24h comparison.
+        """
+        return self.provider.fetch_ohlcv_batch(self.watchlist, interval="1h", limit=48)
+
+    @timed()
+    def scan_rotation(self, btc_df: pd.DataFrame, alt_frames: Optional[Dict[str, pd.DataFrame]] = None) -> pd.DataFrame:
         """
         Compare alts to BTC performance over last 24h.
+        Pass alt_frames (from fetch_alts) to reuse already fetched candles.
         Returns DataFrame with columns: [symbol, pct_change_24h, rel_strength_btc]
         """
         if btc_df.empty:
@@ -20,12 +33,9 @@ class AltScanner:
         
         results = []
         
-        for symbol in self.watchlist:
-            # We need to fetch data for each alt. 
-            # In a real app, we'd cache this or fetch in parallel.
-            # For this CLI tool, sequential fetch is acceptable but slow.
-            # We'll fetch just enough data (e.g. 48h) to be fast.
-            df = self.provider.fetch_ohlcv(symbol, interval="1h", limit=48)
+        if alt_frames is None:
+            alt_frames = self.fetch_alts()
+        for symbol, df in alt_frames.items():
             if df.empty:
                 continue
                 
@@ -42,4 +52,6 @@ class AltScanner:
                 "rel_strength_btc": rel_strength
             })
             
+        if not results:
+            return pd.DataFrame()
         return pd.DataFrame(results).sort_values("rel_strength_btc", ascending=False)
@@ -1,6 +1,12 @@
+import math
+from typing import Dict
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from rolling_quantile import expanding_rank, quantile_mask, rolling_rank
+from profiling import timed
 
+@timed()
 def compute_indicators(df, bb_window=20, bb_std_multiplier=2, atr_window=14):
     """
     Compute Bollinger Bands and ATR for the dataframe.
@@ -9,54 +15,124 @@ def compute_indicators(df, bb_window=20, bb_std_multiplier=2, atr_window=14):
     # Middle band — simple moving average (SMA)
     df['bb_mid'] = df['close'].rolling(window=bb_window).mean()
     df['bb_std'] = df['close'].rolling(window=bb_window).std(ddof=0)  # population std-dev
+    set_band_multiplier(df, bb_std_multiplier)
+
+    compute_atr(df, atr_window)
+
+    return df
+
+def compute_atr(df, atr_window=14):
+    """
+    Compute ATR (rolling mean of True Range) into df['atr'].
+    True Range is built on NumPy arrays, so no temporary columns are added to df.
+    """
+    true_range = _true_range(df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64),
+                             df['close'].to_numpy(dtype=np.float64))
+
+    # ATR: rolling mean
+    df['atr'] = pd.Series(true_range, index=df.index).rolling(window=atr_window).mean()
+
+    return df
+
+def _true_range(high, low, close):
+    """
+    TR = max(high - low, |high - prev_close|, |low - prev_close|), NaNs skipped.
+    """
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def set_band_multiplier(df, bb_std_multiplier=2):
+    """
+    (Re)derive 'bb_upper', 'bb_lower', 'bb_bandwidth' from 'bb_mid'/'bb_std'.
+    Lets callers try several multipliers without recomputing the rolling stats.
+    """
     df['bb_upper'] = df['bb_mid'] + bb_std_multiplier * df['bb_std']
     df['bb_lower'] = df['bb_mid'] - bb_std_multiplier * df['bb_std']
 
     # Bandwidth (normalized width)
     # Handle division by zero if close is 0 (unlikely for BTC but good practice)
     df['bb_bandwidth'] = (df['bb_upper'] - df['bb_lower']) / df['bb_mid'].replace(0, np.nan)
-
-    # True Range (TR) for ATR
-    df['prev_close'] = df['close'].shift(1)
-    df['tr1'] = df['high'] - df['low']
-    df['tr2'] = (df['high'] - df['prev_close']).abs()
-    df['tr3'] = (df['low']  - df['prev_close']).abs()
-    df['true_range'] = df[['tr1','tr2','tr3']].max(axis=1)
-
-    # ATR: rolling mean
-    df['atr'] = df['true_range'].rolling(window=atr_window).mean()
-    
-    # Cleanup intermediate columns
-    df.drop(columns=['prev_close', 'tr1', 'tr2', 'tr3', 'true_range'], inplace=True)
-
     return df
 
-def identify_squeeze_periods(df, bandwidth_threshold_quantile=0.10, atr_threshold_quantile=0.10):
+def threshold_ranks(values, threshold_mode="rolling", threshold_window=720):
+    """
+    (less, valid) rank arrays used for look-ahead-free quantile thresholds.
+    Independent of the quantile level, so one pass serves any number of levels.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if threshold_mode == "rolling":
+        return rolling_rank(values, threshold_window)
+    if threshold_mode == "expanding":
+        return expanding_rank(values)
+    raise ValueError(f"Unknown threshold_mode: {threshold_mode}")
+
+@timed()
+def identify_squeeze_periods(df, bandwidth_threshold_quantile=0.10, atr_threshold_quantile=0.10,
+                             threshold_mode="global", threshold_window=720, min_periods=None, ranks=None):
     """
     Identify periods (bars) where both BB-bandwidth and ATR are 'low' — i.e. potential squeeze zones.
+    threshold_mode:
+      "global"    — quantiles over the entire loaded history (has look-ahead bias)
+      "rolling"   — quantiles over the trailing `threshold_window` bars
+      "expanding" — quantiles over all bars up to and including the current one
+    Rolling/expanding thresholds need `min_periods` valid values (default:
+    threshold_window). `ranks` maps 'bb_bandwidth'/'atr' to precomputed
+    threshold_ranks() output, e.g. shared across a quantile sweep.
     """
+    if threshold_mode != "global":
+        min_periods = threshold_window if min_periods is None else min_periods
+        ranks = ranks or {}
+        masks = []
+        for col, q in (('bb_bandwidth', bandwidth_threshold_quantile), ('atr', atr_threshold_quantile)):
+            less, valid = ranks.get(col) or threshold_ranks(df[col], threshold_mode, threshold_window)
+            masks.append(quantile_mask(df[col].to_numpy(dtype=np.float64), less, valid, q, min_periods))
+        return mark_squeezes(df, pd.Series(masks[0] & masks[1], index=df.index))
+
     # compute quantile thresholds over the entire loaded history
-    # NOTE: In a live system, you'd use a rolling quantile to avoid look-ahead bias.
-    # For a static backtest of "historical behavior", global quantiles are often acceptable 
-    # to define "what is low for this asset", but rolling is more robust.
-    # Let's stick to global for simplicity as per pseudocode, but add a comment.
-    
+    # For a static backtest of "historical behavior", global quantiles are often acceptable
+    # to define "what is low for this asset"; use threshold_mode="rolling" to avoid look-ahead bias.
     bw_thresh = df['bb_bandwidth'].quantile(bandwidth_threshold_quantile)
     atr_thresh = df['atr'].quantile(atr_threshold_quantile)
 
     # mask for squeeze
     squeeze_mask = (df['bb_bandwidth'] <= bw_thresh) & (df['atr'] <= atr_thresh)
+    return mark_squeezes(df, squeeze_mask)
 
-    df['squeeze'] = squeeze_mask
+def mark_squeezes(df, squeeze_mask):
+    """
+    Set 'squeeze', 'squeeze_start' and 'squeeze_end' from a boolean mask.
+    """
+    squeeze = np.asarray(squeeze_mask, dtype=bool)
+    prev = np.zeros_like(squeeze)
+    prev[1:] = squeeze[:-1]
+    df['squeeze'] = squeeze
 
     # Mark “start of squeeze” (False -> True)
-    df['squeeze_start'] = (~df['squeeze'].shift(1).fillna(False)) & (df['squeeze'])
-    
+    df['squeeze_start'] = ~prev & squeeze
+
     # Mark "end of squeeze" (True -> False) - this is often when the breakout happens
-    df['squeeze_end'] = (df['squeeze'].shift(1).fillna(False)) & (~df['squeeze'])
+    df['squeeze_end'] = prev & ~squeeze
 
     return df
 
+def _extrema_tables(high, low, max_len):
+    """
+    Build sparse tables of running max(high) / min(low) over power-of-two spans.
+    Level k holds the extremum of values[i : i + 2**k], so any window of length
+    L <= max_len is answered in O(1) by overlapping two level-floor(log2(L)) spans.
+    NaNs are skipped (fmax/fmin), matching pandas' max()/min().
+    """
+    highs = [high]
+    lows = [low]
+    k = 1
+    while (1 << k) <= max_len and (1 << k) <= len(high):
+        half = 1 << (k - 1)
+        highs.append(np.fmax(highs[-1][:-half], highs[-1][half:]))
+        lows.append(np.fmin(lows[-1][:-half], lows[-1][half:]))
+        k += 1
+    return highs, lows
+
+@timed()
 def run_breakout_tests(df, hold_periods=[1, 4, 12, 24, 168]):
     """
     For every squeeze_end event (breakout point), measure what happens over next N periods.
@@ -70,106 +146,129 @@ def run_breakout_tests(df, hold_periods=[1, 4, 12, 24, 168]):
     User said: "measure subsequent price move... after squeeze".
     Squeeze start = entering low vol. Squeeze end = leaving low vol (breakout).
     I will use SQUEEZE END as the trigger for the "breakout" analysis.
+
+    Fully array-based: squeeze runs are located with np.flatnonzero on the
+    mask edges, and forward max/min excursions per hold period are O(1)
+    sparse-table lookups, so cost no longer scales with squeezes x horizons.
     """
-    results = []
-    
-    # Iterate through points where the squeeze ENDS (volatility expands)
-    # We can also check for price breaking the bands here.
-    
-    # Let's refine the trigger:
-    # A "Breakout" is often defined as Close > Upper Band OR Close < Lower Band.
-    # We can check if this happens *during* or *immediately after* a squeeze.
-    
-    # For this implementation, let's look at every 'squeeze' period, and find the first bar 
-    # where price closes outside the bands.
-    
     # Identify squeeze regions
     df['squeeze_id'] = (df['squeeze'] != df['squeeze'].shift()).cumsum()
-    squeeze_groups = df[df['squeeze']].groupby('squeeze_id')
-    
-    for squeeze_id, group in squeeze_groups:
-        if group.empty:
-            continue
-            
-        # The squeeze period
-        start_time = group.index[0]
-        end_time = group.index[-1]
-        
-        # Look for breakout in the next X bars after squeeze ends? 
-        # Or did it break out *during* the squeeze (thus ending it)?
-        # Usually, the squeeze ends *because* the bands expand, often due to a price move.
-        
-        # Let's look at the bar immediately following the squeeze end.
-        # This is the first bar where Bandwidth > Threshold OR ATR > Threshold.
-        
-        # Find the index location of the last bar of the squeeze
-        try:
-            last_idx_loc = df.index.get_loc(end_time)
-        except KeyError:
-            continue
-            
-        # The "breakout candle" is often considered the one that expanded the bands.
-        # Let's start measuring from the close of the last squeeze bar (entry point) 
-        # or the close of the first non-squeeze bar.
-        # Let's use the close of the last squeeze bar as the "reference price".
-        
-        ref_price = group.iloc[-1]['close']
-        ref_time = group.index[-1]
-        
-        # Check direction of breakout (did we close above upper or below lower?)
-        # We check the NEXT candle (the one that broke the squeeze)
-        if last_idx_loc + 1 >= len(df):
+
+    last_locs, durations = _squeeze_runs(df['squeeze'].to_numpy(dtype=bool))
+    if len(last_locs) == 0:
+        return pd.DataFrame()
+    bb_upper = df['bb_upper'].to_numpy(dtype=np.float64)
+    bb_lower = df['bb_lower'].to_numpy(dtype=np.float64)
+    return _breakout_frame(df.index, df['close'].to_numpy(dtype=np.float64), df['high'].to_numpy(dtype=np.float64),
+                           df['low'].to_numpy(dtype=np.float64), last_locs, durations,
+                           bb_upper[last_locs], bb_lower[last_locs], hold_periods)
+
+def _squeeze_runs(squeeze):
+    """
+    (last_locs, durations) of every squeeze run that is followed by a bar.
+    """
+    n = len(squeeze)
+    if n == 0 or not squeeze.any():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Run boundaries: a run starts where the previous bar is not in a squeeze
+    # and ends (last squeeze bar) where the next bar is not in a squeeze.
+    padded = np.concatenate(([False], squeeze, [False]))
+    edges = np.diff(padded.astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    last_locs = np.flatnonzero(edges == -1) - 1
+    durations = last_locs - starts + 1
+
+    # The breakout candle is the first bar after the squeeze; drop runs that end on the last bar.
+    keep = last_locs + 1 < n
+    return last_locs[keep], durations[keep]
+
+def _window_extrema(high, low, starts, length, chunk=8192):
+    """
+    max(high) / min(low) over [start, start + length) for each start, gathered
+    at the event rows only: O(events x length) work, O(chunk x length) memory.
+    """
+    offsets = np.arange(length)
+    max_high = np.empty(len(starts))
+    min_low = np.empty(len(starts))
+    for i in range(0, len(starts), chunk):
+        idx = starts[i:i + chunk, None] + offsets
+        max_high[i:i + chunk] = np.fmax.reduce(high[idx], axis=1)
+        min_low[i:i + chunk] = np.fmin.reduce(low[idx], axis=1)
+    return max_high, min_low
+
+def _breakout_frame(index, close, high, low, last_locs, durations, upper_ref, lower_ref, hold_periods,
+                    sparse_tables=True):
+    """
+    Breakout result rows for squeeze runs ending at last_locs, with the bands
+    of their last bars. Forward extrema come from sparse tables (fast, ~2 x
+    log2(max hold) arrays of n) or, with sparse_tables=False, are gathered per
+    event (memory independent of n).
+    """
+    n = len(close)
+    breakout_locs = last_locs + 1
+
+    # Reference = close of the last squeeze bar; direction is judged against its (tight) bands.
+    ref_price = close[last_locs]
+    breakout_close = close[breakout_locs]
+    direction = np.where(
+        breakout_close > upper_ref, 'up',
+        np.where(breakout_close < lower_ref, 'down', 'expansion')
+    )
+
+    hold = np.asarray(hold_periods, dtype=np.int64)
+    if len(hold) == 0:
+        return pd.DataFrame()
+    if sparse_tables:
+        highs, lows = _extrema_tables(high, low, int(hold.max()) + 1)
+
+    n_events, n_hold = len(last_locs), len(hold)
+    pct_change = np.full((n_events, n_hold), np.nan)
+    max_up = np.full((n_events, n_hold), np.nan)
+    max_down = np.full((n_events, n_hold), np.nan)
+    valid = np.zeros((n_events, n_hold), dtype=bool)
+
+    for j, h in enumerate(hold):
+        end_locs = breakout_locs + h
+        ok = end_locs < n
+        valid[:, j] = ok
+        if not ok.any():
             continue
-            
-        breakout_candle = df.iloc[last_idx_loc + 1]
-        
-        # Simple direction check: compare breakout close to squeeze average close
-        # or check against bands of the *previous* bar (the tight bands)
-        prev_upper = group.iloc[-1]['bb_upper']
-        prev_lower = group.iloc[-1]['bb_lower']
-        
-        direction = 'neutral'
-        if breakout_candle['close'] > prev_upper:
-            direction = 'up'
-        elif breakout_candle['close'] < prev_lower:
-            direction = 'down'
+        s = breakout_locs[ok]
+        e = end_locs[ok]
+        ref = ref_price[ok]
+
+        # Window is [breakout, breakout + h] inclusive -> length h + 1
+        length = int(h) + 1
+        if sparse_tables:
+            k = length.bit_length() - 1
+            span = 1 << k
+            max_high = np.fmax(highs[k][s], highs[k][e - span + 1])
+            min_low = np.fmin(lows[k][s], lows[k][e - span + 1])
         else:
-            # Volatility expanded but price didn't break bands? 
-            # Could be just ATR expansion without directional move yet.
-            # We'll label it 'expansion'
-            direction = 'expansion'
-
-        for h in hold_periods:
-            end_loc = last_idx_loc + 1 + h
-            if end_loc >= len(df):
-                continue
-                
-            end_candle = df.iloc[end_loc]
-            end_price = end_candle['close']
-            
-            pct_change = (end_price - ref_price) / ref_price * 100
-            
-            # Max excursion
-            period_slice = df.iloc[last_idx_loc+1 : end_loc+1]
-            max_high = period_slice['high'].max()
-            min_low = period_slice['low'].min()
-            
-            max_up = (max_high - ref_price) / ref_price * 100
-            max_down = (min_low - ref_price) / ref_price * 100
-            
-            results.append({
-                'squeeze_end_time': ref_time,
-                'breakout_time': breakout_candle.name,
-                'direction': direction,
-                'hold_period': h,
-                'pct_change': pct_change,
-                'max_up_pct': max_up,
-                'max_down_pct': max_down,
-                'squeeze_duration': len(group)
-            })
-
-    return pd.DataFrame(results)
+            max_high, min_low = _window_extrema(high, low, s, length)
+
+        pct_change[ok, j] = (close[e] - ref) / ref * 100
+        max_up[ok, j] = (max_high - ref) / ref * 100
+        max_down[ok, j] = (min_low - ref) / ref * 100
 
+    if not valid.any():
+        return pd.DataFrame()
+
+    # Flatten event-major so rows keep the (squeeze, hold_period) order of the original loop.
+    event_idx, hold_idx = np.nonzero(valid)
+    return pd.DataFrame({
+        'squeeze_end_time': index[last_locs[event_idx]],
+        'breakout_time': index[breakout_locs[event_idx]],
+        'direction': direction[event_idx].astype(object),
+        'hold_period': hold[hold_idx],
+        'pct_change': pct_change[event_idx, hold_idx],
+        'max_up_pct': max_up[event_idx, hold_idx],
+        'max_down_pct': max_down[event_idx, hold_idx],
+        'squeeze_duration': durations[event_idx],
+    })
+
+@timed()
 def summarize_results(results_df):
     """
     Compute statistics of breakout outcomes.
@@ -187,3 +286,248 @@ def summarize_results(results_df):
     # Flatten columns
     summary.columns = ['_'.join(col).strip() for col in summary.columns.values]
     return summary
+
+class CompactSqueezeFrame:
+    """
+    Opt-in low-memory alternative to compute_indicators ->
+    identify_squeeze_periods -> run_breakout_tests for very long histories:
+    - the input frame is never modified; OHLC arrays are read in place
+    - only bb_mid, bb_std and atr are stored, as float32
+    - bb_upper / bb_lower / bb_bandwidth are derived on demand, never stored
+    - the squeeze mask is bit-packed (1 bit per bar); squeeze_start/end/id
+      are derived from it when asked for
+    - breakout excursions are gathered per event instead of sparse tables
+    float32 bands can flip the squeeze/direction call for bars within ~1e-7
+    of a threshold; everything else matches the default path.
+    """
+    @timed("CompactSqueezeFrame.compute_indicators")
+    def __init__(self, df, bb_window=20, bb_std_multiplier=2, atr_window=14):
+        self.index = df.index
+        self.n = len(df)
+        self.open = df['open'].to_numpy(dtype=np.float64)
+        self.close = df['close'].to_numpy(dtype=np.float64)
+        self.high = df['high'].to_numpy(dtype=np.float64)
+        self.low = df['low'].to_numpy(dtype=np.float64)
+        self.bb_std_multiplier = bb_std_multiplier
+
+        close = pd.Series(self.close)
+        self.bb_mid = close.rolling(window=bb_window).mean().to_numpy(dtype=np.float32)
+        self.bb_std = close.rolling(window=bb_window).std(ddof=0).to_numpy(dtype=np.float32)
+        true_range = _true_range(self.high, self.low, self.close)
+        self.atr = pd.Series(true_range).rolling(window=atr_window).mean().to_numpy(dtype=np.float32)
+        self._squeeze_bits = None
+
+    def bb_upper(self, locs=slice(None)):
+        return self.bb_mid[locs].astype(np.float64) + self.bb_std_multiplier * self.bb_std[locs]
+
+    def bb_lower(self, locs=slice(None)):
+        return self.bb_mid[locs].astype(np.float64) - self.bb_std_multiplier * self.bb_std[locs]
+
+    def bb_bandwidth(self, locs=slice(None)):
+        mid = self.bb_mid[locs].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(mid != 0, 2 * self.bb_std_multiplier * self.bb_std[locs] / mid, np.nan)
+
+    @timed()
+    def identify_squeeze_periods(self, bandwidth_threshold_quantile=0.10, atr_threshold_quantile=0.10,
+                                 threshold_mode="global", threshold_window=720, min_periods=None):
+        """
+        Same thresholds as identify_squeeze_periods; stores only the packed mask.
+        """
+        mask = np.ones(self.n, dtype=bool)
+        for values, q in ((self.bb_bandwidth(), bandwidth_threshold_quantile),
+                          (self.atr.astype(np.float64), atr_threshold_quantile)):
+            if threshold_mode == "global":
+                mask &= values <= pd.Series(values).quantile(q)
+            else:
+                less, valid = threshold_ranks(values, threshold_mode, threshold_window)
+                periods = threshold_window if min_periods is None else min_periods
+                mask &= quantile_mask(values, less, valid, q, periods)
+            del values
+        self._squeeze_bits = np.packbits(mask)
+        return self
+
+    @property
+    def squeeze(self):
+        if self._squeeze_bits is None:
+            raise ValueError("Call identify_squeeze_periods() first")
+        return np.unpackbits(self._squeeze_bits, count=self.n).astype(bool)
+
+    @property
+    def squeeze_start(self):
+        squeeze = self.squeeze
+        return squeeze & ~np.concatenate(([False], squeeze[:-1]))
+
+    @property
+    def squeeze_end(self):
+        squeeze = self.squeeze
+        return ~squeeze & np.concatenate(([False], squeeze[:-1]))
+
+    @property
+    def squeeze_id(self):
+        squeeze = self.squeeze
+        return np.cumsum(np.concatenate(([True], squeeze[1:] != squeeze[:-1])))
+
+    @timed()
+    def run_breakout_tests(self, hold_periods=[1, 4, 12, 24, 168]):
+        last_locs, durations = _squeeze_runs(self.squeeze)
+        if len(last_locs) == 0:
+            return pd.DataFrame()
+        return _breakout_frame(self.index, self.close, self.high, self.low, last_locs, durations,
+                               self.bb_upper(last_locs), self.bb_lower(last_locs), hold_periods,
+                               sparse_tables=False)
+
+    def nbytes(self):
+        """
+        Bytes held beyond the caller's frame.
+        """
+        bits = self._squeeze_bits.nbytes if self._squeeze_bits is not None else 0
+        return self.bb_mid.nbytes + self.bb_std.nbytes + self.atr.nbytes + bits
+
+class _RollingWindow:
+    """
+    Fixed-size window with O(1) push and mean / population std, using
+    sums of (x - shift) and (x - shift)**2 so large prices don't cancel out.
+    The sums are rebuilt from the buffer every `resync_every` pushes to stop
+    floating-point drift. Any NaN in the window makes mean/std NaN (as pandas
+    rolling with min_periods=window).
+    """
+    def __init__(self, size, resync_every=10_000):
+        self.size = size
+        self.resync_every = resync_every
+        self.values = np.full(size, np.nan)
+        self.pos = 0
+        self.nans = size
+        self.shift = float("nan")
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._pushes = 0
+
+    def push(self, x):
+        old = self.values[self.pos]
+        if math.isnan(old):
+            self.nans -= 1
+        else:
+            d = old - self.shift
+            self.sum -= d
+            self.sumsq -= d * d
+
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            if math.isnan(self.shift):
+                self.shift = x
+            d = x - self.shift
+            self.sum += d
+            self.sumsq += d * d
+
+        self._pushes += 1
+        if self._pushes % self.resync_every == 0:
+            self._resync()
+
+    def mean(self):
+        if self.nans:
+            return float("nan")
+        return self.shift + self.sum / self.size
+
+    def std(self):
+        if self.nans:
+            return float("nan")
+        m = self.sum / self.size
+        return math.sqrt(max(self.sumsq / self.size - m * m, 0.0))
+
+    def ordered(self):
+        return np.concatenate([self.values[self.pos:], self.values[:self.pos]])
+
+    def extend(self, xs, chunk=65_536):
+        """
+        Push a micro-batch; returns (means, stds) for every pushed value,
+        computed with vectorized sliding windows instead of per-value pushes.
+        """
+        ext = np.concatenate([self.ordered()[1:], np.asarray(xs, dtype=np.float64)])
+        n = len(ext) - self.size + 1
+        means = np.empty(n)
+        stds = np.empty(n)
+        # Chunked so the (n, size) temporaries of std stay bounded
+        for start in range(0, n, chunk):
+            view = sliding_window_view(ext[start:start + chunk + self.size - 1], self.size)
+            means[start:start + len(view)] = view.mean(axis=1)
+            stds[start:start + len(view)] = view.std(axis=1)
+
+        self.values = ext[-self.size:].copy()
+        self.pos = 0
+        self._resync()
+        return means, stds
+
+    def _resync(self):
+        valid = self.values[~np.isnan(self.values)]
+        self.nans = self.size - len(valid)
+        if len(valid):
+            self.shift = float(valid[-1])
+            d = valid - self.shift
+            self.sum = float(d.sum())
+            self.sumsq = float((d * d).sum())
+        else:
+            self.shift = float("nan")
+            self.sum = self.sumsq = 0.0
+
+class IndicatorStream:
+    """
+    Stateful Bollinger Bands + ATR matching compute_indicators, updated one bar
+    at a time (update, O(1)) or in micro-batches (update_batch, vectorized).
+    Returns the same quantities compute_indicators adds as columns:
+    'bb_mid', 'bb_std', 'bb_upper', 'bb_lower', 'bb_bandwidth', 'atr'.
+    """
+    def __init__(self, bb_window=20, bb_std_multiplier=2, atr_window=14, resync_every=10_000):
+        self.bb_std_multiplier = bb_std_multiplier
+        self._close = _RollingWindow(bb_window, resync_every)
+        self._tr = _RollingWindow(atr_window, resync_every)
+        self._prev_close = float("nan")
+
+    def update(self, high, low, close) -> Dict[str, float]:
+        prev = self._prev_close
+        true_range = float(np.fmax(high - low, np.fmax(abs(high - prev), abs(low - prev))))
+        self._prev_close = close
+        self._close.push(close)
+        self._tr.push(true_range)
+
+        mid = self._close.mean()
+        std = self._close.std()
+        upper = mid + self.bb_std_multiplier * std
+        lower = mid - self.bb_std_multiplier * std
+        return {
+            'bb_mid': mid,
+            'bb_std': std,
+            'bb_upper': upper,
+            'bb_lower': lower,
+            'bb_bandwidth': (upper - lower) / mid if mid != 0 else float("nan"),
+            'atr': self._tr.mean(),
+        }
+
+    def update_batch(self, high, low, close) -> Dict[str, np.ndarray]:
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        close = np.asarray(close, dtype=np.float64)
+        if len(close) == 0:
+            return {col: np.empty(0) for col in ('bb_mid', 'bb_std', 'bb_upper', 'bb_lower', 'bb_bandwidth', 'atr')}
+
+        prev_close = np.concatenate(([self._prev_close], close[:-1]))
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        self._prev_close = float(close[-1])
+
+        mid, std = self._close.extend(close)
+        atr, _ = self._tr.extend(true_range)
+        upper = mid + self.bb_std_multiplier * std
+        lower = mid - self.bb_std_multiplier * std
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bandwidth = np.where(mid != 0, (upper - lower) / mid, np.nan)
+        return {
+            'bb_mid': mid,
+            'bb_std': std,
+            'bb_upper': upper,
+            'bb_lower': lower,
+            'bb_bandwidth': bandwidth,
+            'atr': atr,
+        }
@@ -0,0 +1,144 @@
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Tuple
+import pandas as pd
+from alt_scanner import DEFAULT_WATCHLIST
+from data_loader import load_data
+from backtest_engine import compute_indicators, identify_squeeze_periods, run_breakout_tests
+
+SUMMARY_KEYS = ['symbol', 'interval', 'hold_period', 'direction']
+
+def data_path(data_dir: str, symbol: str, interval: str) -> str:
+    return os.path.join(data_dir, f"{symbol}_{interval}.csv")
+
+def run_symbol(task) -> Tuple[str, str, pd.DataFrame, dict]:
+    """
+    Full squeeze pipeline for one symbol/interval. Only the (small) breakout
+    results leave the worker; the OHLCV frame is dropped when it returns.
+    """
+    symbol, interval, data_dir, params, hold_periods = task
+    info = {"symbol": symbol, "interval": interval, "bars": 0, "squeeze_events": 0, "error": None}
+    try:
+        df = load_data(data_path(data_dir, symbol, interval), symbol=symbol, interval=interval)
+        if df.empty:
+            info["error"] = "no data"
+            return symbol, interval, pd.DataFrame(), info
+        info["bars"] = len(df)
+        df = compute_indicators(df, bb_window=params['bb_window'], bb_std_multiplier=params['bb_std'],
+                                atr_window=params['atr_window'])
+        df = identify_squeeze_periods(df, bandwidth_threshold_quantile=params['bw_quantile'],
+                                      atr_threshold_quantile=params['atr_quantile'],
+                                      threshold_mode=params['threshold_mode'], threshold_window=params['threshold_window'])
+        info["squeeze_events"] = int(df['squeeze_end'].sum())
+        results = run_breakout_tests(df, hold_periods=hold_periods)
+    except Exception as e:
+        info["error"] = str(e)
+        return symbol, interval, pd.DataFrame(), info
+
+    if not results.empty:
+        results.insert(0, 'interval', interval)
+        results.insert(0, 'symbol', symbol)
+    return symbol, interval, results, info
+
+def cross_symbol_summary(results_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    summarize_results statistics per symbol/interval, plus symbol='ALL' rows
+    pooling every symbol's breakouts per interval.
+    """
+    if results_df.empty:
+        return pd.DataFrame()
+    pooled = results_df.assign(symbol='ALL')
+    summary = pd.concat([results_df, pooled]).groupby(SUMMARY_KEYS).agg({
+        'pct_change': ['count', 'mean', 'median', 'std', 'min', 'max'],
+        'max_up_pct': ['mean', 'max'],
+        'max_down_pct': ['mean', 'min']
+    })
+    summary.columns = ['_'.join(col).strip() for col in summary.columns.values]
+    return summary.reset_index()
+
+def run_batch(tasks: List[tuple], results_path: str, workers=None) -> List[dict]:
+    """
+    Run tasks in worker processes and append each finished symbol's results
+    to results_path as soon as it arrives. At most 2 tasks per worker are in
+    flight, so the parent never holds more than a few result frames.
+    Returns the per-task info dicts in completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if os.path.exists(results_path):
+        os.remove(results_path)
+    infos = []
+
+    def write(result):
+        symbol, interval, results, info = result
+        infos.append(info)
+        status = info["error"] or f"{info['bars']} bars, {info['squeeze_events']} events, {len(results)} rows"
+        print(f"{symbol} {interval}: {status}")
+        if not results.empty:
+            results.to_csv(results_path, mode="a", header=not os.path.exists(results_path), index=False)
+
+    if workers == 1:
+        for task in tasks:
+            write(run_symbol(task))
+        return infos
+
+    pending = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        while True:
+            for task in pending:
+                running.add(pool.submit(run_symbol, task))
+                if len(running) >= 2 * workers:
+                    break
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                write(future.result())
+    return infos
+
+def main():
+    parser = argparse.ArgumentParser(description="Squeeze backtest across many symbols/intervals in parallel")
+    parser.add_argument("--symbols", type=str, nargs="+", default=["BTCUSDT"] + DEFAULT_WATCHLIST,
+                        help="Symbols (default: BTCUSDT + alt watchlist)")
+    parser.add_argument("--intervals", type=str, nargs="+", default=["1h"])
+    parser.add_argument("--data_dir", type=str, default="data", help="Directory with SYMBOL_interval.csv files")
+    parser.add_argument("--bb_window", type=int, default=20)
+    parser.add_argument("--bb_std", type=float, default=2.0)
+    parser.add_argument("--atr_window", type=int, default=14)
+    parser.add_argument("--bw_quantile", type=float, default=0.10)
+    parser.add_argument("--atr_quantile", type=float, default=0.10)
+    parser.add_argument("--threshold_mode", type=str, choices=["global", "rolling", "expanding"], default="global")
+    parser.add_argument("--threshold_window", type=int, default=720)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--output", type=str, default="batch_results.csv", help="Combined breakout results")
+    parser.add_argument("--summary", type=str, default="batch_summary.csv", help="Cross-symbol summary")
+    args = parser.parse_args()
+
+    params: Dict[str, object] = dict(bb_window=args.bb_window, bb_std=args.bb_std, atr_window=args.atr_window,
+                                     bw_quantile=args.bw_quantile, atr_quantile=args.atr_quantile,
+                                     threshold_mode=args.threshold_mode, threshold_window=args.threshold_window)
+    hold_periods = [1, 4, 12, 24, 168]
+    tasks = [(symbol, interval, args.data_dir, params, hold_periods)
+             for symbol in args.symbols for interval in args.intervals]
+
+    print(f"--- Batch backtest: {len(args.symbols)} symbol(s) x {len(args.intervals)} interval(s) ---")
+    infos = run_batch(tasks, args.output, args.workers)
+    failed = [i for i in infos if i["error"]]
+    if failed:
+        print(f"{len(failed)} task(s) failed: " + ", ".join(f"{i['symbol']} {i['interval']}" for i in failed))
+
+    if not os.path.exists(args.output):
+        print("No breakout results produced.")
+        return
+    summary = cross_symbol_summary(pd.read_csv(args.output))
+    summary.to_csv(args.summary, index=False)
+
+    print("\n--- Cross-Symbol Summary (all symbols pooled) ---")
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+    print(summary[summary['symbol'] == 'ALL'].to_string(index=False))
+    print(f"\nCombined results saved to {args.output}, summary to {args.summary}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from backtest_engine import (CompactSqueezeFrame, IndicatorStream, compute_indicators, identify_squeeze_periods,
+                             mark_squeezes, run_breakout_tests, summarize_results, threshold_ranks)
+from data_loader import load_data
+from param_sweep import build_grid
+from rolling_quantile import quantile_mask
+from scenario_engine import ScenarioStream, evaluate_scenarios_array, evaluate_scenarios_batch
+from thesis_config import ThesisLevels, Thresholds
+from trade_simulator import simulate_trades
+from walk_forward import run_walk_forward
+from significance import significance_table
+from resampler import resample_ohlcv
+from multi_timeframe import multi_timeframe_squeezes
+from logger import SignalLogger, read_log
+
+def generate_ohlcv(n_bars, seed=42, start_price=100000.0, freq="1min"):
+    """
+    Deterministic synthetic OHLCV (geometric random walk with volatility regimes).
+    Regime switching produces realistic squeeze/expansion cycles for the detectors.
+    """
+    rng = np.random.default_rng(seed)
+    # Slowly varying volatility so bandwidth/ATR quantiles have structure
+    regime = np.repeat(rng.uniform(0.0003, 0.003, size=n_bars // 500 + 1), 500)[:n_bars]
+    log_ret = rng.normal(0.0, 1.0, size=n_bars) * regime
+    close = start_price * np.exp(np.cumsum(log_ret))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, 1.0, size=(2, n_bars))) * regime * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    volume = rng.lognormal(mean=0.0, sigma=0.5, size=n_bars)
+
+    index = pd.date_range("2020-01-01", periods=n_bars, freq=freq, name="timestamp")
+    return pd.DataFrame({
+        "open": open_, "high": high, "low": low, "close": close, "volume": volume
+    }, index=index)
+
+def _reference_breakout_tests(df, hold_periods):
+    """
+    The original per-squeeze / per-horizon loop, kept only to verify the
+    vectorized run_breakout_tests produces identical output.
+    """
+    results = []
+    squeeze_id = (df['squeeze'] != df['squeeze'].shift()).cumsum()
+    for _, group in df[df['squeeze']].groupby(squeeze_id[df['squeeze']]):
+        last_idx_loc = df.index.get_loc(group.index[-1])
+        if last_idx_loc + 1 >= len(df):
+            continue
+        ref_price = group.iloc[-1]['close']
+        breakout_candle = df.iloc[last_idx_loc + 1]
+        if breakout_candle['close'] > group.iloc[-1]['bb_upper']:
+            direction = 'up'
+        elif breakout_candle['close'] < group.iloc[-1]['bb_lower']:
+            direction = 'down'
+        else:
+            direction = 'expansion'
+        for h in hold_periods:
+            end_loc = last_idx_loc + 1 + h
+            if end_loc >= len(df):
+                continue
+            period_slice = df.iloc[last_idx_loc+1 : end_loc+1]
+            results.append({
+                'squeeze_end_time': group.index[-1],
+                'breakout_time': breakout_candle.name,
+                'direction': direction,
+                'hold_period': h,
+                'pct_change': (df.iloc[end_loc]['close'] - ref_price) / ref_price * 100,
+                'max_up_pct': (period_slice['high'].max() - ref_price) / ref_price * 100,
+                'max_down_pct': (period_slice['low'].min() - ref_price) / ref_price * 100,
+                'squeeze_duration': len(group)
+            })
+    return pd.DataFrame(results)
+
+def check_breakout_equivalence(n_bars=20000, hold_periods=[1, 4, 12, 24, 168]):
+    """
+    Compare run_breakout_tests against the reference loop on synthetic data.
+    Raises AssertionError on any mismatch.
+    """
+    df = identify_squeeze_periods(compute_indicators(generate_ohlcv(n_bars)))
+    fast = run_breakout_tests(df, hold_periods=hold_periods)
+    slow = _reference_breakout_tests(df, hold_periods)
+    pd.testing.assert_frame_equal(
+        fast.reset_index(drop=True), slow.reset_index(drop=True),
+        check_dtype=False, rtol=1e-12
+    )
+    return len(fast)
+
+def check_indicator_stream_equivalence(n_bars=20000, split=0.5, rtol=1e-6):
+    """
+    Feed the first part bar-by-bar and the rest as one micro-batch through
+    IndicatorStream and compare against compute_indicators.
+    """
+    df = generate_ohlcv(n_bars)
+    expected = compute_indicators(df.copy())
+    k = int(n_bars * split)
+    high, low, close = df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy()
+
+    stream = IndicatorStream()
+    singles = pd.DataFrame([stream.update(h, l, c) for h, l, c in zip(high[:k], low[:k], close[:k])])
+    batch = pd.DataFrame(stream.update_batch(high[k:], low[k:], close[k:]))
+    got = pd.concat([singles, batch], ignore_index=True)
+    for col in got.columns:
+        np.testing.assert_allclose(got[col].to_numpy(), expected[col].to_numpy(), rtol=rtol, equal_nan=True, err_msg=col)
+    return n_bars
+
+def check_rolling_threshold_equivalence(n_bars=20000, window=720, quantiles=(0.05, 0.10, 0.25)):
+    """
+    Rank-based rolling/expanding squeeze masks vs thresholds from
+    pandas rolling().quantile() / expanding().quantile().
+    """
+    df = identify_squeeze_periods(compute_indicators(generate_ohlcv(n_bars)), threshold_mode="rolling", threshold_window=window)
+    bw, atr = df['bb_bandwidth'], df['atr']
+    expected = ((bw <= bw.rolling(window).quantile(0.10)) & (atr <= atr.rolling(window).quantile(0.10))).to_numpy()
+    np.testing.assert_array_equal(df['squeeze'].to_numpy(), expected)
+    for mode, pandas_window in (("rolling", bw.rolling(window, min_periods=1)), ("expanding", bw.expanding(min_periods=1))):
+        less, valid = threshold_ranks(bw, mode, window)
+        for q in quantiles:
+            np.testing.assert_array_equal(quantile_mask(bw.to_numpy(), less, valid, q),
+                                          (bw <= pandas_window.quantile(q)).to_numpy(), err_msg=f"{mode} q={q}")
+    return n_bars
+
+def check_compact_equivalence(n_bars=20000):
+    """
+    CompactSqueezeFrame vs the default path: returns (squeeze bars that
+    differ, result rows that differ). float32 bands may flip bars sitting
+    within ~1e-7 of a threshold; the input frame must stay untouched.
+    """
+    df = generate_ohlcv(n_bars)
+    original = df.copy()
+    compact = CompactSqueezeFrame(df).identify_squeeze_periods()
+    compact_results = compact.run_breakout_tests()
+    pd.testing.assert_frame_equal(df, original)
+
+    full = identify_squeeze_periods(compute_indicators(df.copy()))
+    results = run_breakout_tests(full)
+    squeeze_diff = int((compact.squeeze != full['squeeze'].to_numpy()).sum())
+    if len(results) != len(compact_results):
+        return squeeze_diff, abs(len(results) - len(compact_results))
+    rows_diff = int((~np.isclose(results[['pct_change', 'max_up_pct', 'max_down_pct']],
+                                 compact_results[['pct_change', 'max_up_pct', 'max_down_pct']],
+                                 equal_nan=True).all(axis=1) | (results['direction'] != compact_results['direction'])).sum())
+    return squeeze_diff, rows_diff
+
+def _squeeze_pipeline(df):
+    return run_breakout_tests(identify_squeeze_periods(compute_indicators(df)))
+
+def _squeeze_pipeline_compact(df):
+    return CompactSqueezeFrame(df).identify_squeeze_periods().run_breakout_tests()
+
+def _walk_forward(df):
+    # 8 combinations, 16 folds of 20% train / 5% test, single process so timings are comparable
+    grid = build_grid([14, 20], [1.5, 2.0], [14], [0.05, 0.10], [0.10])
+    return run_walk_forward(df, grid, train_bars=len(df) // 5, test_bars=len(df) // 20, workers=1)
+
+MTF_INTERVALS = ["1m", "5m", "15m", "1h"]
+
+def _mtf_confluence(df):
+    # One pass: every timeframe derived from the 1m bars and aligned onto them
+    return run_breakout_tests(multi_timeframe_squeezes(df, "1m", MTF_INTERVALS))
+
+def _mtf_frames(n_bars):
+    # What separate runs start from: one (pre-built) frame per interval
+    df = generate_ohlcv(n_bars)
+    return {interval: df if interval == "1m" else resample_ohlcv(df, interval) for interval in MTF_INTERVALS}
+
+def _mtf_independent_runs(frames):
+    # N full pipelines, then a manual as-of join of their squeeze flags onto 1m
+    base = None
+    for interval, frame in frames.items():
+        frame = identify_squeeze_periods(compute_indicators(frame.copy()))
+        run_breakout_tests(frame)
+        flags = pd.DataFrame({'close_time': frame.index + pd.Timedelta(interval.replace("m", "min")),
+                              interval: frame['squeeze'].to_numpy()})
+        if base is None:
+            base = frame
+            joined = pd.DataFrame({'close_time': frame.index + pd.Timedelta("1min")})
+        joined = pd.merge_asof(joined, flags, on='close_time')
+    combined = joined[list(frames)].fillna(False).astype(bool).all(axis=1).to_numpy()
+    return run_breakout_tests(mark_squeezes(base, combined))
+
+def bench_rolling_thresholds(n_bars=1_000_000, windows=(720, 8760), quantiles=(0.05, 0.10, 0.25)):
+    """
+    Squeeze-threshold masks for several quantile levels: pandas needs one
+    rolling quantile per level, the rank pass serves all levels at once.
+    """
+    values = compute_indicators(generate_ohlcv(n_bars))['bb_bandwidth']
+    out = []
+    for window in windows:
+        t0 = time.perf_counter()
+        for q in quantiles:
+            values <= values.rolling(window).quantile(q)
+        pandas_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        less, valid = threshold_ranks(values, "rolling", window)
+        for q in quantiles:
+            quantile_mask(values.to_numpy(), less, valid, q, window)
+        rank_s = time.perf_counter() - t0
+        out.append({"bars": n_bars, "window": window, "levels": len(quantiles),
+                    "pandas_seconds": pandas_s, "rank_seconds": rank_s})
+    return out
+
+def _reset_peak_rss():
+    """
+    Restart the kernel's peak-RSS counter (Linux), so the peak covers only
+    the timed call rather than input generation.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _indicator_frame(n_bars):
+    return compute_indicators(generate_ohlcv(n_bars))
+
+def _squeeze_frame(n_bars):
+    return identify_squeeze_periods(_indicator_frame(n_bars))
+
+def _csv_file(n_bars, workdir):
+    path = os.path.join(workdir, "BENCH_1m.csv")
+    generate_ohlcv(n_bars).to_csv(path)
+    return path
+
+def _store_file(n_bars, workdir):
+    path = _csv_file(n_bars, workdir)
+    load_data(path, symbol="BENCH", interval="1m", store_root=os.path.join(workdir, "store"))
+    return path
+
+def _level_sets(k=100, seed=0):
+    """
+    k ThesisLevels spread around the default levels, for the broadcast scenario case.
+    """
+    shifts = np.random.default_rng(seed).uniform(-0.1, 0.1, k)
+    base = ThesisLevels()
+    return [ThesisLevels(**{name: value * (1 + shift) for name, value in vars(base).items()}) for shift in shifts]
+
+def _signal_log(n_rows, workdir):
+    """
+    Log n_rows evaluations (with rotation) and load the middle tenth back by time.
+    """
+    path = os.path.join(workdir, f"signal_log_{time.perf_counter_ns()}.csv")
+    row = {"price": 100000.0, "scenario_flags": ["SCENARIO_4_BREAKOUT_POTENTIAL"], "rotation_phase": "BTC_SEASON",
+           "sentiment_tag": "Fear", "funding": 0.0001, "btc_dom": 55.0, "atr_pct": 0.002}
+    with SignalLogger(path, max_bytes=2_000_000) as logger:
+        for _ in range(n_rows):
+            logger.log_run(row)
+    ts = read_log(path).index
+    return read_log(path, ts[int(len(ts) * 0.45)], ts[int(len(ts) * 0.55)])
+
+# name: (setup(n_bars, workdir) -> input, run(input), max_bars or None)
+CASES = {
+    "compute_indicators": (lambda n, _: generate_ohlcv(n), compute_indicators, None),
+    "identify_squeeze_periods": (lambda n, _: _indicator_frame(n), identify_squeeze_periods, None),
+    "identify_squeeze_periods_rolling": (
+        lambda n, _: _indicator_frame(n),
+        lambda df: identify_squeeze_periods(df, threshold_mode="rolling", threshold_window=720), None),
+    "run_breakout_tests": (lambda n, _: _squeeze_frame(n), run_breakout_tests, None),
+    "squeeze_pipeline": (lambda n, _: generate_ohlcv(n), _squeeze_pipeline, None),
+    "squeeze_pipeline_compact": (lambda n, _: generate_ohlcv(n), _squeeze_pipeline_compact, None),
+    "summarize_results": (lambda n, _: run_breakout_tests(_squeeze_frame(n)), summarize_results, None),
+    "simulate_trades": (lambda n, _: _squeeze_frame(n), simulate_trades, None),
+    "walk_forward": (lambda n, _: generate_ohlcv(n), _walk_forward, None),
+    "significance_10k": (
+        lambda n, _: (lambda df: (run_breakout_tests(df), df['close']))(_squeeze_frame(n)),
+        lambda args: significance_table(*args, n_resamples=10_000, workers=1), None),
+    "scenario_replay_batch": (
+        lambda n, _: _indicator_frame(n),
+        lambda df: evaluate_scenarios_batch(df, ThesisLevels(), Thresholds(), 0.0, 55.0, 50), None),
+    "scenario_levels_100": (
+        lambda n, _: _indicator_frame(n),
+        lambda df: evaluate_scenarios_array(df, _level_sets(), Thresholds(), 0.0, 55.0, 50), None),
+    "scenario_replay_stream": (
+        lambda n, _: _indicator_frame(n).to_dict("records"),
+        lambda bars: [stream.update(bar, 0.0, 55.0, 50) for stream in [ScenarioStream(ThesisLevels(), Thresholds())] for bar in bars],
+        1_000_000),
+    "resample_ohlcv": (lambda n, _: generate_ohlcv(n), lambda df: resample_ohlcv(df, "1h", "1m"), None),
+    "mtf_confluence": (lambda n, _: generate_ohlcv(n), _mtf_confluence, None),
+    "mtf_independent_runs": (lambda n, _: _mtf_frames(n), _mtf_independent_runs, None),
+    "signal_log": (lambda n, d: (n, d), lambda args: _signal_log(*args), 100_000),
+    "load_data_csv": (lambda n, d: _csv_file(n, d), lambda path: load_data(path, "BENCH", "1m", store_root=None), 2_000_000),
+    "load_data_store": (
+        lambda n, d: _store_file(n, d),
+        lambda path: load_data(path, "BENCH", "1m", store_root=os.path.join(os.path.dirname(path), "store")),
+        2_000_000),
+}
+
+# Fresh-interpreter commands timed by --startup, run from the repo directory
+# (interpreter start + imports; "python" is the bare interpreter floor)
+STARTUP_COMMANDS = {
+    "python": ["-c", "pass"],
+    "import metrics_fetcher": ["-c", "import metrics_fetcher"],
+    "import monitor_cli": ["-c", "import monitor_cli"],
+    "monitor_cli --help": ["monitor_cli.py", "--help"],
+    "import main": ["-c", "import main"],
+}
+
+def bench_startup(repeat=7):
+    """
+    Best-of-`repeat` cold-start wall time of each STARTUP_COMMANDS entry, as
+    benchmark results (case "startup:<name>", bars 0). Peak RSS is not
+    recorded: Linux carries the parent's high-water mark into children.
+    """
+    repo = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name, cmd in STARTUP_COMMANDS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, *cmd], cwd=repo, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            best = min(best, time.perf_counter() - t0)
+        results.append({"case": f"startup:{name}", "bars": 0, "seconds": best, "bars_per_sec": 0.0, "peak_rss_mb": 0.0})
+        print(f"{'startup: ' + name:34s} {best * 1000:8.1f}ms")
+    return results
+
+def _run_case(name, n_bars, repeat):
+    """
+    Runs in a fresh worker process: best-of-`repeat` wall time and the
+    peak RSS reached during the timed calls. Inputs are rebuilt (untimed)
+    for every repetition because several hot paths add columns in place.
+    """
+    setup, run, _ = CASES[name]
+    timings = []
+    peak = 0.0
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeat):
+            data = setup(n_bars, workdir)
+            _reset_peak_rss()
+            t0 = time.perf_counter()
+            run(data)
+            timings.append(time.perf_counter() - t0)
+            peak = max(peak, _peak_rss_mb())
+            del data
+    best = min(timings)
+    return {"case": name, "bars": n_bars, "seconds": best,
+            "bars_per_sec": n_bars / best if best else float("inf"), "peak_rss_mb": peak}
+
+def run_suite(sizes=(10_000, 100_000, 1_000_000), cases=None, repeat=3):
+    """
+    Time every hot path at every size, one process per case so peak RSS is
+    not inherited from earlier cases. Cases above their max_bars are skipped.
+    """
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for name in cases or CASES:
+        max_bars = CASES[name][2]
+        for n_bars in sizes:
+            if max_bars and n_bars > max_bars:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                res = pool.submit(_run_case, name, n_bars, repeat).result()
+            results.append(res)
+            print(f"{name:34s} {n_bars:>10,d} bars  {res['seconds']:8.4f}s  "
+                  f"{res['bars_per_sec']:>14,.0f} bars/s  {res['peak_rss_mb']:8.1f} MB peak")
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_seconds=0.005, min_rss_mb=5.0):
+    """
+    Flag (case, bars) entries slower or more memory-hungry than the baseline
+    by more than `tolerance`, ignoring differences below the absolute floors.
+    """
+    base = {(r["case"], r["bars"]): r for r in baseline.get("results", [])}
+    flags = []
+    for r in results:
+        b = base.get((r["case"], r["bars"]))
+        if b is None:
+            continue
+        if r["seconds"] > b["seconds"] * (1 + tolerance) and r["seconds"] - b["seconds"] > min_seconds:
+            flags.append(f"{r['case']} @ {r['bars']:,d}: {r['seconds']:.4f}s vs baseline {b['seconds']:.4f}s")
+        if r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance) and r["peak_rss_mb"] - b["peak_rss_mb"] > min_rss_mb:
+            flags.append(f"{r['case']} @ {r['bars']:,d}: {r['peak_rss_mb']:.1f}MB vs baseline {b['peak_rss_mb']:.1f}MB")
+    return flags
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def record_run(results, history_path):
+    """
+    Append this run (with commit and library versions) to the JSON history.
+    """
+    run = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    history = []
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            history = json.load(f)
+    history.append(run)
+    with open(history_path, "w") as f:
+        json.dump(history, f, indent=2)
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest engine benchmarks (offline, synthetic data)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Synthetic bar counts (10k..10M)")
+    parser.add_argument("--cases", type=str, nargs="+", default=None, choices=list(CASES), help="Hot paths to time (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--check_bars", type=int, default=20000, help="Bars for the equivalence checks (0 to skip)")
+    parser.add_argument("--history", type=str, default="benchmark_history.json", help="JSON file each run is appended to")
+    parser.add_argument("--baseline", type=str, default="benchmark_baseline.json", help="Baseline results to compare against")
+    parser.add_argument("--save_baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown / memory growth vs baseline")
+    parser.add_argument("--fail_on_regression", action="store_true", help="Exit with status 1 if a regression is flagged")
+    parser.add_argument("--threshold_bars", type=int, default=0, help="Bars for the rolling-threshold vs pandas comparison (0 to skip)")
+    parser.add_argument("--startup", action="store_true", help="Also time CLI cold starts (fresh interpreters)")
+    args = parser.parse_args()
+
+    if args.check_bars:
+        rows = check_breakout_equivalence(args.check_bars)
+        print(f"run_breakout_tests equivalence OK ({rows} rows on {args.check_bars} bars)")
+        check_indicator_stream_equivalence(args.check_bars)
+        print(f"IndicatorStream matches compute_indicators on {args.check_bars} bars")
+        check_rolling_threshold_equivalence(args.check_bars)
+        print(f"Rolling/expanding squeeze thresholds match pandas quantiles on {args.check_bars} bars")
+        squeeze_diff, rows_diff = check_compact_equivalence(args.check_bars)
+        print(f"CompactSqueezeFrame vs default: {squeeze_diff} squeeze bar(s), {rows_diff} result row(s) differ")
+
+    if args.threshold_bars:
+        for res in bench_rolling_thresholds(args.threshold_bars):
+            print(f"rolling thresholds: {res['bars']} bars, window {res['window']}, {res['levels']} levels, "
+                  f"pandas {res['pandas_seconds']:.3f}s, rank pass {res['rank_seconds']:.3f}s")
+
+    results = bench_startup() if args.startup else []
+    results += run_suite(args.sizes, args.cases, args.repeat)
+    run = record_run(results, args.history)
+    print(f"\nRecorded {len(results)} results to {args.history}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        flags = compare_to_baseline(results, baseline, args.tolerance)
+        print(f"Compared against baseline {baseline.get('commit') or ''} ({baseline.get('time')}): "
+              f"{len(flags) or 'no'} regression(s)")
+        for flag in flags:
+            print(f"  REGRESSION {flag}")
+        if flags and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import argparse
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from providers.market_data import MarketDataProvider
+from ohlcv_store import DEFAULT_STORE_ROOT, append_partition, read_meta, read_partition, write_partition
+from profiling import timed
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+
+def interval_to_ms(interval: str) -> int:
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Unsupported interval for sync: {interval}")
+    return INTERVAL_MS[interval]
+
+def to_ms(ts) -> int:
+    """
+    Epoch milliseconds for anything pd.Timestamp accepts (naive = UTC).
+    """
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.as_unit("ns").value // 1_000_000)
+
+def index_to_ms(index: pd.Index) -> np.ndarray:
+    return pd.DatetimeIndex(index).as_unit("ms").asi8
+
+def find_gaps(ts_ms: np.ndarray, step_ms: int) -> List[Tuple[int, int]]:
+    """
+    (last_present, next_present) pairs of consecutive bars more than one interval apart.
+    """
+    if len(ts_ms) < 2:
+        return []
+    jumps = np.flatnonzero(np.diff(ts_ms) > step_ms)
+    return [(int(ts_ms[i]), int(ts_ms[i + 1])) for i in jumps]
+
+def merge_candles(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate candle frames, keeping the most recently fetched copy of any
+    duplicated bar (an earlier copy may have been captured while still open).
+    """
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames)
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    return merged.astype(np.float64)
+
+class CandleSync:
+    """
+    Keeps an ohlcv_store partition per symbol/interval in step with the exchange:
+    - forward: refetch the stored last bar (it may have been open) and anything newer
+    - backward: page back with endTime until `since` is covered
+    - gaps: refetch holes inside the stored range; holes the exchange can't
+      fill are remembered in meta.json ("known_gaps") and not retried
+    A routine refresh is a single small request appended in place.
+    """
+    def __init__(self, provider: Optional[MarketDataProvider] = None, store_root: str = DEFAULT_STORE_ROOT,
+                 page_limit: int = 1000):
+        self.provider = provider or MarketDataProvider()
+        self.store_root = store_root
+        self.page_limit = page_limit
+        self.requests = 0
+        self.errors: List[str] = []
+
+    def _page(self, symbol: str, interval: str, start_ms=None, end_ms=None, limit=None) -> Optional[pd.DataFrame]:
+        self.requests += 1
+        try:
+            return self.provider.fetch_klines(symbol, interval, start_ms=start_ms, end_ms=end_ms,
+                                              limit=limit or self.page_limit)
+        except ConnectionError as e:
+            self.errors.append(str(e))
+            return None
+
+    def _fetch_forward(self, symbol: str, interval: str, start_ms: int, end_ms: Optional[int] = None) -> pd.DataFrame:
+        step = interval_to_ms(interval)
+        pages = []
+        while True:
+            page = self._page(symbol, interval, start_ms=start_ms, end_ms=end_ms)
+            if page is None or page.empty:
+                break
+            pages.append(page)
+            if len(page) < self.page_limit:
+                break
+            start_ms = int(index_to_ms(page.index)[-1]) + step
+            if end_ms is not None and start_ms > end_ms:
+                break
+        return merge_candles(pages)
+
+    def _fetch_backward(self, symbol: str, interval: str, since_ms: int, end_ms: int) -> pd.DataFrame:
+        pages = []
+        while end_ms >= since_ms:
+            page = self._page(symbol, interval, end_ms=end_ms)
+            if page is None or page.empty:
+                break
+            pages.append(page)
+            first_ms = int(index_to_ms(page.index)[0])
+            if first_ms <= since_ms or len(page) < self.page_limit:
+                break
+            end_ms = first_ms - 1
+        merged = merge_candles(pages)
+        if merged.empty:
+            return merged
+        return merged[index_to_ms(merged.index) >= since_ms]
+
+    @timed()
+    def sync(self, symbol: str = "BTCUSDT", interval: str = "1h", since=None, fill_gaps: bool = True) -> pd.DataFrame:
+        """
+        Bring the local partition up to date and return the full stored history
+        (memory-mapped after an in-place refresh, so slicing the tail is cheap).
+        `since` (anything pd.Timestamp accepts) extends the history backwards.
+        With an empty cache and no `since`, one page of the latest candles is fetched.
+        """
+        self.requests = 0
+        self.errors = []
+        step = interval_to_ms(interval)
+        since_ms = to_ms(since) if since is not None else None
+
+        cached = read_partition(symbol, interval, self.store_root)
+        meta = read_meta(symbol, interval, self.store_root) or {}
+        known_gaps = {tuple(g) for g in meta.get("known_gaps", [])}
+
+        if cached.empty:
+            if since_ms is None:
+                fresh = self._page(symbol, interval)
+            else:
+                fresh = self._fetch_forward(symbol, interval, since_ms)
+            merged = merge_candles([fresh])
+            if not merged.empty:
+                write_partition(merged, symbol, interval, self.store_root,
+                                extra_meta=self._sync_meta(find_gaps(index_to_ms(merged.index), step)))
+            return merged
+
+        ts = index_to_ms(cached.index)
+        head = self._fetch_forward(symbol, interval, int(ts[-1]))
+
+        older = []
+        if since_ms is not None and since_ms < ts[0]:
+            older.append(self._fetch_backward(symbol, interval, since_ms, int(ts[0]) - 1))
+        attempted = set()
+        gaps = find_gaps(ts, step)
+        if fill_gaps:
+            for gap in gaps:
+                if gap not in known_gaps:
+                    attempted.add(gap)
+                    older.append(self._fetch_forward(symbol, interval, gap[0] + step, gap[1] - 1))
+
+        older = [f for f in older if not f.empty]
+        if not older:
+            # Common refresh path: only the tail moved, so append in place
+            extra = self._sync_meta(gaps, known_gaps, attempted)
+            if append_partition(head, symbol, interval, self.store_root, extra_meta=extra):
+                return read_partition(symbol, interval, self.store_root)
+
+        merged = merge_candles([cached] + older + [head])
+        write_partition(merged, symbol, interval, self.store_root,
+                        extra_meta=self._sync_meta(find_gaps(index_to_ms(merged.index), step), known_gaps, attempted))
+        return merged
+
+    def _sync_meta(self, remaining_gaps, known_gaps=frozenset(), attempted=frozenset()) -> dict:
+        """
+        Gaps that survive a fill attempt made without errors are treated as
+        exchange-side holes and skipped on later syncs.
+        """
+        skip = set(known_gaps) | (set(attempted) if not self.errors else set())
+        known = [list(g) for g in remaining_gaps if g in skip]
+        return {"origin": "sync", "known_gaps": known}
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync exchange klines into the local columnar store")
+    parser.add_argument("--symbol", type=str, nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--interval", type=str, default="1h")
+    parser.add_argument("--since", type=str, default=None, help="Backfill history back to this date (e.g. 2023-01-01)")
+    parser.add_argument("--no_gaps", action="store_true", help="Skip gap detection/filling")
+    parser.add_argument("--root", type=str, default=DEFAULT_STORE_ROOT, help="Store root directory")
+    args = parser.parse_args()
+
+    syncer = CandleSync(store_root=args.root)
+    for symbol in args.symbol:
+        df = syncer.sync(symbol, args.interval, since=args.since, fill_gaps=not args.no_gaps)
+        span = f"{df.index[0]} -> {df.index[-1]}" if not df.empty else "empty"
+        print(f"{symbol} {args.interval}: {len(df)} bars ({span}), {syncer.requests} request(s)")
+        for err in syncer.errors:
+            print(f"  warning: {err}")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,10 @@ import pandas as pd
 import requests
 import os
 from datetime import datetime
+from ohlcv_store import DEFAULT_STORE_ROOT, cache_partition, load_if_fresh
+from profiling import timed
 
-def fetch_sample_data(symbol="BTCUSDT", interval="1h", limit=1000, save_path=None):
+def fetch_sample_data(symbol="BTCUSDT", interval="1h", limit=1000, save_path=None, store_root=DEFAULT_STORE_ROOT):
     """
     Fetch sample OHLC data from Binance public API.
     NOTE: This is for demonstration purposes. For a full backtest, use a complete historical dataset.
@@ -77,6 +79,9 @@ def fetch_sample_data(symbol="BTCUSDT", interval="1h", limit=1000, save_path=Non
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             df.to_csv(save_path)
             print(f"Saved sample data to {save_path}")
+
+        if store_root:
+            cache_partition(df, symbol, interval, store_root, source=save_path)
             
         return df
         
@@ -84,35 +89,55 @@ def fetch_sample_data(symbol="BTCUSDT", interval="1h", limit=1000, save_path=Non
         print(f"Error processing data: {e}")
         return pd.DataFrame()
 
-def load_data(filepath, symbol="BTCUSDT", interval="1h"):
+def read_ohlcv_csv(filepath):
+    """
+    Parse an OHLCV CSV into a timestamp-indexed, sorted DataFrame.
+    Raises ValueError if the OHLCV columns are missing.
+    """
+    df = pd.read_csv(filepath)
+    # Check if 'timestamp' or 'Date' exists
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.set_index('timestamp')
+    elif 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = df.set_index('Date')
+    
+    # Ensure columns are lower case for consistency
+    df.columns = [c.lower() for c in df.columns]
+    
+    # Ensure required columns exist
+    required = ['open', 'high', 'low', 'close', 'volume']
+    if not all(col in df.columns for col in required):
+        raise ValueError(f"Dataframe missing required columns: {required}")
+        
+    return df.sort_index()
+
+@timed()
+def load_data(filepath, symbol="BTCUSDT", interval="1h", store_root=DEFAULT_STORE_ROOT):
     """
-    Load historical OHLC data from CSV. 
+    Load historical OHLC data.
+    If a columnar store partition for symbol/interval was converted from this
+    file (and the file is unchanged), it is memory-mapped instead of parsing
+    the CSV. A freshly parsed CSV is written to the store for the next run.
     If file doesn't exist, try to fetch sample data.
+    Pass store_root=None to always read the CSV.
     """
+    if store_root:
+        cached = load_if_fresh(filepath, symbol, interval, store_root)
+        if cached is not None and not cached.empty:
+            return cached
+
     if not os.path.exists(filepath):
         print(f"File {filepath} not found. Attempting to fetch sample data...")
-        return fetch_sample_data(symbol, interval, limit=1000, save_path=filepath)
+        return fetch_sample_data(symbol, interval, limit=1000, save_path=filepath, store_root=store_root)
     
     try:
-        df = pd.read_csv(filepath)
-        # Check if 'timestamp' or 'Date' exists
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.set_index('timestamp')
-        elif 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'])
-            df = df.set_index('Date')
-        
-        # Ensure columns are lower case for consistency
-        df.columns = [c.lower() for c in df.columns]
-        
-        # Ensure required columns exist
-        required = ['open', 'high', 'low', 'close', 'volume']
-        if not all(col in df.columns for col in required):
-            raise ValueError(f"Dataframe missing required columns: {required}")
-            
-        df = df.sort_index()
-        return df
+        df = read_ohlcv_csv(filepath)
     except Exception as e:
         print(f"Error loading data from {filepath}: {e}")
         return pd.DataFrame()
+
+    if store_root:
+        cache_partition(df, symbol, interval, store_root, source=filepath)
+    return df
@@ -1,28 +1,66 @@
+import argparse
+import atexit
 import csv
+import io
+import json
 import os
+import shutil
+import time
 from datetime import datetime
-import json
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from ohlcv_store import META_FILE, _append_npy, _write_meta
+from file_lock import locked
+from profiling import timed
+
+LOG_COLUMNS = [
+    "timestamp", "price", "scenario_flags", "rotation_phase",
+    "sentiment", "funding", "btc_dom", "atr_pct"
+]
+NUMERIC_COLUMNS = ["price", "funding", "btc_dom", "atr_pct"]
+TEXT_COLUMNS = ["scenario_flags", "rotation_phase", "sentiment"]
+# A CSV file gets a new seek point in the index after this many bytes
+INDEX_BLOCK_BYTES = 64 * 1024
 
 class SignalLogger:
-    def __init__(self, filepath="monitor_log.csv"):
+    """
+    Log of monitor evaluations. Rows are buffered and written in one append
+    every `flush_rows` rows, or on the first row `flush_seconds` after the
+    last write (so a slow loop writes every row), and on flush()/close()/exit.
+    The active file is rotated to <name>.<first row time> once it passes
+    `max_bytes` or spans `rotate_seconds`; `keep_files` caps the rotated ones.
+    fmt="csv" appends to a CSV file; fmt="columnar" keeps a directory of
+    segments with one .npy per column (text columns dictionary-encoded).
+    An index file records every file's time range (and CSV seek points), so
+    read_log loads a date range without parsing the whole log.
+    Several monitors may share one log: each flush holds a lock on the
+    index and continues from the index on disk, not its own copy.
+    """
+    def __init__(self, filepath="monitor_log.csv", fmt: str = "csv", flush_rows: int = 64,
+                 flush_seconds: float = 30.0, max_bytes: Optional[int] = 10_000_000,
+                 rotate_seconds: Optional[float] = None, keep_files: Optional[int] = None):
+        if fmt not in ("csv", "columnar"):
+            raise ValueError(f"Unknown log format: {fmt}")
         self.filepath = filepath
-        self.headers = [
-            "timestamp", "price", "scenario_flags", "rotation_phase", 
-            "sentiment", "funding", "btc_dom", "atr_pct"
-        ]
-        self._init_file()
-
-    def _init_file(self):
-        if not os.path.exists(self.filepath):
-            with open(self.filepath, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(self.headers)
+        self.fmt = fmt
+        self.headers = LOG_COLUMNS
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep_files = keep_files
+        self._buffer: List[list] = []
+        self._last_flush = time.monotonic()
+        self._index = load_index(filepath, fmt)
+        self._index_stamp = _stamp(index_path(filepath, fmt))
+        atexit.register(self.flush)
 
     def log_run(self, data: dict):
         """
-        Log a run to the CSV file.
+        Buffer one evaluation; written by the next flush.
         """
-        row = [
+        self._buffer.append([
             datetime.now().isoformat(),
             data.get("price"),
             ";".join(data.get("scenario_flags", [])),
@@ -31,8 +69,308 @@ class SignalLogger:
             data.get("funding"),
             data.get("btc_dom"),
             data.get("atr_pct")
-        ]
-        
-        with open(self.filepath, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        ])
+        if len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    @timed()
+    def flush(self):
+        """
+        Write buffered rows (one append per file) and update the index.
+        """
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        ts = np.array([row[0] for row in rows], dtype="datetime64[ns]").view(np.int64)
+        try:
+            with locked(index_path(self.filepath, self.fmt)):
+                # Reload only if another writer saved the index since our last flush
+                if _stamp(index_path(self.filepath, self.fmt)) != self._index_stamp:
+                    self._index = load_index(self.filepath, self.fmt)
+                self._rotate_if_needed(int(ts.min()))
+                if self.fmt == "csv":
+                    self._write_csv(rows, ts)
+                else:
+                    self._write_columnar(rows, ts)
+                _save_index(self.filepath, self.fmt, self._index)
+                self._index_stamp = _stamp(index_path(self.filepath, self.fmt))
+        except OSError as e:
+            print(f"Could not write signal log {self.filepath}: {e}")
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Logged rows in [start, end], including any still buffered.
+        """
+        self.flush()
+        return read_log(self.filepath, start, end, self.fmt)
+
+    def _active(self) -> Optional[dict]:
+        files = self._index["files"]
+        return files[-1] if files and files[-1].get("active") else None
+
+    def _rotate_if_needed(self, first_ts: int):
+        active = self._active()
+        if active is None:
+            return
+        path = _entry_path(self.filepath, self.fmt, active)
+        too_big = self.max_bytes is not None and _size(path) >= self.max_bytes
+        too_old = self.rotate_seconds is not None and first_ts - active["start"] >= self.rotate_seconds * 1e9
+        if not (too_big or too_old) or not active["rows"]:
+            return
+
+        stamp = pd.Timestamp(active["start"]).strftime("%Y%m%dT%H%M%S")
+        if self.fmt == "csv":
+            stem, ext = os.path.splitext(os.path.basename(self.filepath))
+            name, ext = f"{stem}.{stamp}", ext or ".csv"
+        else:
+            name, ext = stamp, ""
+        # Same start second as an earlier file: number it before the extension (m.<stamp>.2.csv)
+        target = os.path.join(os.path.dirname(path), name + ext)
+        suffix = 1
+        while os.path.exists(target):
+            suffix += 1
+            target = os.path.join(os.path.dirname(path), f"{name}.{suffix}{ext}")
+        os.replace(path, target)
+        active["path"] = os.path.basename(target)
+        del active["active"]
+
+        rotated = [f for f in self._index["files"] if not f.get("active")]
+        if self.keep_files is not None and len(rotated) > self.keep_files:
+            for old in rotated[:len(rotated) - self.keep_files]:
+                old_path = _entry_path(self.filepath, self.fmt, old)
+                if os.path.isdir(old_path):
+                    shutil.rmtree(old_path, ignore_errors=True)
+                elif os.path.exists(old_path):
+                    os.remove(old_path)
+                self._index["files"].remove(old)
+
+    def _new_entry(self, first_ts: int) -> dict:
+        entry = {"path": None, "active": True, "rows": 0, "start": first_ts, "end": first_ts, "columns": LOG_COLUMNS}
+        self._index["files"].append(entry)
+        return entry
+
+    def _write_csv(self, rows: List[list], ts: np.ndarray):
+        entry = self._active() or self._new_entry(int(ts.min()))
+        text = io.StringIO()
+        writer = csv.writer(text)
+        if not os.path.exists(self.filepath) or os.path.getsize(self.filepath) == 0:
+            writer.writerow(self.headers)
+            entry.update(rows=0, blocks=[], start=int(ts.min()), end=int(ts.max()))
+        header_bytes = len(text.getvalue().encode("utf-8"))
+        writer.writerows(rows)
+
+        with open(self.filepath, "ab") as f:
+            offset = f.tell() + header_bytes
+            f.write(text.getvalue().encode("utf-8"))
+
+        entry["path"] = os.path.basename(self.filepath)
+        _extend_range(entry, ts, len(rows))
+        blocks = entry.setdefault("blocks", [])
+        if not blocks or offset - blocks[-1]["offset"] >= INDEX_BLOCK_BYTES:
+            blocks.append({"offset": offset, "start": int(ts.min()), "end": int(ts.max())})
+        else:
+            blocks[-1]["start"] = min(blocks[-1]["start"], int(ts.min()))
+            blocks[-1]["end"] = max(blocks[-1]["end"], int(ts.max()))
+
+    def _write_columnar(self, rows: List[list], ts: np.ndarray):
+        entry = self._active()
+        if entry is None:
+            entry = self._new_entry(int(ts.min()))
+            entry["path"] = "active"
+        path = _entry_path(self.filepath, self.fmt, entry)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        else:
+            os.makedirs(path, exist_ok=True)
+            meta = {"rows": 0, "columns": LOG_COLUMNS, "vocab": {col: [] for col in TEXT_COLUMNS}}
+
+        columns = {"timestamp": ts}
+        for i, col in enumerate(LOG_COLUMNS[1:], start=1):
+            values = [row[i] for row in rows]
+            if col in NUMERIC_COLUMNS:
+                columns[col] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                codes = {word: code for code, word in enumerate(meta["vocab"][col])}
+                for word in ("" if v is None else str(v) for v in values):
+                    if word not in codes:
+                        codes[word] = len(meta["vocab"][col])
+                        meta["vocab"][col].append(word)
+                columns[col] = np.array([codes["" if v is None else str(v)] for v in values], dtype=np.int32)
+
+        for name, values in columns.items():
+            filepath = os.path.join(path, f"{name}.npy")
+            if meta["rows"]:
+                _append_npy(filepath, values)
+            else:
+                np.save(filepath, values)
+        meta["rows"] += len(rows)
+        _write_meta(path, meta)
+        _extend_range(entry, ts, len(rows))
+
+def _extend_range(entry: dict, ts: np.ndarray, n_rows: int):
+    entry["rows"] += n_rows
+    entry["start"] = min(entry["start"], int(ts.min()))
+    entry["end"] = max(entry["end"], int(ts.max()))
+
+def _stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _entry_path(filepath: str, fmt: str, entry: dict) -> str:
+    if fmt == "csv":
+        return os.path.join(os.path.dirname(filepath), entry["path"] or os.path.basename(filepath))
+    return os.path.join(filepath, entry["path"])
+
+def index_path(filepath: str, fmt: str = "csv") -> str:
+    """
+    monitor_log.csv -> monitor_log.index.json; a columnar log keeps index.json inside its directory.
+    """
+    if fmt == "csv":
+        return os.path.splitext(filepath)[0] + ".index.json"
+    return os.path.join(filepath, "index.json")
+
+def load_index(filepath: str, fmt: str = "csv") -> dict:
+    """
+    The log's file index. A CSV written before the index existed is scanned
+    once and indexed as a single block.
+    """
+    path = index_path(filepath, fmt)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Rebuilding unreadable log index {path}: {e}")
+    index = {"files": []}
+    if fmt == "csv" and os.path.exists(filepath) and os.path.getsize(filepath):
+        with open(filepath, "rb") as f:
+            columns = next(csv.reader([f.readline().decode("utf-8")]))
+            offset = f.tell()
+        ts = pd.DatetimeIndex(pd.to_datetime(pd.read_csv(filepath, usecols=["timestamp"])["timestamp"], format="ISO8601")).as_unit("ns").asi8
+        if len(ts):
+            start, end = int(ts.min()), int(ts.max())
+            index["files"].append({"path": os.path.basename(filepath), "active": True, "rows": len(ts),
+                                   "start": start, "end": end, "columns": columns,
+                                   "blocks": [{"offset": offset, "start": start, "end": end}]})
+    return index
+
+def _save_index(filepath: str, fmt: str, index: dict):
+    path = index_path(filepath, fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(index))
+    os.replace(tmp_path, path)
+
+def _to_ns(ts, default: int) -> int:
+    return default if ts is None else int(pd.Timestamp(ts).as_unit("ns").value)
+
+def read_log(filepath="monitor_log.csv", start=None, end=None, fmt: Optional[str] = None) -> pd.DataFrame:
+    """
+    Logged rows with start <= timestamp <= end (either may be None) across
+    the active and rotated files, on a DatetimeIndex. Files outside the range
+    are skipped via the index; inside a CSV only the blocks overlapping the
+    range are read. Returns empty DataFrame if nothing matches.
+    """
+    fmt = fmt or ("columnar" if os.path.isdir(filepath) else "csv")
+    lo = _to_ns(start, np.iinfo(np.int64).min)
+    hi = _to_ns(end, np.iinfo(np.int64).max)
+
+    frames = []
+    for entry in load_index(filepath, fmt)["files"]:
+        if entry["end"] < lo or entry["start"] > hi:
+            continue
+        path = _entry_path(filepath, fmt, entry)
+        if not os.path.exists(path):
+            continue
+        frame = _read_csv_blocks(path, entry, lo, hi) if fmt == "csv" else _read_segment(path, lo, hi)
+        if not frame.empty:
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=LOG_COLUMNS[1:], index=pd.DatetimeIndex([], name="timestamp"))
+    return pd.concat(frames).sort_index(kind="stable")
+
+def _read_csv_blocks(path: str, entry: dict, lo: int, hi: int) -> pd.DataFrame:
+    blocks = entry.get("blocks") or [{"offset": 0, "start": entry["start"], "end": entry["end"]}]
+    bounds = [b["offset"] for b in blocks] + [os.path.getsize(path)]
+    # Contiguous runs of overlapping blocks become one read each
+    runs = []
+    for i, block in enumerate(blocks):
+        if block["end"] < lo or block["start"] > hi:
+            continue
+        if runs and runs[-1][1] == bounds[i]:
+            runs[-1][1] = bounds[i + 1]
+        else:
+            runs.append([bounds[i], bounds[i + 1]])
+
+    frames = []
+    with open(path, "rb") as f:
+        for begin, stop in runs:
+            f.seek(begin)
+            chunk = f.read(stop - begin)
+            if begin == 0:
+                chunk = chunk.split(b"\n", 1)[1] if b"\n" in chunk else b""
+            if chunk.strip():
+                frames.append(pd.read_csv(io.BytesIO(chunk), names=entry["columns"], header=None,
+                                          dtype={col: str for col in TEXT_COLUMNS}, keep_default_na=False))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601").astype("datetime64[ns]")
+    df = df.set_index("timestamp")
+    ts = df.index.asi8
+    return df[(ts >= lo) & (ts <= hi)]
+
+def _read_segment(path: str, lo: int, hi: int) -> pd.DataFrame:
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    ts = np.load(os.path.join(path, "timestamp.npy"), mmap_mode="r")
+    keep = np.flatnonzero((ts >= lo) & (ts <= hi))
+    columns = {}
+    for col in LOG_COLUMNS[1:]:
+        values = np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r")[keep]
+        columns[col] = np.asarray(meta["vocab"][col], dtype=object)[values] if col in TEXT_COLUMNS else values
+    index = pd.DatetimeIndex(np.asarray(ts[keep]).view("datetime64[ns]"), name="timestamp")
+    return pd.DataFrame(columns, index=index)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a date range of the signal log")
+    parser.add_argument("--log", type=str, default="monitor_log.csv", help="Log file (CSV) or directory (columnar)")
+    parser.add_argument("--start", type=str, default=None)
+    parser.add_argument("--end", type=str, default=None)
+    parser.add_argument("--out", type=str, default=None, help="Write the rows to this CSV instead of printing them")
+    args = parser.parse_args()
+
+    df = read_log(args.log, args.start, args.end)
+    if args.out:
+        df.to_csv(args.out)
+        print(f"{len(df)} rows written to {args.out}")
+    else:
+        print(df.to_string() if len(df) <= 50 else df)
+
+if __name__ == "__main__":
+    main()
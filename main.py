@@ -1,39 +1,128 @@
 import pandas as pd
 import argparse
 from data_loader import load_data
-from backtest_engine import compute_indicators, identify_squeeze_periods, run_breakout_tests, summarize_results
+from resampler import resample_cached
+from multi_timeframe import multi_timeframe_squeezes
+from backtest_engine import CompactSqueezeFrame, compute_indicators, identify_squeeze_periods, run_breakout_tests, summarize_results
+from param_sweep import build_grid, run_sweep
+from significance import significance_table
+from trade_simulator import TradeConfig, simulate_trades, trade_stats
+import profiling
+
+def run_sweep_mode(df, grid, hold_periods, workers=None, threshold_mode="global", threshold_window=720):
+    print(f"Sweeping {len(grid)} parameter combinations...")
+    sweep_df = run_sweep(df, grid, hold_periods=hold_periods, workers=workers,
+                         threshold_mode=threshold_mode, threshold_window=threshold_window)
+    if sweep_df.empty:
+        print("No combination produced breakout results.")
+        return
+
+    print("\n--- Sweep Results (top 10 by mean 24-bar return) ---")
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+    top = sweep_df[sweep_df['hold_period'] == 24].sort_values('pct_change_mean', ascending=False)
+    print(top.head(10).to_string(index=False))
+
+    with profiling.span("write_csv", file="sweep_results.csv"):
+        sweep_df.to_csv("sweep_results.csv", index=False)
+    print("\nConsolidated sweep results saved to sweep_results.csv")
 
 def main():
     parser = argparse.ArgumentParser(description="Bollinger Band Squeeze Backtester")
     parser.add_argument("--file", type=str, default="data/BTCUSDT_1h.csv", help="Path to CSV data file")
     parser.add_argument("--symbol", type=str, default="BTCUSDT", help="Symbol to fetch if file missing")
     parser.add_argument("--interval", type=str, default="1h", help="Timeframe interval")
-    parser.add_argument("--bb_window", type=int, default=20, help="Bollinger Band window")
-    parser.add_argument("--bb_std", type=float, default=2.0, help="Bollinger Band std dev multiplier")
-    parser.add_argument("--atr_window", type=int, default=14, help="ATR window")
-    parser.add_argument("--bw_quantile", type=float, default=0.10, help="Bandwidth quantile threshold")
-    parser.add_argument("--atr_quantile", type=float, default=0.10, help="ATR quantile threshold")
+    parser.add_argument("--base_interval", type=str, default=None,
+                        help="Interval of --file; --interval is then resampled from it (e.g. --file data/BTCUSDT_1m.csv --base_interval 1m)")
+    parser.add_argument("--bb_window", type=int, nargs="+", default=[20], help="Bollinger Band window (several values = sweep)")
+    parser.add_argument("--bb_std", type=float, nargs="+", default=[2.0], help="Bollinger Band std dev multiplier (several values = sweep)")
+    parser.add_argument("--atr_window", type=int, nargs="+", default=[14], help="ATR window (several values = sweep)")
+    parser.add_argument("--bw_quantile", type=float, nargs="+", default=[0.10], help="Bandwidth quantile threshold (several values = sweep)")
+    parser.add_argument("--atr_quantile", type=float, nargs="+", default=[0.10], help="ATR quantile threshold (several values = sweep)")
+    parser.add_argument("--threshold_mode", type=str, choices=["global", "rolling", "expanding"], default="global",
+                        help="Quantile thresholds over the whole history (look-ahead), a trailing window, or all past bars")
+    parser.add_argument("--threshold_window", type=int, default=720, help="Bars in the rolling threshold window (also the warm-up for rolling/expanding)")
+    parser.add_argument("--confluence", type=str, nargs="+", default=None,
+                        help="Higher intervals (e.g. 4h 1d) that must also be in a squeeze; derived from the loaded bars")
+    parser.add_argument("--confluence_mode", type=str, choices=["all", "any"], default="all",
+                        help="Squeeze when all / any of --interval and --confluence intervals are in one")
+    parser.add_argument("--compact", action="store_true", help="Low-memory mode: float32 indicators, bit-packed squeeze mask")
+    parser.add_argument("--resamples", type=int, default=0, help="Bootstrap/random-entry resamples for CIs and p-values (0 = off)")
+    parser.add_argument("--simulate", action="store_true", help="Also trade the breakouts with stops/targets, fees and RiskEngine sizing")
+    parser.add_argument("--fee_bps", type=float, default=4.0, help="Fee per side in basis points (--simulate)")
+    parser.add_argument("--slippage_bps", type=float, default=2.0, help="Slippage on market orders in basis points (--simulate)")
+    parser.add_argument("--stop_atr", type=float, default=None, help="Stop at this many ATRs (default: opposite band of the squeeze) (--simulate)")
+    parser.add_argument("--target_r", type=float, default=2.0, help="Take profit at this multiple of the stop distance (--simulate)")
+    parser.add_argument("--max_hold", type=int, default=168, help="Bars before a time exit (--simulate)")
+    parser.add_argument("--sweep", action="store_true", help="Run the parameter grid in parallel and write sweep_results.csv")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --sweep / --resamples (default: all cores)")
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
-    
+    grid = build_grid(args.bb_window, args.bb_std, args.atr_window, args.bw_quantile, args.atr_quantile)
+    if args.confluence and (args.compact or args.sweep or len(grid) > 1):
+        parser.error("--confluence runs the default single-parameter path (no --compact / --sweep)")
+
+    profiling.start(args)
+    try:
+        run_backtest(args, grid)
+    finally:
+        profiling.finish(args)
+
+def run_backtest(args, grid):
     print(f"--- Starting Backtest for {args.symbol} {args.interval} ---")
     
     # 1. Load Data
-    df = load_data(args.file, symbol=args.symbol, interval=args.interval)
+    if args.base_interval:
+        df = load_data(args.file, symbol=args.symbol, interval=args.base_interval)
+        if not df.empty:
+            df = resample_cached(df, args.symbol, args.interval, args.base_interval)
+    else:
+        df = load_data(args.file, symbol=args.symbol, interval=args.interval)
     if df.empty:
         print("No data loaded. Exiting.")
         return
 
     print(f"Loaded {len(df)} bars from {df.index[0]} to {df.index[-1]}")
 
-    # 2. Compute Indicators
-    df = compute_indicators(df, bb_window=args.bb_window, bb_std_multiplier=args.bb_std, atr_window=args.atr_window)
-    
-    # 3. Identify Squeezes
-    df = identify_squeeze_periods(df, bandwidth_threshold_quantile=args.bw_quantile, atr_threshold_quantile=args.atr_quantile)
-    
-    squeeze_count = df['squeeze'].sum()
-    squeeze_events = df['squeeze_end'].sum()
+    # Hold periods: 1h, 4h, 12h, 24h, 7d (168h)
+    hold_periods = [1, 4, 12, 24, 168]
+
+    if args.sweep or len(grid) > 1:
+        run_sweep_mode(df, grid, hold_periods, args.workers, args.threshold_mode, args.threshold_window)
+        return
+
+    params = grid[0]
+
+    if args.compact:
+        # 2./3. float32 indicators + bit-packed squeeze mask; df is left untouched
+        squeezes = CompactSqueezeFrame(df, bb_window=params['bb_window'], bb_std_multiplier=params['bb_std'],
+                                       atr_window=params['atr_window'])
+        squeezes.identify_squeeze_periods(params['bw_quantile'], params['atr_quantile'],
+                                          threshold_mode=args.threshold_mode, threshold_window=args.threshold_window)
+        squeeze_count = squeezes.squeeze.sum()
+        squeeze_events = squeezes.squeeze_end.sum()
+    elif args.confluence:
+        # 2./3. Indicators and squeezes per timeframe, aligned onto the loaded bars without look-ahead
+        df = multi_timeframe_squeezes(df, args.interval, [args.interval] + args.confluence, combine=args.confluence_mode,
+                                      bb_window=params['bb_window'], bb_std_multiplier=params['bb_std'],
+                                      atr_window=params['atr_window'], bandwidth_threshold_quantile=params['bw_quantile'],
+                                      atr_threshold_quantile=params['atr_quantile'],
+                                      threshold_mode=args.threshold_mode, threshold_window=args.threshold_window)
+        for interval in [args.interval] + args.confluence:
+            print(f"{interval}: {int(df[f'squeeze_{interval}'].sum())} bars in a squeeze")
+        squeeze_count = df['squeeze'].sum()
+        squeeze_events = df['squeeze_end'].sum()
+    else:
+        # 2. Compute Indicators
+        df = compute_indicators(df, bb_window=params['bb_window'], bb_std_multiplier=params['bb_std'], atr_window=params['atr_window'])
+
+        # 3. Identify Squeezes
+        df = identify_squeeze_periods(df, bandwidth_threshold_quantile=params['bw_quantile'], atr_threshold_quantile=params['atr_quantile'],
+                                      threshold_mode=args.threshold_mode, threshold_window=args.threshold_window)
+        squeeze_count = df['squeeze'].sum()
+        squeeze_events = df['squeeze_end'].sum()
+
     print(f"Identified {squeeze_count} squeeze bars and {squeeze_events} squeeze breakout events.")
     
     if squeeze_events == 0:
@@ -41,9 +130,7 @@ def main():
         return
 
     # 4. Run Breakout Tests
-    # Hold periods: 1h, 4h, 12h, 24h, 7d (168h)
-    hold_periods = [1, 4, 12, 24, 168]
-    results_df = run_breakout_tests(df, hold_periods=hold_periods)
+    results_df = squeezes.run_breakout_tests(hold_periods) if args.compact else run_breakout_tests(df, hold_periods=hold_periods)
     
     if results_df.empty:
         print("No valid breakout tests completed (possibly not enough data after squeezes).")
@@ -59,8 +146,33 @@ def main():
     print(summary)
     
     # Optional: Save results
-    results_df.to_csv("backtest_results.csv", index=False)
+    with profiling.span("write_csv", file="backtest_results.csv"):
+        results_df.to_csv("backtest_results.csv", index=False)
     print("\nDetailed results saved to backtest_results.csv")
 
+    # 6. Optional: is the edge real? Bootstrap CIs and random-entry baseline per summary row
+    if args.resamples > 0:
+        close = squeezes.close if args.compact else df['close']
+        sig = significance_table(results_df, close, n_resamples=args.resamples, workers=args.workers)
+        print(f"\n--- Significance ({args.resamples} resamples) ---")
+        print(sig)
+        with profiling.span("write_csv", file="significance.csv"):
+            sig.to_csv("significance.csv")
+        print("Significance table saved to significance.csv")
+
+    # 7. Optional: trade the breakouts
+    if args.simulate:
+        config = TradeConfig(fee_bps=args.fee_bps, slippage_bps=args.slippage_bps, stop_atr=args.stop_atr,
+                             target_r=args.target_r, max_hold=args.max_hold)
+        trades, equity = simulate_trades(squeezes if args.compact else df, config)
+        print("\n--- Trade Simulation ---")
+        for key, value in trade_stats(trades, equity).items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+        if not trades.empty:
+            with profiling.span("write_csv", file="trades.csv, equity_curve.csv"):
+                trades.to_csv("trades.csv", index=False)
+                equity.to_csv("equity_curve.csv")
+            print("Trades saved to trades.csv, equity curve to equity_curve.csv")
+
 if __name__ == "__main__":
     main()
@@ -1,30 +1,47 @@
-from providers.derivatives import DerivativesProvider
-from providers.sentiment import SentimentProvider
-import requests
+from providers.cache import get_cache
+
+# Providers (and requests) are imported on first call, so importing this
+# module costs nothing until a metric is actually fetched
+COINGECKO_BASE = "https://api.coingecko.com/api/v3"
+
+_derivatives = None
+_sentiment = None
 
 # Backward compatibility wrapper
 def fetch_funding_and_oi(symbol: str = "BTCUSDT"):
-    return DerivativesProvider().fetch_funding_and_oi(symbol)
+    global _derivatives
+    if _derivatives is None:
+        from providers.derivatives import DerivativesProvider
+        _derivatives = DerivativesProvider()
+    return _derivatives.fetch_funding_and_oi(symbol)
 
 def fetch_fear_greed():
-    return SentimentProvider().fetch_fear_greed()
+    global _sentiment
+    if _sentiment is None:
+        from providers.sentiment import SentimentProvider
+        _sentiment = SentimentProvider()
+    return _sentiment.fetch_fear_greed()
 
-def fetch_btc_dominance_and_pairs():
-    # Keep CoinGecko logic here or move to a new provider if needed.
-    # For now, let's leave it as is but wrap it cleanly.
-    try:
-        COINGECKO_BASE = "https://api.coingecko.com/api/v3"
-        global_resp = requests.get(f"{COINGECKO_BASE}/global", timeout=10).json()
-        btc_dom = float(global_resp["data"]["market_cap_percentage"]["btc"])
+def _fetch_btc_dominance():
+    from providers.http import get_session
+    global_resp = get_session().get(f"{COINGECKO_BASE}/global", timeout=10).json()
+    return float(global_resp["data"]["market_cap_percentage"]["btc"])
 
-        prices = requests.get(
-            f"{COINGECKO_BASE}/simple/price",
-            params={"ids": "bitcoin,ethereum,solana", "vs_currencies": "btc"},
-            timeout=10
-        ).json()
+def _fetch_pairs():
+    from providers.http import get_session
+    prices = get_session().get(
+        f"{COINGECKO_BASE}/simple/price",
+        params={"ids": "bitcoin,ethereum,solana", "vs_currencies": "btc"},
+        timeout=10
+    ).json()
+    return float(prices["ethereum"]["btc"]), float(prices["solana"]["btc"])
 
-        eth_btc = float(prices["ethereum"]["btc"])
-        sol_btc = float(prices["solana"]["btc"])
+def fetch_btc_dominance_and_pairs():
+    # CoinGecko rate-limits hard: both calls go through the shared TTL cache
+    try:
+        cache = get_cache()
+        btc_dom = cache.get("coingecko_global", "coingecko_global", _fetch_btc_dominance)
+        eth_btc, sol_btc = cache.get("coingecko_prices", "coingecko_prices", _fetch_pairs)
         return btc_dom, eth_btc, sol_btc
     except Exception as e:
         print(f"Error fetching CoinGecko data: {e}")
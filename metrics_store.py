@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from providers.derivatives import OI_HISTORY_MS, DerivativesProvider
+from providers.sentiment import SentimentProvider
+
+DEFAULT_METRICS_ROOT = os.path.join("data", "metrics")
+# evaluate_scenarios inputs used when no history covers a bar (the old hardcoded replay values)
+DEFAULT_METRICS = {"funding_rate": 0.0, "oi": np.nan, "btc_dom": 55.0, "fear_value": 50}
+# Earliest start time already backfilled per series, so an old `since` isn't refetched every run
+BACKFILL_STATE = "backfill.json"
+
+def series_name(metric: str, symbol: str = "BTCUSDT") -> str:
+    """
+    Per-symbol metrics (funding, OI) are stored per symbol; market-wide ones once.
+    """
+    return f"{symbol.upper()}_{metric}" if metric in ("funding_rate", "oi") else metric
+
+def series_path(name: str, root: str = DEFAULT_METRICS_ROOT) -> str:
+    return os.path.join(root, f"{name}.csv")
+
+def read_series(name: str, root: str = DEFAULT_METRICS_ROOT) -> pd.Series:
+    """
+    Stored history as a sorted float64 Series on a naive-UTC DatetimeIndex.
+    Returns empty Series if nothing is stored.
+    """
+    path = series_path(name, root)
+    if not os.path.exists(path):
+        return pd.Series(dtype="float64", name=name)
+    df = pd.read_csv(path, parse_dates=["timestamp"], index_col="timestamp")
+    return df["value"].astype("float64").rename(name)
+
+def merge_series(name: str, values: pd.Series, root: str = DEFAULT_METRICS_ROOT) -> pd.Series:
+    """
+    Merge new points into the stored history (a newer value for the same
+    timestamp wins) and rewrite the file atomically.
+    """
+    stored = read_series(name, root)
+    if values is None or values.empty:
+        return stored
+    merged = pd.concat([s for s in (stored, values.astype("float64")) if not s.empty])
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index().rename(name)
+
+    os.makedirs(root, exist_ok=True)
+    tmp_path = series_path(name, root) + ".tmp"
+    merged.rename("value").rename_axis("timestamp").to_csv(tmp_path)
+    os.replace(tmp_path, series_path(name, root))
+    return merged
+
+def _to_ms(ts) -> int:
+    return int(pd.Timestamp(ts).as_unit("ns").value // 1_000_000)
+
+def _read_backfill_state(root: str) -> Dict[str, int]:
+    try:
+        with open(os.path.join(root, BACKFILL_STATE)) as f:
+            return {name: int(ms) for name, ms in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def _write_backfill_state(root: str, state: Dict[str, int]):
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, BACKFILL_STATE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, os.path.join(root, BACKFILL_STATE))
+
+def backfill_metrics(symbol: str = "BTCUSDT", since=None, root: str = DEFAULT_METRICS_ROOT,
+                     derivatives: Optional[DerivativesProvider] = None,
+                     sentiment: Optional[SentimentProvider] = None) -> Dict[str, int]:
+    """
+    Bring funding, OI and Fear & Greed history up to date. Only points newer
+    than the stored tail are requested, unless `since` asks for history older
+    than what was already backfilled.
+    BTC dominance has no free history endpoint; it accumulates from live
+    snapshots (record_snapshot). Returns {series: stored rows}.
+    """
+    derivatives = derivatives or DerivativesProvider()
+    sentiment = sentiment or SentimentProvider()
+    since_ms = _to_ms(since) if since is not None else 0
+    state = _read_backfill_state(root)
+    rows = {}
+
+    # OI history only reaches back OI_HISTORY_MS: an older `since` is clamped,
+    # and series that start after `since` (e.g. before a listing) are only
+    # extended back once
+    oi_floor_ms = int(time.time() * 1000) - OI_HISTORY_MS
+    for metric, fetch, floor_ms in (("funding_rate", derivatives.fetch_funding_history, 0),
+                                    ("oi", derivatives.fetch_oi_history, oi_floor_ms)):
+        name = series_name(metric, symbol)
+        stored = read_series(name, root)
+        wanted_ms = max(since_ms, floor_ms)
+        covered_ms = state.get(name, _to_ms(stored.index[0]) if not stored.empty else None)
+        extend_back = stored.empty or (since is not None and wanted_ms < covered_ms)
+        start_ms = wanted_ms if extend_back else _to_ms(stored.index[-1]) + 1
+        fetched = fetch(symbol, start_ms=start_ms)
+        if extend_back and not fetched.empty:
+            state[name] = wanted_ms
+        rows[name] = len(merge_series(name, fetched, root))
+    _write_backfill_state(root, state)
+
+    name = series_name("fear_value")
+    stored = read_series(name, root)
+    days = 0
+    if not stored.empty and since is None:
+        days = int((time.time() - stored.index[-1].timestamp()) // 86_400) + 2
+    rows[name] = len(merge_series(name, sentiment.fetch_fear_greed_history(days), root))
+    rows[series_name("btc_dom")] = len(read_series(series_name("btc_dom"), root))
+    return rows
+
+def record_snapshot(metrics: dict, ts=None, symbol: str = "BTCUSDT", root: str = DEFAULT_METRICS_ROOT):
+    """
+    Append one live reading (monitor_cli metrics dict) to the history.
+    Fallback values from failed fetches are skipped.
+    """
+    ts = pd.Timestamp.now(tz="UTC").tz_localize(None) if ts is None else pd.Timestamp(ts)
+    points = {
+        "btc_dom": metrics.get("btc_dom") or None,
+        "oi": metrics.get("oi"),
+    }
+    for metric, value in points.items():
+        if value is not None:
+            merge_series(series_name(metric, symbol), pd.Series([float(value)], index=pd.DatetimeIndex([ts])), root)
+
+def asof_values(series: pd.Series, as_of: pd.DatetimeIndex, default) -> np.ndarray:
+    """
+    Latest value at or before each as_of time, `default` before the first
+    point. One searchsorted over the whole index, no per-bar lookups.
+    """
+    if series.empty:
+        return np.full(len(as_of), default, dtype=np.float64)
+    keys = pd.DatetimeIndex(series.index).as_unit("ns").asi8
+    query = pd.DatetimeIndex(as_of).as_unit("ns").asi8
+    pos = np.searchsorted(keys, query, side="right") - 1
+    values = series.to_numpy(dtype=np.float64)[np.maximum(pos, 0)]
+    return np.where(pos >= 0, values, default)
+
+def align_metrics(as_of: pd.DatetimeIndex, symbol: str = "BTCUSDT", root: str = DEFAULT_METRICS_ROOT,
+                  defaults: Optional[dict] = None) -> pd.DataFrame:
+    """
+    As-of join of the stored histories onto bar times: one row per as_of
+    time with funding_rate, oi, btc_dom and fear_value. Pass bar close times
+    so a bar only sees metrics published before it closed.
+    """
+    defaults = dict(DEFAULT_METRICS, **(defaults or {}))
+    return pd.DataFrame({
+        metric: asof_values(read_series(series_name(metric, symbol), root), as_of, default)
+        for metric, default in defaults.items()
+    }, index=as_of)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill funding/OI/Fear & Greed history into the local metrics store")
+    parser.add_argument("--symbol", type=str, nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--since", type=str, default=None, help="Fetch history back to this date (default: only new points)")
+    parser.add_argument("--root", type=str, default=DEFAULT_METRICS_ROOT, help="Metrics store directory")
+    args = parser.parse_args()
+
+    for symbol in args.symbol:
+        rows = backfill_metrics(symbol, since=args.since, root=args.root)
+        print(f"{symbol}: " + ", ".join(f"{name} {n} rows" for name, n in rows.items()))
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,187 @@
 import argparse
-import pandas as pd
-from providers.market_data import MarketDataProvider
-from backtest_engine import compute_indicators
+import os
+import queue
+import signal
+import threading
+import time
 from thesis_config import ThesisLevels, Thresholds
+from providers.cache import configure_cache, get_cache
 from metrics_fetcher import fetch_funding_and_oi, fetch_btc_dominance_and_pairs, fetch_fear_greed
-from scenario_engine import evaluate_scenarios
-from alt_scanner import AltScanner
-from risk_engine import RiskEngine
-from logger import SignalLogger
-from alert_system import AlertSystem
+import profiling
+from profiling import span, timed
 
-def main():
-    parser = argparse.ArgumentParser(description="Microanalyst Live Thesis Monitor")
-    parser.add_argument("--symbol", type=str, default="BTCUSDT")
-    parser.add_argument("--interval", type=str, default="1h")
-    parser.add_argument("--risk_stop", type=float, default=0.0, help="Stop loss for risk calc")
-    parser.add_argument("--webhook", type=str, default=None, help="Webhook URL for alerts")
-    args = parser.parse_args()
+# Only stdlib and lightweight modules are imported above. pandas, the market
+# data provider and the engines load on first use: run_once imports them
+# inside the candle fetch thread while the metric requests are in flight,
+# and --help or a bad argument never pays for them.
 
-    # 1. Data
-    provider = MarketDataProvider()
-    df = provider.fetch_ohlcv(args.symbol, args.interval)
-    
-    if df.empty:
-        print("No data available.")
-        return
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+ALERT_STATE_PATH = os.path.join("data", "alert_state.json")
 
-    # 2. Indicators
-    df = compute_indicators(df)
+_provider = None
+_scanner = None
 
-    # 3. Metrics
-    print("Fetching live metrics...")
-    funding_rate, oi, oi_change = fetch_funding_and_oi(args.symbol)
-    btc_dom, eth_btc, sol_btc = fetch_btc_dominance_and_pairs()
-    fear_value, fear_label = fetch_fear_greed()
+def market_data():
+    """
+    Shared MarketDataProvider, created on first use.
+    """
+    global _provider
+    if _provider is None:
+        from providers.market_data import MarketDataProvider
+        _provider = MarketDataProvider()
+    return _provider
 
-    # 4. Scenarios
-    levels = ThesisLevels()
-    thresholds = Thresholds()
+def alt_scanner():
+    global _scanner
+    if _scanner is None:
+        from alt_scanner import AltScanner
+        _scanner = AltScanner(provider=market_data())
+    return _scanner
+
+def load_history(provider, args, limit=1000):
+    """
+    Latest `limit` candles. Incremental sync: only candles newer than the
+    local store are requested. With --base_interval, the base series is
+    synced (back far enough for `limit` candles) and resampled to --interval.
+    """
+    if args.base_interval and args.base_interval != args.interval:
+        return _load_resampled(provider, args, limit)
+    if args.no_cache:
+        return provider.fetch_ohlcv(args.symbol, args.interval, limit)
+    from candle_sync import CandleSync
+    try:
+        return CandleSync(provider).sync(args.symbol, args.interval).tail(limit)
+    except (ValueError, OSError) as e:
+        print(f"Candle sync unavailable ({e}); fetching directly.")
+        return provider.fetch_ohlcv(args.symbol, args.interval, limit)
+
+def _load_resampled(provider, args, limit):
+    import pandas as pd
+    from candle_sync import CandleSync, interval_to_ms
+    from resampler import resample_cached, resample_ohlcv
+    if args.no_cache:
+        base = provider.fetch_ohlcv(args.symbol, args.base_interval, 1000)
+        return resample_ohlcv(base, args.interval, args.base_interval).tail(limit)
+    since_ms = int(time.time() * 1000) - (limit + 1) * interval_to_ms(args.interval)
+    try:
+        base = CandleSync(provider).sync(args.symbol, args.base_interval, since=pd.Timestamp(since_ms, unit="ms"))
+        return resample_cached(base, args.symbol, args.interval, args.base_interval).tail(limit)
+    except (ValueError, OSError) as e:
+        print(f"Resampled history unavailable ({e}); fetching {args.interval} directly.")
+        return provider.fetch_ohlcv(args.symbol, args.interval, limit)
+
+def fetch_new_bars(provider, args, last_ms, step_ms, resampler=None):
+    """
+    Candles opened after last_ms: one klines request. With --base_interval,
+    one request for the base candles after the last one seen, folded into
+    `resampler` (a ResampleStream). Raises ConnectionError on outage.
+    """
+    if resampler is not None:
+        from candle_sync import interval_to_ms
+        base_step_ms = interval_to_ms(args.base_interval)
+        base = provider.fetch_klines(args.symbol, args.base_interval, start_ms=resampler.next_ms)
+        fresh = resampler.update(_closed_bars(base, base_step_ms))
+        # A bucket is complete once its last base bar has arrived
+        return _closed_bars(fresh, step_ms, now_ms=resampler.next_ms)
+    return provider.fetch_klines(args.symbol, args.interval, start_ms=last_ms + step_ms)
+
+# Values used when a source misses the deadline (the providers' own failure defaults)
+METRIC_FALLBACKS = {
+    "funding_oi": (0.0, None, None),
+    "dominance": (0.0, 0.0, 0.0),
+    "fear_greed": (50, "Neutral"),
+}
+
+def fan_out(calls, deadline):
+    """
+    Run {name: (fn, fallback)} concurrently and wait at most `deadline`
+    seconds in total. Returns ({name: result}, {name: latency}) where latency
+    is seconds, or "timeout"/"error" for calls that got their fallback.
+    Stragglers run on in daemon threads and never delay the caller or exit.
+    """
+    finished = queue.Queue()
+
+    def run(name, fn):
+        t0 = time.perf_counter()
+        try:
+            with span(f"fetch.{name}"):
+                value = fn()
+            finished.put((name, True, value, time.perf_counter() - t0))
+        except Exception as e:
+            finished.put((name, False, e, time.perf_counter() - t0))
+
+    for name, (fn, _) in calls.items():
+        threading.Thread(target=run, args=(name, fn), daemon=True).start()
+
+    results, latency = {}, {}
+    end = time.monotonic() + deadline
+    while len(latency) < len(calls):
+        try:
+            name, ok, value, seconds = finished.get(timeout=max(0.0, end - time.monotonic()))
+        except queue.Empty:
+            break
+        if ok:
+            results[name] = value
+            latency[name] = seconds
+        else:
+            latency[name] = "error"
+    for name, (_, fallback) in calls.items():
+        results.setdefault(name, fallback)
+    return results, {name: latency.get(name, "timeout") for name in calls}
+
+def metric_calls(symbol):
+    return {
+        "funding_oi": (lambda: fetch_funding_and_oi(symbol), METRIC_FALLBACKS["funding_oi"]),
+        "dominance": (fetch_btc_dominance_and_pairs, METRIC_FALLBACKS["dominance"]),
+        "fear_greed": (fetch_fear_greed, METRIC_FALLBACKS["fear_greed"]),
+    }
+
+def metrics_from(results):
+    funding_rate, oi, oi_change = results["funding_oi"]
+    btc_dom, eth_btc, sol_btc = results["dominance"]
+    fear_value, fear_label = results["fear_greed"]
+    return {
+        "funding_rate": funding_rate, "oi": oi, "oi_change": oi_change,
+        "btc_dom": btc_dom, "eth_btc": eth_btc, "sol_btc": sol_btc,
+        "fear_value": fear_value, "fear_label": fear_label,
+    }
+
+def fetch_metrics(symbol, deadline=10.0):
+    """
+    All live metrics fetched concurrently under one deadline.
+    Returns (metrics, latency).
+    """
+    results, latency = fan_out(metric_calls(symbol), deadline)
+    return metrics_from(results), latency
+
+@timed()
+def evaluate_bar(df, metrics, levels, thresholds, logger, alerter):
+    """
+    Scenario evaluation, logging and alerting for the last bar of df.
+    """
+    from scenario_engine import evaluate_scenarios
     eval_res = evaluate_scenarios(
         df,
         levels=levels,
         thresholds=thresholds,
-        funding_rate=funding_rate,
-        btc_dom=btc_dom,
-        fear_value=fear_value,
+        funding_rate=metrics["funding_rate"],
+        btc_dom=metrics["btc_dom"],
+        fear_value=metrics["fear_value"],
     )
 
-    # 5. Alt Scan (Optional, maybe flag to enable?)
-    print("Scanning alts...")
-    scanner = AltScanner()
-    # We pass a small slice of BTC df to scanner for comparison
-    alt_df = scanner.scan_rotation(df.tail(48))
-
-    # 6. Risk Calc
-    risk_res = {}
-    if args.risk_stop > 0:
-        risk_engine = RiskEngine()
-        risk_res = risk_engine.calculate_position(eval_res['price'], args.risk_stop)
-
-    # 7. Logging & Alerting
-    logger = SignalLogger()
     logger_data = eval_res.copy()
-    logger_data['funding'] = funding_rate
-    logger_data['btc_dom'] = btc_dom
+    logger_data['funding'] = metrics["funding_rate"]
+    logger_data['btc_dom'] = metrics["btc_dom"]
     logger.log_run(logger_data)
-    
-    alerter = AlertSystem(webhook_url=args.webhook)
+
     alerter.check_and_alert(eval_res)
+    return eval_res
 
-    # 8. Dashboard Output
-    last_idx = df.index[-1]
+def format_latency(latency):
+    return " | ".join(f"{name} {value * 1000:.0f}ms" if isinstance(value, float) else f"{name} {value.upper()} (fallback)"
+                      for name, value in latency.items())
+
+def print_dashboard(last_idx, eval_res, metrics, alt_df=None, risk_res=None, latency=None):
     print("=" * 80)
     print(f"Microanalyst Monitor @ {last_idx} (close)")
     print(f"Price: {eval_res['price']:.2f}")
@@ -78,14 +189,15 @@ def main():
           f"(compression={eval_res['compression']})")
     print(f"Liq Pulse: {eval_res.get('liquidation_pulse', 'N/A')}")
     print()
-    print(f"Funding: {funding_rate:.5f}  |  OI Change: {oi_change if oi_change is not None else 'N/A'}%")
-    print(f"Dominance: BTC {btc_dom:.1f}% | ETH/BTC {eth_btc:.5f} | SOL/BTC {sol_btc:.5f}")
-    print(f"Sentiment: {fear_value} ({fear_label})")
+    oi_change = metrics["oi_change"]
+    print(f"Funding: {metrics['funding_rate']:.5f}  |  OI Change: {oi_change if oi_change is not None else 'N/A'}%")
+    print(f"Dominance: BTC {metrics['btc_dom']:.1f}% | ETH/BTC {metrics['eth_btc']:.5f} | SOL/BTC {metrics['sol_btc']:.5f}")
+    print(f"Sentiment: {metrics['fear_value']} ({metrics['fear_label']})")
     print()
     print("Flags:", ", ".join(eval_res["scenario_flags"]))
     print("Rotation:", eval_res["rotation_phase"])
-    
-    if not alt_df.empty:
+
+    if alt_df is not None and not alt_df.empty:
         print("\n--- Alt Rotation (Top 3 vs BTC) ---")
         print(alt_df.head(3)[['symbol', 'pct_change_24h', 'rel_strength_btc']].to_string(index=False))
 
@@ -98,4 +210,223 @@ def main():
             print(f"Size: {risk_res['quantity']:.4f} BTC (${risk_res['position_notional']:.0f})")
             print(f"Lev: {risk_res['leverage']:.2f}x")
 
+    if latency:
+        print(f"\nSources: {format_latency(latency)}")
     print("=" * 80)
+
+@timed("metrics_store.record_snapshot")
+def _record(metrics, symbol):
+    """
+    Keep live readings without a history endpoint (BTC dominance, OI beyond
+    30 days) for scenario replays.
+    """
+    from metrics_store import record_snapshot
+    try:
+        record_snapshot(metrics, symbol=symbol)
+    except OSError as e:
+        print(f"Could not record metrics snapshot: {e}")
+
+def _cache_summary():
+    stats = get_cache().stats
+    return ", ".join(f"{k} {v}" for k, v in stats.items())
+
+def run_once(args):
+    # 1. Data + 3. Metrics + 5. Alt candles, fetched concurrently under one deadline
+    calls = {"ohlcv": (lambda: load_history(market_data(), args), None)}
+    calls.update(metric_calls(args.symbol))
+    if args.alts:
+        calls["alts"] = (lambda: alt_scanner().fetch_alts(), {})
+    print(f"Fetching candles, live metrics{' and alts' if args.alts else ''}...")
+    results, latency = fan_out(calls, args.deadline)
+    df = results["ohlcv"]
+
+    if df is None or df.empty:
+        print(f"No data available (ohlcv: {format_latency({'ohlcv': latency['ohlcv']})}).")
+        return
+
+    # 2. Indicators
+    from backtest_engine import compute_indicators
+    df = compute_indicators(df)
+    metrics = metrics_from(results)
+    _record(metrics, args.symbol)
+
+    # 4. Scenarios + 7. Logging & Alerting
+    levels = ThesisLevels()
+    thresholds = Thresholds()
+    alerter = make_alerter(args)
+    logger = make_logger(args)
+    eval_res = evaluate_bar(df, metrics, levels, thresholds, logger, alerter)
+    logger.close()
+
+    # 5. Alt Scan: compare the fetched alts to a small slice of BTC df
+    alt_df = alt_scanner().scan_rotation(df.tail(48), alt_frames=results["alts"]) if args.alts else None
+
+    # 6. Risk Calc
+    risk_res = {}
+    if args.risk_stop > 0:
+        from risk_engine import RiskEngine
+        risk_engine = RiskEngine()
+        risk_res = risk_engine.calculate_position(eval_res['price'], args.risk_stop)
+
+    # 8. Dashboard Output
+    print_dashboard(df.index[-1], eval_res, metrics, alt_df, risk_res, latency)
+    print(f"metrics cache: {_cache_summary()}")
+    # Webhook delivery runs in the background; give it a bounded chance to finish before exiting
+    with span("AlertSystem.flush"):
+        delivered = alerter.flush(timeout=args.deadline)
+    if not delivered:
+        print("Webhook delivery still pending at exit; undelivered alerts fire again on the next run.")
+
+def make_logger(args):
+    from logger import SignalLogger
+    return SignalLogger(args.log_file, fmt=args.log_format, max_bytes=int(args.log_max_mb * 1_000_000))
+
+def make_alerter(args):
+    # Cooldowns live on disk so one-shot runs (e.g. from cron) don't repeat the same alert;
+    # they are kept per symbol, so monitors for several symbols can share the file
+    from alert_system import AlertSystem
+    return AlertSystem(webhook_url=args.webhook, symbol=args.symbol, cooldown=args.alert_cooldown,
+                       state_path=ALERT_STATE_PATH)
+
+def _closed_bars(df, step_ms, now_ms=None):
+    """
+    Drop candles that are still open at now_ms.
+    """
+    if df.empty:
+        return df
+    from candle_sync import index_to_ms
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return df[index_to_ms(df.index) + step_ms <= now_ms]
+
+@timed()
+def _append_bars(df, new, keep, indicators):
+    """
+    Append new closed bars, keep the last `keep` rows and fill indicators for
+    the new rows only, from the streaming indicator state.
+    """
+    import pandas as pd
+    new = new[~new.index.isin(df.index)][OHLCV_COLUMNS]
+    if new.empty:
+        return df, 0
+    values = indicators.update_batch(new['high'].to_numpy(), new['low'].to_numpy(), new['close'].to_numpy())
+    new = new.assign(**values)
+    return pd.concat([df, new]).iloc[-keep:], len(new)
+
+def _stop_daemon(signum, frame):
+    raise KeyboardInterrupt
+
+def run_daemon(args):
+    """
+    Keep state in memory and evaluate each bar once, as soon as it closes.
+    Sleeps between bar closes, so idle CPU/network use is ~zero.
+    Ctrl+C and SIGTERM stop it after writing the log and flushing alerts.
+    """
+    from backtest_engine import IndicatorStream
+    from candle_sync import index_to_ms, interval_to_ms
+    from risk_engine import RiskEngine
+    provider = market_data()
+    step_ms = interval_to_ms(args.interval)
+    df = _closed_bars(load_history(provider, args, limit=args.history), step_ms)
+    if df.empty:
+        print("No data available.")
+        return
+    indicators = IndicatorStream()
+    df = df[OHLCV_COLUMNS].assign(**indicators.update_batch(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy()))
+    resampler = None
+    if args.base_interval and args.base_interval != args.interval:
+        # Later ticks fetch only new base candles; the newest bucket's base bars stay in memory
+        from resampler import ResampleStream
+        resampler = ResampleStream(args.interval, args.base_interval, int(index_to_ms(df.index)[-1]) + step_ms)
+
+    levels = ThesisLevels()
+    thresholds = Thresholds()
+    logger = make_logger(args)
+    alerter = make_alerter(args)
+    risk_engine = RiskEngine() if args.risk_stop > 0 else None
+    print(f"Daemon started for {args.symbol} {args.interval}: {len(df)} closed bars, last {df.index[-1]}")
+
+    previous_handler = signal.signal(signal.SIGTERM, _stop_daemon)
+    try:
+        while True:
+            # The bar after the last closed one closes one interval after it opened
+            next_close = (index_to_ms(df.index)[-1] + 2 * step_ms) / 1000 + args.grace
+            time.sleep(max(0.0, next_close - time.time()))
+
+            try:
+                fresh = fetch_new_bars(provider, args, int(index_to_ms(df.index)[-1]), step_ms, resampler)
+            except ConnectionError as e:
+                print(f"Fetch failed ({e}); retrying in {args.grace:.0f}s")
+                time.sleep(args.grace)
+                continue
+
+            t0 = time.perf_counter()
+            df, added = _append_bars(df, _closed_bars(fresh, step_ms), args.history, indicators)
+            if not added:
+                # Exchange hasn't published the closed bar yet
+                time.sleep(args.grace)
+                continue
+            t_bars = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            metrics, latency = fetch_metrics(args.symbol, args.deadline)
+            _record(metrics, args.symbol)
+            t_fetch = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            eval_res = evaluate_bar(df, metrics, levels, thresholds, logger, alerter)
+            risk_res = risk_engine.calculate_position(eval_res['price'], args.risk_stop) if risk_engine else None
+            t_eval = time.perf_counter() - t0
+
+            print_dashboard(df.index[-1], eval_res, metrics, risk_res=risk_res, latency=latency)
+            print(f"tick: {(t_bars + t_eval) * 1000:.1f}ms compute, {t_fetch * 1000:.0f}ms metrics fetch, {added} new bar(s)")
+            print(f"metrics cache: {_cache_summary()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        logger.close()
+        alerter.flush(timeout=args.deadline)
+        print("Daemon stopped.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Microanalyst Live Thesis Monitor")
+    parser.add_argument("--symbol", type=str, default="BTCUSDT")
+    parser.add_argument("--interval", type=str, default="1h")
+    parser.add_argument("--base_interval", type=str, default=None,
+                        help="Sync only this interval (e.g. 1m) and derive --interval from it")
+    parser.add_argument("--risk_stop", type=float, default=0.0, help="Stop loss for risk calc")
+    parser.add_argument("--webhook", type=str, default=None, help="Webhook URL for alerts")
+    parser.add_argument("--alert_cooldown", type=float, default=3600.0,
+                        help="Seconds before the same alert flag fires again (kept across runs)")
+    parser.add_argument("--no_cache", action="store_true", help="Refetch the latest 1000 candles instead of syncing the local store")
+    parser.add_argument("--daemon", action="store_true", help="Stay running and evaluate each bar as it closes")
+    parser.add_argument("--history", type=int, default=1000, help="Bars kept in memory in daemon mode")
+    parser.add_argument("--grace", type=float, default=2.0, help="Seconds to wait after bar close before fetching (daemon)")
+    parser.add_argument("--deadline", type=float, default=15.0,
+                        help="Seconds allowed for all concurrent fetches; late sources use fallback values")
+    parser.add_argument("--metrics_cache", type=str, default="data/metrics_cache.json",
+                        help="File sharing cached funding/OI/dominance/sentiment across runs ('' = memory only)")
+    parser.add_argument("--log_file", type=str, default="monitor_log.csv",
+                        help="Signal log: CSV file, or directory with --log_format columnar")
+    parser.add_argument("--log_format", type=str, choices=["csv", "columnar"], default="csv")
+    parser.add_argument("--alts", action=argparse.BooleanOptionalAction, default=True,
+                        help="Fetch and scan the altcoin watchlist (--no-alts skips it, e.g. for per-symbol cron runs)")
+    parser.add_argument("--log_max_mb", type=float, default=10.0, help="Rotate the signal log beyond this size")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    configure_cache(disk_path=args.metrics_cache or None)
+    profiling.start(args)
+    try:
+        if args.daemon:
+            run_daemon(args)
+        else:
+            run_once(args)
+            # Stale metrics refresh in daemon threads; let them reach the disk cache for the next run
+            if not get_cache().wait_for_refreshes(timeout=args.deadline):
+                print("Metrics cache refresh still running at exit; the next run refreshes again.")
+    finally:
+        profiling.finish(args)
+
+if __name__ == "__main__":
+    main()
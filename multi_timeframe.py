@@ -0,0 +1,67 @@
+from typing import List
+import numpy as np
+import pandas as pd
+from candle_sync import index_to_ms, interval_to_ms
+from backtest_engine import compute_indicators, identify_squeeze_periods, mark_squeezes
+from resampler import resample_ohlcv
+from profiling import timed
+
+def align_to_base(values: np.ndarray, tf_close_ms: np.ndarray, base_close_ms: np.ndarray, fill=np.nan) -> np.ndarray:
+    """
+    Forward-fill a higher-timeframe series onto base bars without look-ahead:
+    each base bar gets the value of the last higher-timeframe candle that had
+    closed by the base bar's close (`fill` before the first one).
+    One searchsorted over all bars.
+    """
+    pos = np.searchsorted(tf_close_ms, base_close_ms, side="right") - 1
+    return np.where(pos >= 0, values[np.maximum(pos, 0)], fill)
+
+def timeframe_squeeze(df: pd.DataFrame, interval: str, base_interval: str, bb_window=20, bb_std_multiplier=2,
+                      atr_window=14, bandwidth_threshold_quantile=0.10, atr_threshold_quantile=0.10,
+                      threshold_mode="global", threshold_window=720) -> np.ndarray:
+    """
+    Squeeze mask of `interval` candles resampled from df, aligned to df's bars.
+    Indicators and thresholds run on the (much shorter) resampled frame;
+    threshold_window counts `interval` bars.
+    """
+    tf = resample_ohlcv(df, interval, base_interval)
+    tf = compute_indicators(tf, bb_window=bb_window, bb_std_multiplier=bb_std_multiplier, atr_window=atr_window)
+    tf = identify_squeeze_periods(tf, bandwidth_threshold_quantile, atr_threshold_quantile,
+                                  threshold_mode=threshold_mode, threshold_window=threshold_window)
+    tf_close_ms = index_to_ms(tf.index) + interval_to_ms(interval)
+    base_close_ms = index_to_ms(df.index) + interval_to_ms(base_interval)
+    return align_to_base(tf['squeeze'].to_numpy(dtype=bool), tf_close_ms, base_close_ms, fill=False).astype(bool)
+
+@timed()
+def multi_timeframe_squeezes(df: pd.DataFrame, base_interval: str, intervals: List[str], combine: str = "all",
+                             bb_window=20, bb_std_multiplier=2, atr_window=14, bandwidth_threshold_quantile=0.10,
+                             atr_threshold_quantile=0.10, threshold_mode="global", threshold_window=720) -> pd.DataFrame:
+    """
+    Squeeze confluence across timeframes derived from one base series.
+    Adds df indicators, a 'squeeze_<interval>' column per interval and the
+    combined 'squeeze'/'squeeze_start'/'squeeze_end' columns (all intervals
+    in a squeeze with combine="all", at least one with "any"), so
+    run_breakout_tests can consume the result directly. Breakout direction
+    is still judged on the base bars' bands.
+    """
+    if combine not in ("all", "any"):
+        raise ValueError(f"Unknown combine: {combine}")
+    params = dict(bb_window=bb_window, bb_std_multiplier=bb_std_multiplier, atr_window=atr_window)
+    quantiles = dict(bandwidth_threshold_quantile=bandwidth_threshold_quantile,
+                     atr_threshold_quantile=atr_threshold_quantile,
+                     threshold_mode=threshold_mode, threshold_window=threshold_window)
+
+    df = compute_indicators(df, **params)
+    masks = []
+    for interval in intervals:
+        if interval == base_interval:
+            mask = identify_squeeze_periods(df, **quantiles)['squeeze'].to_numpy(dtype=bool)
+        else:
+            mask = timeframe_squeeze(df, interval, base_interval, **params, **quantiles)
+        df[f'squeeze_{interval}'] = mask
+        masks.append(mask)
+
+    if not masks:
+        return mark_squeezes(df, np.zeros(len(df), dtype=bool))
+    combined = np.logical_and.reduce(masks) if combine == "all" else np.logical_or.reduce(masks)
+    return mark_squeezes(df, combined)
@@ -0,0 +1,294 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from file_lock import locked
+
+DEFAULT_STORE_ROOT = os.path.join("data", "store")
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+META_FILE = "meta.json"
+
+def partition_path(symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT) -> str:
+    """
+    Directory holding one symbol/interval partition: <root>/<SYMBOL>/<interval>/
+    """
+    return os.path.join(root, symbol.upper(), interval)
+
+def partition_exists(symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT) -> bool:
+    return os.path.exists(os.path.join(partition_path(symbol, interval, root), META_FILE))
+
+def _meta_at(path: str) -> Optional[dict]:
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def read_meta(symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT) -> Optional[dict]:
+    path = partition_path(symbol, interval, root)
+    if not os.path.isdir(os.path.dirname(path)):
+        return None
+    # Under the partition lock so a write_partition swap is never seen half done
+    with locked(path):
+        return _meta_at(path)
+
+def write_partition(df: pd.DataFrame, symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT,
+                    source: Optional[str] = None, extra_meta: Optional[dict] = None) -> str:
+    """
+    Write df (DatetimeIndex + OHLCV columns) as one .npy file per column:
+    int64 epoch timestamps (unit recorded in meta.json) and float64 OHLCV.
+    The partition is built in a private temp directory and swapped in under
+    the partition lock, so readers never see a half-written store and
+    concurrent writers don't share scratch space; the last swap wins.
+    """
+    path = partition_path(symbol, interval, root)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f".{interval}.", suffix=".tmp", dir=parent)
+    old_path = None
+    try:
+        _write_columns(df, symbol, interval, tmp_path, source, extra_meta)
+        with locked(path):
+            if os.path.exists(path):
+                old_path = tmp_path + ".old"
+                os.rename(path, old_path)
+            os.rename(tmp_path, path)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    if old_path is not None:
+        # Readers that opened the old columns keep their memory maps
+        shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+def _write_columns(df: pd.DataFrame, symbol: str, interval: str, path: str, source: Optional[str],
+                   extra_meta: Optional[dict]):
+    """
+    Column files and meta.json of one partition, written into `path`.
+    """
+    index = pd.DatetimeIndex(df.index)
+    tz = str(index.tz) if index.tz is not None else None
+    if tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    unit = np.datetime_data(index.values.dtype)[0]
+    np.save(os.path.join(path, "timestamp.npy"), index.asi8)
+    for col in OHLCV_COLUMNS:
+        np.save(os.path.join(path, f"{col}.npy"), df[col].to_numpy(dtype=np.float64))
+
+    meta = {
+        "symbol": symbol.upper(),
+        "interval": interval,
+        "rows": len(df),
+        "columns": OHLCV_COLUMNS,
+        "index_name": df.index.name or "timestamp",
+        "time_unit": unit,
+        "tz": tz,
+        "source": os.path.abspath(source) if source else None,
+        "source_mtime": os.path.getmtime(source) if source and os.path.exists(source) else None,
+    }
+    meta.update(extra_meta or {})
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+def _write_meta(path: str, meta: dict):
+    tmp_meta = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, os.path.join(path, META_FILE))
+
+def _append_npy(filepath: str, values: np.ndarray, rows: Optional[int] = None):
+    """
+    Append 1-D values to an .npy file in place by growing the shape in its
+    header (numpy pads headers so the length can grow) and writing at the end.
+    With `rows`, the values go after the first `rows` elements and anything
+    beyond them (left by an interrupted append) is overwritten.
+    """
+    with open(filepath, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version != (1, 0):
+            raise ValueError(f"Unsupported .npy version {version} in {filepath}")
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        header_len = f.tell()
+        rows = shape[0] if rows is None else rows
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": fortran_order,
+            "shape": (rows + len(values),),
+        })
+        if len(header.getvalue()) != header_len:
+            raise ValueError(f"Header of {filepath} cannot grow in place")
+
+        f.seek(header_len + rows * dtype.itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(header.getvalue())
+
+def append_partition(df: pd.DataFrame, symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT,
+                     extra_meta: Optional[dict] = None) -> bool:
+    """
+    Append rows at the tail of an existing partition without rewriting it.
+    A row with the same timestamp as the stored last bar replaces it (that
+    candle may still have been open). Returns False if df reaches further back
+    than the stored tail, or the partition can't be appended to; callers then
+    fall back to write_partition.
+    Runs under the partition lock, and the new row count reaches meta.json
+    only after every column is written; readers stop at that count.
+    """
+    path = partition_path(symbol, interval, root)
+    if not os.path.isdir(os.path.dirname(path)):
+        return False
+    with locked(path):
+        meta = _meta_at(path)
+        if meta is None or meta.get("tz"):
+            return False
+        if df.empty:
+            return True
+
+        unit = meta.get("time_unit", "ns")
+        new_ts = pd.DatetimeIndex(df.index).as_unit(unit).asi8
+        if np.any(np.diff(new_ts) <= 0):
+            return False
+
+        stored_ts = np.load(os.path.join(path, "timestamp.npy"), mmap_mode="r")
+        n = meta.get("rows", len(stored_ts))
+        last = int(stored_ts[n - 1]) if n else None
+        del stored_ts
+        if last is not None and new_ts[0] < last:
+            return False
+        replace_last = last is not None and new_ts[0] == last
+
+        columns = {"timestamp": new_ts}
+        columns.update({col: df[col].to_numpy(dtype=np.float64) for col in meta["columns"]})
+        kept = n - int(replace_last)
+        try:
+            for name, values in columns.items():
+                _append_npy(os.path.join(path, f"{name}.npy"), values, rows=kept)
+        except ValueError as e:
+            print(f"Could not append to {path}: {e}")
+            return False
+
+        meta["rows"] = kept + len(new_ts)
+        meta.update(extra_meta or {})
+        _write_meta(path, meta)
+        return True
+
+def cache_partition(df: pd.DataFrame, symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT,
+                    source: Optional[str] = None) -> bool:
+    """
+    Best-effort cache of a parsed/fetched frame. Never replaces a partition
+    that came from somewhere else (e.g. a synced history from candle_sync).
+    """
+    if not is_storable(df):
+        return False
+    meta = read_meta(symbol, interval, root)
+    if meta is not None and meta.get("origin") == "sync":
+        return False
+    try:
+        write_partition(df, symbol, interval, root, source=source)
+        return True
+    except OSError as e:
+        print(f"Could not write columnar store for {symbol} {interval}: {e}")
+        return False
+
+def read_partition(symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT, mmap: bool = True) -> pd.DataFrame:
+    """
+    Open a partition as a DataFrame. With mmap=True the columns are read-only
+    memory maps of the .npy files, so loading is near zero-copy.
+    Returns empty DataFrame if the partition does not exist.
+    """
+    path = partition_path(symbol, interval, root)
+    if not os.path.isdir(os.path.dirname(path)):
+        return pd.DataFrame()
+    mode = "r" if mmap else None
+    # Open everything under the lock; the memory maps stay valid after a later swap
+    with locked(path):
+        meta = _meta_at(path)
+        if meta is None:
+            return pd.DataFrame()
+        # Columns can run past meta's row count if an append was interrupted
+        rows = slice(meta.get("rows"))
+        ts = np.load(os.path.join(path, "timestamp.npy"), mmap_mode=mode)[rows]
+        columns = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mode)[rows] for col in meta["columns"]}
+
+    unit = meta.get("time_unit", "ns")
+    index = pd.DatetimeIndex(ts.view(f"datetime64[{unit}]"), name=meta.get("index_name", "timestamp"))
+    if meta.get("tz"):
+        index = index.tz_localize("UTC").tz_convert(meta["tz"])
+    return pd.DataFrame(columns, index=index, copy=False)
+
+def parse_csv_name(filepath: str) -> Tuple[str, str]:
+    """
+    (SYMBOL, interval) from a SYMBOL_interval.csv file name; empty strings if
+    the name does not follow that pattern.
+    """
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    symbol, _, interval = stem.partition("_")
+    return symbol.upper(), interval
+
+def load_if_fresh(filepath: str, symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT) -> Optional[pd.DataFrame]:
+    """
+    Return the stored partition if it was converted from `filepath` and the
+    file has not changed since. If the file is gone, the partition is served
+    when it was converted from that path, or when it has no source file (e.g.
+    synced) and the path names its symbol and interval (SYMBOL_interval.csv).
+    None means: parse the file.
+    """
+    meta = read_meta(symbol, interval, root)
+    if meta is None:
+        return None
+    if os.path.exists(filepath):
+        if meta.get("source") != os.path.abspath(filepath):
+            return None
+        if meta.get("source_mtime") != os.path.getmtime(filepath):
+            return None
+    elif meta.get("source"):
+        if meta["source"] != os.path.abspath(filepath):
+            return None
+    elif parse_csv_name(filepath) != (str(meta.get("symbol", "")).upper(), meta.get("interval")):
+        return None
+    return read_partition(symbol, interval, root)
+
+def is_storable(df: pd.DataFrame) -> bool:
+    """
+    The store only holds plain OHLCV; frames with extra columns stay CSV-only.
+    """
+    return (not df.empty and isinstance(df.index, pd.DatetimeIndex)
+            and sorted(df.columns) == sorted(OHLCV_COLUMNS))
+
+def convert_csv(csv_path: str, symbol: str, interval: str, root: str = DEFAULT_STORE_ROOT) -> str:
+    """
+    One-shot CSV -> store conversion.
+    """
+    from data_loader import read_ohlcv_csv
+    df = read_ohlcv_csv(csv_path)
+    if not is_storable(df):
+        raise ValueError(f"{csv_path} is not a plain OHLCV file: columns={list(df.columns)}")
+    return write_partition(df, symbol, interval, root, source=csv_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert OHLCV CSV files into the memory-mapped columnar store")
+    parser.add_argument("files", nargs="+", help="CSV files to convert")
+    parser.add_argument("--symbol", type=str, default=None, help="Symbol (default: parsed from SYMBOL_interval.csv)")
+    parser.add_argument("--interval", type=str, default=None, help="Interval (default: parsed from SYMBOL_interval.csv)")
+    parser.add_argument("--root", type=str, default=DEFAULT_STORE_ROOT, help="Store root directory")
+    args = parser.parse_args()
+
+    for csv_path in args.files:
+        parsed_symbol, parsed_interval = parse_csv_name(csv_path)
+        symbol = args.symbol or parsed_symbol
+        interval = args.interval or parsed_interval
+        if not symbol or not interval:
+            print(f"Skipping {csv_path}: pass --symbol/--interval or name it SYMBOL_interval.csv")
+            continue
+        path = convert_csv(csv_path, symbol, interval, args.root)
+        print(f"Converted {csv_path} -> {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from backtest_engine import (compute_atr, set_band_multiplier, identify_squeeze_periods, run_breakout_tests,
+                             summarize_results, threshold_ranks)
+from profiling import timed
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+PARAM_COLUMNS = ["bb_window", "bb_std", "atr_window", "bw_quantile", "atr_quantile"]
+
+# Per-process state: the shared OHLCV frame and cached indicator columns
+_worker_shm = None
+_worker_df = None
+_bands_cache: Dict[int, Tuple[pd.Series, pd.Series]] = {}
+_atr_cache: Dict[int, pd.Series] = {}
+_atr_rank_cache: Dict[Tuple[int, str, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+def build_grid(bb_window, bb_std, atr_window, bw_quantile, atr_quantile) -> List[Dict[str, float]]:
+    """
+    Cartesian product of the given parameter lists, one dict per combination.
+    """
+    return [dict(zip(PARAM_COLUMNS, combo))
+            for combo in itertools.product(bb_window, bb_std, atr_window, bw_quantile, atr_quantile)]
+
+def _to_shared(df: pd.DataFrame) -> Tuple[shared_memory.SharedMemory, int]:
+    """
+    Copy the int64 timestamps and float64 OHLCV columns into one shared block:
+    row 0 = timestamps (ns), rows 1..5 = open/high/low/close/volume.
+    """
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(n, 1) * 8 * (1 + len(OHLCV_COLUMNS)))
+    try:
+        block = np.ndarray((1 + len(OHLCV_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+        block[0].view(np.int64)[:] = df.index.values.astype("datetime64[ns]").view(np.int64)
+        for i, col in enumerate(OHLCV_COLUMNS, start=1):
+            block[i] = df[col].to_numpy(dtype=np.float64)
+    except Exception:
+        # e.g. a missing column: don't leave the segment behind in /dev/shm
+        block = None
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, n
+
+def _from_shared(buf, n: int) -> pd.DataFrame:
+    block = np.ndarray((1 + len(OHLCV_COLUMNS), n), dtype=np.float64, buffer=buf)
+    index = pd.DatetimeIndex(block[0].view("datetime64[ns]"), name="timestamp")
+    return pd.DataFrame({col: block[i] for i, col in enumerate(OHLCV_COLUMNS, start=1)}, index=index, copy=False)
+
+def _init_worker(shm_name: str, n: int):
+    global _worker_shm, _worker_df
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_df = _from_shared(_worker_shm.buf, n)
+    _bands_cache.clear()
+    _atr_cache.clear()
+    _atr_rank_cache.clear()
+
+def _release_worker():
+    global _worker_shm, _worker_df
+    _bands_cache.clear()
+    _atr_cache.clear()
+    _atr_rank_cache.clear()
+    _worker_df = None
+    if _worker_shm is not None:
+        _worker_shm.close()
+        _worker_shm = None
+
+def _indicator_frame(bb_window: int, atr_window: int) -> pd.DataFrame:
+    """
+    Frame with BB mid/std and ATR for the given windows, reusing the
+    rolling columns already computed in this process for either window.
+    """
+    if bb_window not in _bands_cache:
+        close = _worker_df['close']
+        _bands_cache[bb_window] = (close.rolling(window=bb_window).mean(),
+                                   close.rolling(window=bb_window).std(ddof=0))
+    if atr_window not in _atr_cache:
+        _atr_cache[atr_window] = compute_atr(_worker_df[['high', 'low', 'close']].copy(), atr_window)['atr']
+
+    df = _worker_df.copy(deep=False)
+    df['bb_mid'], df['bb_std'] = _bands_cache[bb_window]
+    df['atr'] = _atr_cache[atr_window]
+    return df
+
+def _run_group(task) -> List[pd.DataFrame]:
+    """
+    Evaluate every (bw_quantile, atr_quantile) pair for one
+    (bb_window, atr_window, bb_std) group on the shared data.
+    """
+    bb_window, atr_window, bb_std, quantile_pairs, hold_periods, threshold_mode, threshold_window = task
+    df = set_band_multiplier(_indicator_frame(bb_window, atr_window), bb_std)
+
+    ranks = None
+    if threshold_mode != "global":
+        # Rank arrays don't depend on the quantile level: one pass per column serves every pair
+        atr_key = (atr_window, threshold_mode, threshold_window)
+        if atr_key not in _atr_rank_cache:
+            _atr_rank_cache[atr_key] = threshold_ranks(df['atr'], threshold_mode, threshold_window)
+        ranks = {'bb_bandwidth': threshold_ranks(df['bb_bandwidth'], threshold_mode, threshold_window),
+                 'atr': _atr_rank_cache[atr_key]}
+
+    out = []
+    for bw_q, atr_q in quantile_pairs:
+        identify_squeeze_periods(df, bandwidth_threshold_quantile=bw_q, atr_threshold_quantile=atr_q,
+                                 threshold_mode=threshold_mode, threshold_window=threshold_window, ranks=ranks)
+        summary = summarize_results(run_breakout_tests(df, hold_periods=hold_periods))
+        if summary.empty:
+            continue
+        summary = summary.reset_index()
+        params = dict(bb_window=bb_window, bb_std=bb_std, atr_window=atr_window,
+                      bw_quantile=bw_q, atr_quantile=atr_q, squeeze_events=int(df['squeeze_end'].sum()))
+        for pos, (key, value) in enumerate(params.items()):
+            summary.insert(pos, key, value)
+        out.append(summary)
+    return out
+
+@timed()
+def run_sweep(df: pd.DataFrame, grid: List[Dict[str, float]], hold_periods=[1, 4, 12, 24, 168], workers=None,
+              threshold_mode: str = "global", threshold_window: int = 720) -> pd.DataFrame:
+    """
+    Run the squeeze backtest for every parameter combination in `grid`.
+    OHLCV is placed in shared memory once; combinations are grouped by
+    (bb_window, atr_window, bb_std) so each task reuses one indicator set,
+    and each worker caches rolling columns across tasks sharing a window.
+    threshold_mode/threshold_window are passed to identify_squeeze_periods.
+    Returns one table of summarize_results rows, prefixed by the parameters.
+    """
+    if df.empty or not grid:
+        return pd.DataFrame()
+
+    groups: Dict[Tuple[int, int, float], List[Tuple[float, float]]] = {}
+    for p in grid:
+        key = (int(p['bb_window']), int(p['atr_window']), float(p['bb_std']))
+        groups.setdefault(key, []).append((float(p['bw_quantile']), float(p['atr_quantile'])))
+    # Sorting keeps same-window groups adjacent so per-worker caches hit more often
+    tasks = [(bb_w, atr_w, bb_s, pairs, list(hold_periods), threshold_mode, threshold_window) for (bb_w, atr_w, bb_s), pairs in sorted(groups.items())]
+
+    workers = workers or os.cpu_count() or 1
+    shm, n = _to_shared(df)
+    try:
+        if workers == 1:
+            _init_worker(shm.name, n)
+            try:
+                results = [_run_group(t) for t in tasks]
+            finally:
+                _release_worker()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shm.name, n)) as pool:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                results = list(pool.map(_run_group, tasks, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    frames = [frame for group in results for frame in group]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,186 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Spans only record while enabled; disabled, span() returns a shared no-op
+# and timed() wrappers cost one global lookup per call
+_enabled = False
+_events: List[tuple] = []
+_profiler = None
+_t0_ns = 0
+
+def _rss_mb() -> float:
+    """
+    Current resident set size (Linux /proc; elsewhere the peak from getrusage).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+class _Span:
+    __slots__ = ("name", "args", "start", "rss")
+
+    def __init__(self, name: str, args: Optional[dict]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.rss = _rss_mb()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        _events.append((self.name, threading.get_native_id(), self.start, end - self.start,
+                        self.rss, _rss_mb(), self.args))
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, **args):
+    """
+    Context manager timing one pipeline stage (wall time and RSS before/after).
+    Keyword arguments are attached to the Chrome-trace event.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+def timed(name: Optional[str] = None):
+    """
+    Decorator: every call of the function is a span named `name`
+    (default: its qualified name).
+    """
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            if not _enabled:
+                return fn(*a, **kw)
+            with _Span(label, None):
+                return fn(*a, **kw)
+        return wrapper
+    return decorate
+
+def enable(cprofile: bool = False):
+    """
+    Start recording spans (and, with cprofile=True, a cProfile of the calling thread).
+    """
+    global _enabled, _profiler, _t0_ns
+    _events.clear()
+    _t0_ns = time.perf_counter_ns()
+    _enabled = True
+    if cprofile:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def disable():
+    global _enabled
+    _enabled = False
+    if _profiler is not None:
+        _profiler.disable()
+
+def is_enabled() -> bool:
+    return _enabled
+
+def summary() -> List[Dict[str, object]]:
+    """
+    Per-stage totals over the recorded spans, slowest first: calls, total and
+    max seconds, share of the profiled wall time, and the largest RSS growth
+    during one call. Nested spans are counted in their parents as well;
+    work in worker processes is only seen as the parent call.
+    """
+    wall = max((time.perf_counter_ns() - _t0_ns) / 1e9, 1e-9)
+    stages: Dict[str, Dict[str, object]] = {}
+    for name, _, _, dur, rss_before, rss_after, _ in list(_events):
+        stage = stages.setdefault(name, {"stage": name, "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rss_delta_mb": 0.0})
+        stage["calls"] += 1
+        stage["seconds"] += dur / 1e9
+        stage["max_seconds"] = max(stage["max_seconds"], dur / 1e9)
+        stage["rss_delta_mb"] = max(stage["rss_delta_mb"], rss_after - rss_before)
+    for stage in stages.values():
+        stage["share"] = stage["seconds"] / wall
+    return sorted(stages.values(), key=lambda s: s["seconds"], reverse=True)
+
+def print_report():
+    rows = summary()
+    wall = (time.perf_counter_ns() - _t0_ns) / 1e9
+    print("\n--- Profile (wall {:.3f}s, RSS {:.1f} MB) ---".format(wall, _rss_mb()))
+    if not rows:
+        print("No spans recorded.")
+        return
+    print(f"{'stage':44s} {'calls':>6s} {'total s':>9s} {'max s':>9s} {'share':>7s} {'RSS +MB':>8s}")
+    for row in rows:
+        print(f"{row['stage'][:44]:44s} {row['calls']:6d} {row['seconds']:9.4f} {row['max_seconds']:9.4f} "
+              f"{row['share'] * 100:6.1f}% {row['rss_delta_mb']:8.1f}")
+
+def export_chrome_trace(path: str):
+    """
+    Write the spans as Chrome trace events (open in chrome://tracing or Perfetto).
+    """
+    pid = os.getpid()
+    events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+               "ts": (start - _t0_ns) / 1000, "dur": dur / 1000,
+               "args": dict(args or {}, rss_mb=round(rss_after, 1), rss_delta_mb=round(rss_after - rss_before, 1))}
+              for name, tid, start, dur, rss_before, rss_after, args in list(_events)]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    print(f"Chrome trace with {len(events)} spans written to {path}")
+
+def dump_cprofile(path: str):
+    """
+    Save the cProfile stats (load with pstats or snakeviz).
+    """
+    if _profiler is None:
+        print("cProfile was not enabled; no stats written.")
+        return
+    _profiler.dump_stats(path)
+    print(f"cProfile stats written to {path}")
+
+def add_arguments(parser):
+    parser.add_argument("--profile", action="store_true", help="Print a per-stage timing/memory breakdown at exit")
+    parser.add_argument("--profile_trace", type=str, default=None,
+                        help="Also write the stages as Chrome-trace JSON to this file (implies --profile)")
+    parser.add_argument("--profile_cprofile", type=str, default=None,
+                        help="Also run cProfile and write its stats to this file (implies --profile)")
+
+def start(args) -> bool:
+    """
+    Enable profiling if the CLI asked for it. Returns True when enabled.
+    """
+    if not (args.profile or args.profile_trace or args.profile_cprofile):
+        return False
+    enable(cprofile=bool(args.profile_cprofile))
+    return True
+
+def finish(args):
+    """
+    Stop profiling and write the report/exports requested on the CLI.
+    """
+    if not _enabled:
+        return
+    disable()
+    print_report()
+    if args.profile_trace:
+        export_chrome_trace(args.profile_trace)
+    if args.profile_cprofile:
+        dump_cprofile(args.profile_cprofile)
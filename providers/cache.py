@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds a fetched value counts as fresh, per endpoint
+DEFAULT_TTLS = {
+    "funding": 60,
+    "open_interest": 300,
+    "fear_greed": 3600,
+    "coingecko_global": 300,
+    "coingecko_prices": 120,
+}
+# A stale value is served (while refreshing in the background) up to this many TTLs old
+STALE_FACTOR = 10
+
+_cache: Optional["TTLCache"] = None
+_lock = threading.Lock()
+
+def get_cache() -> "TTLCache":
+    """
+    Process-wide cache shared by the metrics providers (memory only until
+    configure_cache() gives it a disk file).
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = TTLCache()
+        return _cache
+
+def configure_cache(disk_path: Optional[str] = None, ttls: Optional[Dict[str, float]] = None) -> "TTLCache":
+    """
+    Replace the shared cache, e.g. to persist entries across CLI runs.
+    """
+    global _cache
+    with _lock:
+        _cache = TTLCache(disk_path=disk_path, ttls=ttls)
+        return _cache
+
+class TTLCache:
+    """
+    Key/value cache for upstream API results:
+    - fresh (younger than the endpoint TTL): returned without a request
+    - stale (up to STALE_FACTOR TTLs old): returned immediately while one
+      background thread refreshes it (stale-while-revalidate)
+    - missing/expired: fetched inline; concurrent callers of the same key wait
+      for a single request
+    A failed fetch falls back to any cached value, however old. With
+    `disk_path`, entries are also kept in a JSON file so separate runs share them.
+    Loaders must raise on failure rather than return placeholder values.
+    """
+    def __init__(self, disk_path: Optional[str] = None, ttls: Optional[Dict[str, float]] = None):
+        self.disk_path = disk_path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refreshed = threading.Condition(self._lock)
+        if disk_path:
+            self._load_disk()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, endpoint: str, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Cached loader() result for key; `endpoint` selects the TTL.
+        Raises the loader's exception only when nothing is cached.
+        """
+        ttl = self.ttls.get(endpoint, 60) if ttl is None else ttl
+        entry = self._entries.get(key)
+        age = time.time() - entry["ts"] if entry else None
+        if entry and age < ttl:
+            self._count("hits")
+            return entry["value"]
+        if entry and age < ttl * STALE_FACTOR:
+            self._count("stale_hits")
+            self._refresh_async(key, loader)
+            return entry["value"]
+
+        with self._key_lock(key):
+            # Another caller may have fetched it while we waited
+            entry = self._entries.get(key)
+            if entry and time.time() - entry["ts"] < ttl:
+                self._count("hits")
+                return entry["value"]
+            self._count("misses")
+            return self._fetch(key, loader, fallback=entry)
+
+    def _fetch(self, key: str, loader: Callable[[], Any], fallback=None) -> Any:
+        try:
+            value = loader()
+        except Exception:
+            self._count("errors")
+            if fallback is None:
+                raise
+            return fallback["value"]
+        self.set(key, value)
+        return value
+
+    def _refresh_async(self, key: str, loader: Callable[[], Any]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.stats["refreshes"] += 1
+
+        def run():
+            try:
+                with self._key_lock(key):
+                    self._fetch(key, loader, fallback=self._entries.get(key))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+                    self._refreshed.notify_all()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def wait_for_refreshes(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the background refreshes have finished (and reached the
+        disk tier). Refresh threads are daemons, so a one-shot run calls this
+        before exiting. Returns False if `timeout` ran out first.
+        """
+        with self._refreshed:
+            return self._refreshed.wait_for(lambda: not self._refreshing, timeout)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = {"value": value, "ts": time.time()}
+        if self.disk_path:
+            self._save_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load_disk(self):
+        try:
+            with open(self.disk_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in stored.items():
+            value = entry.get("value")
+            # JSON has no tuples; providers return tuples
+            self._entries[key] = {"value": tuple(value) if isinstance(value, list) else value, "ts": entry.get("ts", 0.0)}
+
+    def _save_disk(self):
+        with self._lock:
+            snapshot = {k: {"value": e["value"], "ts": e["ts"]} for k, e in self._entries.items()}
+        try:
+            os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+            tmp_path = f"{self.disk_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.disk_path)
+        except (OSError, TypeError) as e:
+            print(f"Could not persist metrics cache to {self.disk_path}: {e}")
@@ -1,15 +1,26 @@
+import time
 import requests
 from typing import Tuple, Optional
+from providers.cache import TTLCache, get_cache
+from providers.http import get_session
+from profiling import timed
+
+# Binance keeps 30 days of open interest history; a day of margin keeps start times valid
+OI_HISTORY_MS = 29 * 86_400_000
 
 class DerivativesProvider:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, cache: Optional[TTLCache] = None):
         self.binance_base = "https://fapi.binance.com"
         # Add other exchanges here if needed (e.g. Bybit, OKX public endpoints)
+        self.session = session or get_session()
+        self.cache = cache or get_cache()
 
+    @timed()
     def fetch_funding_and_oi(self, symbol: str = "BTCUSDT") -> Tuple[float, Optional[float], Optional[float]]:
         """
         Return (funding_rate, current_OI, OI_change_pct_approx).
         Returns (0.0, None, None) on failure.
+        Results are cached per symbol (TTLs "funding" and "open_interest").
         """
         funding_rate = 0.0
         current_oi = None
@@ -17,21 +28,81 @@ class DerivativesProvider:
 
         # 1. Funding Rate
         try:
-            url = f"{self.binance_base}/fapi/v1/premiumIndex"
-            resp = requests.get(url, params={"symbol": symbol}, timeout=5).json()
-            funding_rate = float(resp["lastFundingRate"])
+            funding_rate = self.cache.get("funding", f"funding:{symbol}", lambda: self._fetch_funding(symbol))
         except Exception:
             pass # Keep 0.0 or try fallback
 
         # 2. Open Interest
         try:
-            url = f"{self.binance_base}/futures/data/openInterestHist"
-            resp = requests.get(url, params={"symbol": symbol, "period": "1h", "limit": 24}, timeout=5).json()
-            if resp:
-                current_oi = float(resp[-1]["sumOpenInterest"])
-                first_oi = float(resp[0]["sumOpenInterest"])
-                oi_change_pct = (current_oi - first_oi) / first_oi * 100 if first_oi != 0 else 0.0
+            current_oi, oi_change_pct = self.cache.get("open_interest", f"open_interest:{symbol}",
+                                                       lambda: self._fetch_open_interest(symbol))
         except Exception:
             pass
 
         return funding_rate, current_oi, oi_change_pct
+
+    def _fetch_funding(self, symbol: str) -> float:
+        url = f"{self.binance_base}/fapi/v1/premiumIndex"
+        resp = self.session.get(url, params={"symbol": symbol}, timeout=5).json()
+        return float(resp["lastFundingRate"])
+
+    def _fetch_open_interest(self, symbol: str) -> Tuple[float, float]:
+        # Raise rather than return (None, None): the cache would store the placeholder for a full TTL
+        url = f"{self.binance_base}/futures/data/openInterestHist"
+        resp = self.session.get(url, params={"symbol": symbol, "period": "1h", "limit": 24}, timeout=5).json()
+        if not isinstance(resp, list) or not resp:
+            raise ValueError(f"No open interest history for {symbol}: {resp}")
+        current_oi = float(resp[-1]["sumOpenInterest"])
+        first_oi = float(resp[0]["sumOpenInterest"])
+        return current_oi, (current_oi - first_oi) / first_oi * 100 if first_oi != 0 else 0.0
+
+    def _paginate(self, url: str, params: dict, time_key: str, start_ms: int, end_ms: Optional[int], limit: int) -> list:
+        """
+        Page forward from start_ms with startTime until a short page or end_ms.
+        Stops (keeping what was fetched) on the first failed request.
+        """
+        rows = []
+        while end_ms is None or start_ms <= end_ms:
+            query = dict(params, startTime=start_ms, limit=limit)
+            if end_ms is not None:
+                query["endTime"] = end_ms
+            try:
+                page = self.session.get(url, params=query, timeout=10).json()
+            except Exception as e:
+                print(f"Error paging {url}: {e}")
+                break
+            if not isinstance(page, list) or not page:
+                break
+            rows.extend(page)
+            if len(page) < limit:
+                break
+            start_ms = int(page[-1][time_key]) + 1
+        return rows
+
+    def fetch_funding_history(self, symbol: str = "BTCUSDT", start_ms: int = 0, end_ms: Optional[int] = None) -> "pd.Series":
+        """
+        Settled funding rates indexed by funding time (paginated, 1000 per request).
+        Returns empty Series on failure.
+        """
+        import pandas as pd
+        rows = self._paginate(f"{self.binance_base}/fapi/v1/fundingRate", {"symbol": symbol},
+                              "fundingTime", start_ms, end_ms, limit=1000)
+        if not rows:
+            return pd.Series(dtype="float64")
+        index = pd.to_datetime([int(r["fundingTime"]) for r in rows], unit="ms")
+        return pd.Series([float(r["fundingRate"]) for r in rows], index=index, name="funding_rate")
+
+    def fetch_oi_history(self, symbol: str = "BTCUSDT", start_ms: int = 0, end_ms: Optional[int] = None,
+                         period: str = "1h") -> "pd.Series":
+        """
+        Open interest history (Binance keeps only the last 30 days; older
+        start times are clamped). Returns empty Series on failure.
+        """
+        import pandas as pd
+        start_ms = max(start_ms, int(time.time() * 1000) - OI_HISTORY_MS)
+        rows = self._paginate(f"{self.binance_base}/futures/data/openInterestHist",
+                              {"symbol": symbol, "period": period}, "timestamp", start_ms, end_ms, limit=500)
+        if not rows:
+            return pd.Series(dtype="float64")
+        index = pd.to_datetime([int(r["timestamp"]) for r in rows], unit="ms")
+        return pd.Series([float(r["sumOpenInterest"]) for r in rows], index=index, name="oi")
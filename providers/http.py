@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 64
+
+_session: Optional[requests.Session] = None
+_limiter: Optional["HostLimiter"] = None
+_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Process-wide keep-alive session shared by the providers, with a
+    connection pool large enough for concurrent batch fetches.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def get_limiter() -> "HostLimiter":
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = HostLimiter()
+        return _limiter
+
+class HostLimiter:
+    """
+    Per-host concurrency cap plus rate-limit awareness:
+    - at most `max_per_host` requests in flight per host
+    - 429/418 responses pause the host for Retry-After seconds, then retry once
+    - when Binance's X-MBX-USED-WEIGHT-1M nears `weight_limit`, the host is
+      paused until the next minute window instead of risking a ban
+    """
+    def __init__(self, max_per_host: int = 64, weight_limit: int = 6000, weight_headroom: float = 0.9):
+        self.max_per_host = max_per_host
+        self.weight_limit = weight_limit
+        self.weight_headroom = weight_headroom
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._paused_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def _wait_if_paused(self, host: str):
+        delay = self._paused_until.get(host, 0.0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, host: str, seconds: float):
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._paused_until[host] = max(self._paused_until.get(host, 0.0), until)
+
+    def _observe(self, host: str, response: requests.Response):
+        used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None and used.isdigit() and int(used) >= self.weight_limit * self.weight_headroom:
+            self._pause(host, 60 - time.time() % 60)
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        host = urlparse(url).netloc
+        for attempt in range(2):
+            self._wait_if_paused(host)
+            with self._semaphore(host):
+                response = session.get(url, **kwargs)
+            self._observe(host, response)
+            if response.status_code not in (418, 429) or attempt == 1:
+                return response
+            retry_after = response.headers.get("Retry-After", "1")
+            self._pause(host, float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 1.0)
+        return response
@@ -1,37 +1,76 @@
 import requests
 import pandas as pd
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from providers.http import HostLimiter, get_limiter, get_session
+from ohlcv_store import DEFAULT_STORE_ROOT, cache_partition, load_if_fresh
+from profiling import timed
 
 class MarketDataProvider:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, limiter: Optional[HostLimiter] = None):
         self.sources = [
             "https://api.binance.com/api/v3/klines",
             "https://api.binance.us/api/v3/klines"
         ]
+        # Shared keep-alive session and per-host limiter unless overridden
+        self.session = session or get_session()
+        self.limiter = limiter or get_limiter()
 
     def fetch_ohlcv(self, symbol: str = "BTCUSDT", interval: str = "1h", limit: int = 1000) -> pd.DataFrame:
         """
         Fetch OHLCV data from available sources.
         Returns empty DataFrame on failure.
         """
+        try:
+            return self.fetch_klines(symbol, interval, limit=limit)
+        except ConnectionError:
+            return pd.DataFrame()
+
+    @timed()
+    def fetch_ohlcv_batch(self, symbols: List[str], interval: str = "1h", limit: int = 1000,
+                          max_workers: int = 64) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch many symbols concurrently over the shared session.
+        Returns {symbol: DataFrame} in input order; failed symbols map to empty frames.
+        """
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+            futures = {symbol: pool.submit(self.fetch_ohlcv, symbol, interval, limit) for symbol in symbols}
+            return {symbol: future.result() for symbol, future in futures.items()}
+
+    @timed()
+    def fetch_klines(self, symbol: str = "BTCUSDT", interval: str = "1h", start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None, limit: int = 1000) -> pd.DataFrame:
+        """
+        Fetch one page of klines, optionally bounded by startTime/endTime (epoch ms).
+        Raises ConnectionError if every source fails, so callers paging through
+        history can tell "no more candles" (empty frame) from an outage.
+        """
         params = {
             "symbol": symbol,
             "interval": interval,
             "limit": limit
         }
+        if start_ms is not None:
+            params["startTime"] = int(start_ms)
+        if end_ms is not None:
+            params["endTime"] = int(end_ms)
         
+        last_error = None
         for base_url in self.sources:
             try:
-                response = requests.get(base_url, params=params, timeout=10)
+                response = self.limiter.get(self.session, base_url, params=params, timeout=10)
                 response.raise_for_status()
                 data = response.json()
                 return self._parse_binance_response(data)
             except Exception as e:
                 # print(f"Provider error ({base_url}): {e}")
+                last_error = e
                 continue
                 
-        return pd.DataFrame()
+        raise ConnectionError(f"All kline sources failed for {symbol} {interval}: {last_error}")
 
     def _parse_binance_response(self, data: list) -> pd.DataFrame:
         if not data:
@@ -51,10 +90,17 @@ class MarketDataProvider:
             
         return df.set_index("timestamp").sort_index()
 
-    def load_or_fetch(self, filepath: str, symbol: str = "BTCUSDT", interval: str = "1h") -> pd.DataFrame:
+    def load_or_fetch(self, filepath: str, symbol: str = "BTCUSDT", interval: str = "1h",
+                      store_root: Optional[str] = DEFAULT_STORE_ROOT) -> pd.DataFrame:
         """
-        Load from CSV if exists, else fetch and save.
+        Load from the columnar store if it mirrors this CSV, else from CSV if
+        it exists, else fetch and save. Parsed/fetched data is written to the store.
         """
+        if store_root:
+            cached = load_if_fresh(filepath, symbol, interval, store_root)
+            if cached is not None and not cached.empty:
+                return cached
+
         if os.path.exists(filepath):
             try:
                 df = pd.read_csv(filepath)
@@ -65,7 +111,10 @@ class MarketDataProvider:
                     df['Date'] = pd.to_datetime(df['Date'])
                     df = df.set_index('Date')
                 df.columns = [c.lower() for c in df.columns]
-                return df.sort_index()
+                df = df.sort_index()
+                if store_root:
+                    cache_partition(df, symbol, interval, store_root, source=filepath)
+                return df
             except Exception as e:
                 print(f"Error loading {filepath}: {e}")
         
@@ -75,5 +124,7 @@ class MarketDataProvider:
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             df.to_csv(filepath)
             print(f"Saved to {filepath}")
+        if store_root:
+            cache_partition(df, symbol, interval, store_root, source=filepath if filepath and os.path.exists(filepath) else None)
             
         return df
@@ -1,19 +1,42 @@
 import requests
-from typing import Tuple
+from typing import Optional, Tuple
+from providers.cache import TTLCache, get_cache
+from providers.http import get_session
+from profiling import timed
 
 class SentimentProvider:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, cache: Optional[TTLCache] = None):
         self.fng_url = "https://api.alternative.me/fng/?limit=1"
+        self.fng_history_url = "https://api.alternative.me/fng/"
+        self.session = session or get_session()
+        self.cache = cache or get_cache()
 
+    @timed()
     def fetch_fear_greed(self) -> Tuple[int, str]:
         """
         Returns (value, label). e.g. (25, "Extreme Fear").
         Defaults to (50, "Neutral") on error.
+        The index updates daily, so results are cached (TTL "fear_greed").
         """
         try:
-            data = requests.get(self.fng_url, timeout=5).json()
-            value = int(data["data"][0]["value"])
-            label = data["data"][0]["value_classification"]
-            return value, label
+            return self.cache.get("fear_greed", "fear_greed", self._fetch_fear_greed)
         except Exception:
             return 50, "Neutral"
+
+    def _fetch_fear_greed(self) -> Tuple[int, str]:
+        data = self.session.get(self.fng_url, timeout=5).json()
+        return int(data["data"][0]["value"]), data["data"][0]["value_classification"]
+
+    def fetch_fear_greed_history(self, days: int = 0) -> "pd.Series":
+        """
+        Daily index values for the last `days` days (0 = full history, one request),
+        indexed by day. Returns empty Series on failure.
+        """
+        import pandas as pd
+        try:
+            data = self.session.get(self.fng_history_url, params={"limit": days, "format": "json"}, timeout=10).json()["data"]
+        except Exception as e:
+            print(f"Error fetching Fear & Greed history: {e}")
+            return pd.Series(dtype="float64")
+        index = pd.to_datetime([int(d["timestamp"]) for d in data], unit="s")
+        return pd.Series([float(d["value"]) for d in data], index=index, name="fear_value").sort_index()
@@ -0,0 +1,159 @@
+import argparse
+from typing import Optional
+import numpy as np
+import pandas as pd
+from candle_sync import CandleSync, index_to_ms, interval_to_ms
+from ohlcv_store import (DEFAULT_STORE_ROOT, OHLCV_COLUMNS, append_partition, read_meta, read_partition,
+                         write_partition)
+from profiling import timed
+
+# Bucket alignment relative to the epoch where it differs from a plain floor:
+# Binance weekly candles open on Monday 00:00 UTC (the epoch was a Thursday)
+INTERVAL_OFFSET_MS = {"1w": 4 * 86_400_000}
+
+def derived_key(interval: str, base_interval: str) -> str:
+    """
+    Store partition name of a derived timeframe, kept apart from candles
+    fetched or synced directly at that interval.
+    """
+    return f"{interval}-from-{base_interval}"
+
+def bucket_starts(ts_ms: np.ndarray, interval: str) -> np.ndarray:
+    """
+    Open time (epoch ms) of the `interval` candle containing each timestamp.
+    """
+    step = interval_to_ms(interval)
+    offset = INTERVAL_OFFSET_MS.get(interval, 0)
+    return (ts_ms - offset) // step * step + offset
+
+def resample_ohlcv(df: pd.DataFrame, interval: str, base_interval: Optional[str] = None) -> pd.DataFrame:
+    """
+    Aggregate a sorted OHLCV frame into `interval` candles labelled by their
+    open time, as the exchange builds them: first open, max high, min low,
+    last close, summed volume. Buckets with missing base bars aggregate what
+    is there; the last bucket may still be in progress.
+    Raises ValueError if interval is not a multiple of base_interval.
+    """
+    if base_interval is not None and interval_to_ms(interval) % interval_to_ms(base_interval):
+        raise ValueError(f"{interval} is not a whole number of {base_interval} bars")
+    if df.empty:
+        return df[OHLCV_COLUMNS].iloc[:0]
+
+    index = pd.DatetimeIndex(df.index)
+    buckets = bucket_starts(index_to_ms(index), interval)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(buckets)])) - 1
+
+    cols = {col: df[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS}
+    out_index = pd.DatetimeIndex(buckets[starts].astype("datetime64[ms]"), name=index.name or "timestamp")
+    if index.tz is not None:
+        out_index = out_index.tz_localize("UTC").tz_convert(index.tz)
+    out_index = out_index.as_unit(index.unit)
+    return pd.DataFrame({
+        "open": cols["open"][starts],
+        "high": np.fmax.reduceat(cols["high"], starts),
+        "low": np.fmin.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(cols["volume"], starts),
+    }, index=out_index)
+
+@timed()
+def resample_cached(base: pd.DataFrame, symbol: str, interval: str, base_interval: str,
+                    root: Optional[str] = DEFAULT_STORE_ROOT) -> pd.DataFrame:
+    """
+    `base` resampled to `interval`, kept in the columnar store. When only new
+    base bars arrived, just the stored last bucket and newer ones are rebuilt
+    and appended in place; if older base bars changed (backfill, gap fill) the
+    partition is rebuilt. root=None skips the cache.
+    """
+    if interval == base_interval:
+        return base
+    if root is None or base.empty:
+        return resample_ohlcv(base, interval, base_interval)
+
+    key = derived_key(interval, base_interval)
+    base_ms = index_to_ms(base.index)
+    meta = read_meta(symbol, key, root)
+    if meta is not None and meta.get("rows"):
+        stored = read_partition(symbol, key, root)
+        tail_ms = int(index_to_ms(stored.index)[-1])
+        del stored
+        # Base bars before the stored last bucket must be exactly the ones it was built from
+        cut = int(np.searchsorted(base_ms, tail_ms, side="left"))
+        if cut == meta.get("base_rows_before_tail") and (cut == 0 or int(base_ms[0]) == meta.get("base_first_ms")):
+            fresh = resample_ohlcv(base.iloc[cut:], interval, base_interval)
+            new_tail_ms = int(index_to_ms(fresh.index)[-1])
+            extra = _derived_meta(base_ms, new_tail_ms, base_interval)
+            if append_partition(fresh, symbol, key, root, extra_meta=extra):
+                return read_partition(symbol, key, root)
+
+    derived = resample_ohlcv(base, interval, base_interval)
+    write_partition(derived, symbol, key, root,
+                    extra_meta=_derived_meta(base_ms, int(index_to_ms(derived.index)[-1]), base_interval))
+    return derived
+
+def _derived_meta(base_ms: np.ndarray, tail_ms: int, base_interval: str) -> dict:
+    return {
+        "origin": "resample",
+        "base_interval": base_interval,
+        "base_first_ms": int(base_ms[0]),
+        "base_rows_before_tail": int(np.searchsorted(base_ms, tail_ms, side="left")),
+    }
+
+class ResampleStream:
+    """
+    Incremental resample_ohlcv for a live loop. Keeps the base bars of the
+    newest bucket in memory, so each update costs O(new base bars) instead
+    of a base sync and resample of the whole history. update() returns the
+    rebuilt newest bucket plus any newer ones; the last may be in progress.
+    """
+    def __init__(self, interval: str, base_interval: str, start_ms: int):
+        if interval_to_ms(interval) % interval_to_ms(base_interval):
+            raise ValueError(f"{interval} is not a whole number of {base_interval} bars")
+        self.interval = interval
+        self.base_interval = base_interval
+        # Open time of the next base bar to fetch
+        self.next_ms = int(start_ms)
+        self._pending = None
+
+    def update(self, base: pd.DataFrame) -> pd.DataFrame:
+        if not base.empty:
+            base = base[index_to_ms(base.index) >= self.next_ms][OHLCV_COLUMNS]
+        if base.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        frame = base if self._pending is None else pd.concat([self._pending, base])
+        out = resample_ohlcv(frame, self.interval, self.base_interval)
+        frame_ms = index_to_ms(frame.index)
+        self._pending = frame[bucket_starts(frame_ms, self.interval) >= int(index_to_ms(out.index)[-1])]
+        self.next_ms = int(frame_ms[-1]) + interval_to_ms(self.base_interval)
+        return out
+
+def load_resampled(symbol: str, interval: str, base_interval: str = "1m", syncer: Optional[CandleSync] = None,
+                   root: str = DEFAULT_STORE_ROOT, since=None) -> pd.DataFrame:
+    """
+    Sync the base candles (one small request on a warm store) and return the
+    derived `interval` history. Every timeframe comes from one download.
+    """
+    syncer = syncer or CandleSync(store_root=root)
+    base = syncer.sync(symbol, base_interval, since=since)
+    return resample_cached(base, symbol, interval, base_interval, root)
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive higher timeframes from one synced base series")
+    parser.add_argument("--symbol", type=str, nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--base_interval", type=str, default="1m")
+    parser.add_argument("--intervals", type=str, nargs="+", default=["5m", "15m", "1h", "4h"])
+    parser.add_argument("--since", type=str, default=None, help="Backfill base history back to this date")
+    parser.add_argument("--root", type=str, default=DEFAULT_STORE_ROOT, help="Store root directory")
+    args = parser.parse_args()
+
+    syncer = CandleSync(store_root=args.root)
+    for symbol in args.symbol:
+        base = syncer.sync(symbol, args.base_interval, since=args.since)
+        print(f"{symbol} {args.base_interval}: {len(base)} base bars, {syncer.requests} request(s)")
+        for interval in args.intervals:
+            derived = resample_cached(base, symbol, interval, args.base_interval, args.root)
+            print(f"  {interval}: {len(derived)} bars")
+
+if __name__ == "__main__":
+    main()
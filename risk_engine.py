@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import numpy as np
 
 @dataclass
 class RiskConfig:
@@ -44,3 +45,34 @@ class RiskEngine:
             "leverage": leverage,
             "stop_distance_pct": stop_distance_pct * 100
         }
+
+    def size_positions(self, entry_price, stop_loss, account_size=None) -> dict:
+        """
+        Vectorized calculate_position over arrays of entries/stops (and,
+        optionally, per-trade account sizes). Invalid rows (non-positive
+        price/stop, stop equal to entry) come back as NaN.
+        """
+        entry = np.asarray(entry_price, dtype=np.float64)
+        stop = np.asarray(stop_loss, dtype=np.float64)
+        account = np.asarray(self.config.account_size if account_size is None else account_size, dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stop_distance_pct = np.abs(entry - stop) / entry
+            invalid = (entry <= 0) | (stop <= 0) | ~(stop_distance_pct > 0)
+            stop_distance_pct = np.where(invalid, np.nan, stop_distance_pct)
+
+            # Leverage is risk % / stop distance, capped; it does not depend on the account size
+            leverage = np.minimum(self.config.risk_per_trade_pct / 100.0 / stop_distance_pct, self.config.max_leverage)
+            position_notional = account * leverage
+            risk_amount = position_notional * stop_distance_pct
+            quantity = position_notional / entry
+
+        return {
+            "entry": entry,
+            "stop": stop,
+            "risk_amount": risk_amount,
+            "position_notional": position_notional,
+            "quantity": quantity,
+            "leverage": leverage,
+            "stop_distance_pct": stop_distance_pct * 100
+        }
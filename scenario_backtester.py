@@ -1,11 +1,23 @@
 import pandas as pd
 import argparse
 from providers.market_data import MarketDataProvider
-from backtest_engine import compute_indicators
-from scenario_engine import evaluate_scenarios
+from backtest_engine import IndicatorStream, compute_indicators
+from scenario_engine import ScenarioStream, evaluate_scenarios_batch
 from thesis_config import ThesisLevels, Thresholds
+from candle_sync import interval_to_ms
+from metrics_store import DEFAULT_METRICS_ROOT, align_metrics, backfill_metrics
 
-def run_scenario_backtest(symbol="BTCUSDT", interval="1h", limit=1000):
+def run_scenario_backtest(symbol="BTCUSDT", interval="1h", limit=1000, mode="batch", warmup=50,
+                          metrics_root=DEFAULT_METRICS_ROOT, backfill=False):
+    """
+    Replay evaluate_scenarios over history.
+    mode="batch": classify every bar in one vectorized pass.
+    mode="stream": feed raw bars one at a time through IndicatorStream and
+    ScenarioStream (O(1) per bar), the same path a live loop uses.
+    Funding, BTC dominance and Fear & Greed come from the metrics store,
+    as of each bar's close (backfill=True updates the store first); bars
+    before the stored history use neutral defaults.
+    """
     provider = MarketDataProvider()
     df = provider.fetch_ohlcv(symbol, interval, limit)
     
@@ -13,44 +25,47 @@ def run_scenario_backtest(symbol="BTCUSDT", interval="1h", limit=1000):
         print("No data.")
         return
 
-    df = compute_indicators(df)
-    
     levels = ThesisLevels()
     thresholds = Thresholds()
     
-    results = []
-    
-    # Iterate through history
-    # Note: This is slow for large datasets but fine for "microanalyst" checks
-    for i in range(50, len(df)):
-        slice_df = df.iloc[:i+1]
-        
-        # We don't have historical funding/sentiment in this simple backtester
-        # So we mock them or assume neutral to test purely the PRICE/VOL logic
-        res = evaluate_scenarios(
-            slice_df, 
-            levels, 
-            thresholds, 
-            funding_rate=0.0, 
-            btc_dom=55.0, 
-            fear_value=50
-        )
-        
-        results.append({
-            "timestamp": slice_df.index[-1],
-            "price": res["price"],
-            "flags": ";".join(res["scenario_flags"]),
-            "liq_pulse": res.get("liquidation_pulse", "NORMAL")
+    if backfill:
+        backfill_metrics(symbol, since=df.index[0], root=metrics_root)
+    close_times = df.index + pd.Timedelta(milliseconds=interval_to_ms(interval))
+    aligned = align_metrics(close_times, symbol, metrics_root)
+    metrics = {col: aligned[col].to_numpy() for col in ("funding_rate", "btc_dom", "fear_value")}
+
+    if mode == "batch":
+        df = compute_indicators(df)
+        batch = evaluate_scenarios_batch(df, levels, thresholds, **metrics).iloc[warmup:]
+        results_df = pd.DataFrame({
+            "price": batch["price"],
+            "flags": batch["scenario_flags"],
+            "liq_pulse": batch["liquidation_pulse"],
         })
-        
-    results_df = pd.DataFrame(results).set_index("timestamp")
+        results_df.index.name = "timestamp"
+    elif mode == "stream":
+        indicators = IndicatorStream()
+        stream = ScenarioStream(levels, thresholds)
+        results = []
+        bar_metrics = pd.DataFrame(metrics).to_dict("records")
+        for i, (ts, bar) in enumerate(zip(df.index, df.to_dict("records"))):
+            bar.update(indicators.update(bar["high"], bar["low"], bar["close"]))
+            res = stream.update(bar, **bar_metrics[i])
+            if i < warmup:
+                continue
+            results.append({
+                "timestamp": ts,
+                "price": res["price"],
+                "flags": ";".join(res["scenario_flags"]),
+                "liq_pulse": res.get("liquidation_pulse", "NORMAL")
+            })
+        results_df = pd.DataFrame(results).set_index("timestamp")
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
     
     # Count occurrences
     print("--- Scenario Flags Frequency ---")
-    all_flags = []
-    for flags in results_df["flags"]:
-        all_flags.extend(flags.split(";"))
-    print(pd.Series(all_flags).value_counts())
+    print(results_df["flags"].str.split(";").explode().value_counts())
     
     print("\n--- Liquidation Pulse Frequency ---")
     print(results_df["liq_pulse"].value_counts())
@@ -58,4 +73,13 @@ def run_scenario_backtest(symbol="BTCUSDT", interval="1h", limit=1000):
     return results_df
 
 if __name__ == "__main__":
-    run_scenario_backtest()
+    parser = argparse.ArgumentParser(description="Scenario flag replay over history")
+    parser.add_argument("--symbol", type=str, default="BTCUSDT")
+    parser.add_argument("--interval", type=str, default="1h")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--mode", type=str, default="batch", choices=["batch", "stream"])
+    parser.add_argument("--backfill", action="store_true", help="Backfill funding/OI/Fear & Greed history before the replay")
+    parser.add_argument("--metrics_root", type=str, default=DEFAULT_METRICS_ROOT, help="Metrics store directory")
+    args = parser.parse_args()
+    run_scenario_backtest(args.symbol, args.interval, args.limit, mode=args.mode,
+                          metrics_root=args.metrics_root, backfill=args.backfill)
@@ -1,8 +1,41 @@
-from typing import Dict, List
+from dataclasses import fields
+from typing import Dict, List, Sequence, Union
 import math
+import numpy as np
 import pandas as pd
 from thesis_config import ThesisLevels, Thresholds
+from profiling import timed
 
+VOLUME_MA_WINDOW = 24
+# Bit order of the integer-coded flags (evaluate_scenarios_array) is the order evaluate_scenarios lists them in
+FLAG_NAMES = [
+    "SCENARIO_3_BREAKDOWN_RISK",
+    "SCENARIO_2_FLUSH_FAVORED",
+    "SCENARIO_2_OR_NOISE",
+    "SCENARIO_1_BASE_BUILDING",
+    "SCENARIO_4_BREAKOUT_POTENTIAL",
+    "MID_RANGE_UNCLEAR",
+    "LIQUIDATION_PULSE_DETECTED",
+]
+BIT = {name: i for i, name in enumerate(FLAG_NAMES)}
+ROTATION_PHASES = ["PHASE_2 (broad rotation likely)", "PHASE_1 (majors rotation ON)", "NO_ROTATION (BTC dominance high)"]
+SENTIMENT_TAGS = ["EXTREME_FEAR", "NORMAL_SENTIMENT"]
+# (configs x bars) cells evaluated per chunk
+CHUNK_CELLS = 4_000_000
+
+def _rotation_phase(btc_dom: float, thresholds: Thresholds) -> str:
+    if btc_dom < thresholds.btc_dom_phase2:
+        return ROTATION_PHASES[0]
+    elif btc_dom < thresholds.btc_dom_phase1:
+        return ROTATION_PHASES[1]
+    return ROTATION_PHASES[2]
+
+def _sentiment_tag(fear_value: int, thresholds: Thresholds) -> str:
+    if fear_value <= thresholds.fear_extreme:
+        return SENTIMENT_TAGS[0]
+    return SENTIMENT_TAGS[1]
+
+@timed()
 def evaluate_scenarios(
     df: pd.DataFrame,
     levels: ThesisLevels,
@@ -20,10 +53,23 @@ def evaluate_scenarios(
         return {}
         
     last = df.iloc[-1]
-    price = float(last["close"])
-    atr = float(last.get("atr", float("nan")))
-    bb_upper = float(last.get("bb_upper", float("nan")))
-    bb_lower = float(last.get("bb_lower", float("nan")))
+    # Only the trailing window matters; avoid rolling over the whole history.
+    vol_ma = df['volume'].iloc[-VOLUME_MA_WINDOW:].rolling(VOLUME_MA_WINDOW).mean().iloc[-1]
+    return _classify_bar(last, vol_ma, levels, thresholds, funding_rate, btc_dom, fear_value)
+
+def _classify_bar(
+    bar,
+    vol_ma: float,
+    levels: ThesisLevels,
+    thresholds: Thresholds,
+    funding_rate: float,
+    btc_dom: float,
+    fear_value: int,
+) -> Dict[str, object]:
+    price = float(bar["close"])
+    atr = float(bar.get("atr", float("nan")))
+    bb_upper = float(bar.get("bb_upper", float("nan")))
+    bb_lower = float(bar.get("bb_lower", float("nan")))
 
     bb_width = bb_upper - bb_lower if not math.isnan(bb_upper) and not math.isnan(bb_lower) else float("nan")
     price_pos = (price - bb_lower) / bb_width if bb_width and not math.isnan(bb_width) else 0.5
@@ -51,17 +97,8 @@ def evaluate_scenarios(
         scenario_flags.append("MID_RANGE_UNCLEAR")
 
     # Rotation
-    if btc_dom < thresholds.btc_dom_phase2:
-        rotation_phase = "PHASE_2 (broad rotation likely)"
-    elif btc_dom < thresholds.btc_dom_phase1:
-        rotation_phase = "PHASE_1 (majors rotation ON)"
-    else:
-        rotation_phase = "NO_ROTATION (BTC dominance high)"
-
-    if fear_value <= thresholds.fear_extreme:
-        sentiment_tag = "EXTREME_FEAR"
-    else:
-        sentiment_tag = "NORMAL_SENTIMENT"
+    rotation_phase = _rotation_phase(btc_dom, thresholds)
+    sentiment_tag = _sentiment_tag(fear_value, thresholds)
 
     # Liquidation Pulse Logic
     # High volume + large range + funding shift often implies liquidations.
@@ -72,10 +109,9 @@ def evaluate_scenarios(
     # Actually, usually liqs happen when price moves AGAINST the funding crowd.
     # For now, let's just flag "High Volatility" events.
     
-    vol_ma = df['volume'].rolling(24).mean().iloc[-1]
-    curr_vol = last['volume']
+    curr_vol = bar['volume']
     is_high_vol = curr_vol > 2.0 * vol_ma if not math.isnan(vol_ma) else False
-    is_wide_range = (last['high'] - last['low']) > (2.0 * atr) if not math.isnan(atr) else False
+    is_wide_range = (bar['high'] - bar['low']) > (2.0 * atr) if not math.isnan(atr) else False
     
     liquidation_pulse = "NORMAL"
     if is_high_vol and is_wide_range:
@@ -92,3 +128,174 @@ def evaluate_scenarios(
         "sentiment_tag": sentiment_tag,
         "liquidation_pulse": liquidation_pulse
     }
+
+class ScenarioStream:
+    """
+    Incremental evaluate_scenarios: feed one bar at a time (with 'atr',
+    'bb_upper', 'bb_lower' already computed) and get the same result dict
+    evaluate_scenarios would return for the history up to that bar.
+    Keeps a fixed-size volume ring buffer, so each update is O(1).
+    """
+    def __init__(self, levels: ThesisLevels, thresholds: Thresholds):
+        self.levels = levels
+        self.thresholds = thresholds
+        self._volumes = np.full(VOLUME_MA_WINDOW, np.nan)
+        self._pos = 0
+        self._count = 0
+
+    def update(self, bar, funding_rate: float, btc_dom: float, fear_value: int) -> Dict[str, object]:
+        self._volumes[self._pos] = bar["volume"]
+        self._pos = (self._pos + 1) % VOLUME_MA_WINDOW
+        self._count += 1
+        vol_ma = self._volumes.mean() if self._count >= VOLUME_MA_WINDOW else float("nan")
+        return _classify_bar(bar, vol_ma, self.levels, self.thresholds, funding_rate, btc_dom, fear_value)
+
+def evaluate_scenarios_batch(
+    df: pd.DataFrame,
+    levels: ThesisLevels,
+    thresholds: Thresholds,
+    funding_rate,
+    btc_dom,
+    fear_value,
+) -> pd.DataFrame:
+    """
+    Evaluate every bar in one NumPy pass. Row i equals
+    evaluate_scenarios(df.iloc[:i+1], ...), with 'scenario_flags' joined by ';'.
+    funding_rate/btc_dom/fear_value are scalars or per-bar arrays (e.g. from
+    metrics_store.align_metrics).
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    res = evaluate_scenarios_array(df, levels, thresholds, funding_rate, btc_dom, fear_value)
+    return pd.DataFrame({
+        "price": res["price"],
+        "atr_pct": res["atr_pct"],
+        "price_pos_in_bb": res["price_pos_in_bb"],
+        "compression": res["compression"],
+        "scenario_flags": decode_flags(res["flags"]),
+        "rotation_phase": np.array(ROTATION_PHASES, dtype=object)[res["rotation_phase"]],
+        "sentiment_tag": np.array(SENTIMENT_TAGS, dtype=object)[res["sentiment_tag"]],
+        "liquidation_pulse": np.where(res["liquidation_pulse"], "HIGH_LIQ_RISK", "NORMAL"),
+    }, index=df.index)
+
+def _config_columns(configs, cls) -> Dict[str, np.ndarray]:
+    """
+    One (k, 1) column per dataclass field of a config or sequence of k configs.
+    """
+    configs = [configs] if isinstance(configs, cls) else list(configs)
+    return {f.name: np.array([getattr(c, f.name) for c in configs], dtype=np.float64)[:, None] for f in fields(cls)}
+
+@timed()
+def evaluate_scenarios_array(
+    df: pd.DataFrame,
+    levels: Union[ThesisLevels, Sequence[ThesisLevels]],
+    thresholds: Union[Thresholds, Sequence[Thresholds]],
+    funding_rate,
+    btc_dom,
+    fear_value,
+    chunk_cells: int = CHUNK_CELLS,
+) -> Dict[str, np.ndarray]:
+    """
+    evaluate_scenarios for every bar and every configuration in one pass.
+    levels/thresholds are one config or sequences of k configs (length 1 or
+    k, broadcast against each other); metrics are scalars or per-bar arrays.
+    Returns arrays, (k, n) for config-dependent outputs (or (n,) when both
+    are single configs):
+    - flags: uint8 bitmask of FLAG_NAMES (decode_flags / flag_counts)
+    - compression, rotation_phase, sentiment_tag: bool and int8 codes into
+      ROTATION_PHASES / SENTIMENT_TAGS
+    - price, atr_pct, price_pos_in_bb, liquidation_pulse: (n,) per bar
+    Bars are processed in chunks of at most chunk_cells cells.
+    """
+    single = isinstance(levels, ThesisLevels) and isinstance(thresholds, Thresholds)
+    lv = _config_columns(levels, ThesisLevels)
+    th = _config_columns(thresholds, Thresholds)
+    k = np.broadcast_shapes(lv["flush_low"].shape, th["atr_low_percent"].shape)[0]
+
+    n = len(df)
+    nan_col = np.full(n, np.nan)
+    price = df["close"].to_numpy(dtype=np.float64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    volume = df["volume"].to_numpy(dtype=np.float64)
+    atr = df["atr"].to_numpy(dtype=np.float64) if "atr" in df else nan_col
+    bb_upper = df["bb_upper"].to_numpy(dtype=np.float64) if "bb_upper" in df else nan_col
+    bb_lower = df["bb_lower"].to_numpy(dtype=np.float64) if "bb_lower" in df else nan_col
+    vol_ma = df["volume"].rolling(VOLUME_MA_WINDOW).mean().to_numpy(dtype=np.float64)
+    funding_rate = np.broadcast_to(np.asarray(funding_rate, dtype=np.float64), (n,))
+    btc_dom = np.broadcast_to(np.asarray(btc_dom, dtype=np.float64), (n,))
+    fear_value = np.broadcast_to(np.asarray(fear_value, dtype=np.float64), (n,))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bb_width = bb_upper - bb_lower
+        has_width = ~np.isnan(bb_width) & (bb_width != 0)
+        price_pos = np.where(has_width, (price - bb_lower) / np.where(has_width, bb_width, 1.0), 0.5)
+        atr_pct = np.where((price != 0) & ~np.isnan(atr), atr / price, np.nan)
+    pulse = (volume > 2.0 * vol_ma) & ((high - low) > 2.0 * atr)
+    upper_half = price_pos > 0.5
+
+    flags = np.empty((k, n), dtype=np.uint8)
+    compression = np.empty((k, n), dtype=bool)
+    step = max(1, chunk_cells // k)
+    for start in range(0, n, step):
+        sl = slice(start, start + step)
+        p = price[sl]
+        breakdown = p < lv["invalidation_level"]
+        in_flush = (lv["flush_low"] <= p) & (p <= lv["flush_high"])
+        squeeze = atr_pct[sl] < th["atr_low_percent"]
+        flush = ~breakdown & in_flush
+        favored = flush & (funding_rate[sl] < th["funding_strong_negative"])
+        base = ~breakdown & ~in_flush & (p >= lv["primary_support_low"]) & squeeze
+
+        out = np.zeros((k, len(p)), dtype=np.uint8)
+        out |= breakdown.view(np.uint8) << BIT["SCENARIO_3_BREAKDOWN_RISK"]
+        out |= favored.view(np.uint8) << BIT["SCENARIO_2_FLUSH_FAVORED"]
+        out |= (flush & ~favored).view(np.uint8) << BIT["SCENARIO_2_OR_NOISE"]
+        out |= base.view(np.uint8) << BIT["SCENARIO_1_BASE_BUILDING"]
+        out |= (base & upper_half[sl]).view(np.uint8) << BIT["SCENARIO_4_BREAKOUT_POTENTIAL"]
+        out |= (~(breakdown | flush | base)).view(np.uint8) << BIT["MID_RANGE_UNCLEAR"]
+        out |= pulse[sl].view(np.uint8) << BIT["LIQUIDATION_PULSE_DETECTED"]
+        flags[:, sl] = out
+        compression[:, sl] = squeeze
+
+    # Same boundaries as _rotation_phase / _sentiment_tag (NaN dominance means no rotation)
+    rotation = np.where(btc_dom < th["btc_dom_phase2"], 0, np.where(btc_dom < th["btc_dom_phase1"], 1, 2)).astype(np.int8)
+    sentiment = np.where(fear_value <= th["fear_extreme"], 0, 1).astype(np.int8)
+    rotation = np.broadcast_to(rotation, (k, n))
+    sentiment = np.broadcast_to(sentiment, (k, n))
+
+    if single:
+        flags, compression, rotation, sentiment = flags[0], compression[0], rotation[0], sentiment[0]
+    return {
+        "price": price,
+        "atr_pct": atr_pct,
+        "price_pos_in_bb": price_pos,
+        "liquidation_pulse": pulse,
+        "flags": flags,
+        "compression": compression,
+        "rotation_phase": rotation,
+        "sentiment_tag": sentiment,
+    }
+
+def flag_names(mask: int) -> List[str]:
+    """
+    Flag list of one bitmask, in evaluate_scenarios order.
+    """
+    return [name for name in FLAG_NAMES if mask & (1 << BIT[name])]
+
+def decode_flags(flags: np.ndarray) -> np.ndarray:
+    """
+    ';'-joined flag strings for an array of bitmasks (decoded once per distinct mask).
+    """
+    distinct, inverse = np.unique(flags, return_inverse=True)
+    labels = np.array([";".join(flag_names(int(m))) for m in distinct], dtype=object)
+    return labels[inverse.reshape(np.shape(flags))]
+
+def flag_counts(flags: np.ndarray) -> pd.DataFrame:
+    """
+    Bars carrying each flag, one row per configuration of an
+    evaluate_scenarios_array result.
+    """
+    flags = np.atleast_2d(flags)
+    return pd.DataFrame({name: np.count_nonzero(flags & np.uint8(1 << BIT[name]), axis=1) for name in FLAG_NAMES})
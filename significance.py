@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from profiling import timed
+
+GROUP_KEYS = ['hold_period', 'direction']
+# Resampled index matrices are built in pieces of at most this many cells (int64)
+CHUNK_CELLS = 4_000_000
+# Resamples per seed: chunks hold whole seed blocks, so the draws don't depend on chunk_resamples
+SEED_BLOCK = 250
+
+# Per-process state: closes and the forward-return arrays derived from them
+_worker_close: Optional[np.ndarray] = None
+_forward_cache: Dict[int, np.ndarray] = {}
+
+def forward_returns(close: np.ndarray, hold_period: int) -> np.ndarray:
+    """
+    Return (%) of a breakout after every bar i, measured like
+    run_breakout_tests: from the close of bar i (the last squeeze bar) to the
+    close of bar i + 1 + hold_period. Only bars with both ends in the data.
+    """
+    ref = close[:len(close) - hold_period - 1]
+    return (close[hold_period + 1:] - ref) / ref * 100
+
+def default_block_size(n_events: int) -> int:
+    """
+    n^(1/3) blocks, the usual rate for a moving-block bootstrap of the mean.
+    """
+    return max(1, int(round(n_events ** (1 / 3))))
+
+def block_bootstrap_means(values: np.ndarray, n_resamples: int, block_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Means of n_resamples moving-block bootstrap samples of `values` (in time
+    order). Each sample joins random blocks of consecutive events, which keeps
+    the dependence between overlapping hold windows. One index matrix per
+    chunk, so there is no per-resample loop.
+    """
+    n = len(values)
+    block_size = min(block_size, n)
+    n_blocks = -(-n // block_size)
+    offsets = np.arange(block_size)
+    out = np.empty(n_resamples)
+    chunk = max(1, CHUNK_CELLS // (n_blocks * block_size))
+    for i in range(0, n_resamples, chunk):
+        m = min(chunk, n_resamples - i)
+        starts = rng.integers(0, n - block_size + 1, size=(m, n_blocks))
+        idx = (starts[:, :, None] + offsets).reshape(m, -1)[:, :n]
+        out[i:i + m] = values[idx].mean(axis=1)
+    return out
+
+def random_entry_means(forward: np.ndarray, n_events: int, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Means of n_resamples sets of n_events random entries into the same
+    forward-return series: what the mean would be without the squeeze signal.
+    """
+    out = np.empty(n_resamples)
+    chunk = max(1, CHUNK_CELLS // n_events)
+    for i in range(0, n_resamples, chunk):
+        m = min(chunk, n_resamples - i)
+        out[i:i + m] = forward[rng.integers(0, len(forward), size=(m, n_events))].mean(axis=1)
+    return out
+
+def _init_worker(close: np.ndarray):
+    global _worker_close
+    _worker_close = close
+    _forward_cache.clear()
+
+def _resample_chunk(task):
+    """
+    Bootstrap and random-entry means for one chunk of one summary row,
+    drawn seed block by seed block.
+    """
+    key, values, hold_period, block_size, seed_blocks = task
+    if hold_period not in _forward_cache:
+        _forward_cache[hold_period] = forward_returns(_worker_close, hold_period)
+    forward = _forward_cache[hold_period]
+    boots, randoms = [], []
+    for n_resamples, seed in seed_blocks:
+        rng = np.random.default_rng(seed)
+        boots.append(block_bootstrap_means(values, n_resamples, block_size, rng))
+        randoms.append(random_entry_means(forward, len(values), n_resamples, rng) if len(forward)
+                       else np.full(n_resamples, np.nan))
+    return key, np.concatenate(boots), np.concatenate(randoms)
+
+def _p_value(null: np.ndarray, observed: float, center: float) -> float:
+    """
+    Two-sided: share of null draws at least as far from `center` as observed.
+    The +1 terms keep the estimate above zero with a finite resample count.
+    """
+    null = null[~np.isnan(null)]
+    if len(null) == 0:
+        return np.nan
+    return (1 + np.count_nonzero(np.abs(null - center) >= abs(observed - center))) / (1 + len(null))
+
+@timed()
+def significance_table(results_df: pd.DataFrame, close, n_resamples: int = 10_000, block_size: Optional[int] = None,
+                       ci: float = 0.95, seed: int = 0, chunk_resamples: int = 1000, workers=None) -> pd.DataFrame:
+    """
+    Confidence intervals and p-values for every summarize_results row
+    (hold_period, direction) of run_breakout_tests output:
+    - mean_ci_low/high: block-bootstrap percentile interval of the mean
+    - p_value: bootstrap test of mean == 0
+    - random_mean / random_ci_*: mean return of the same number of random
+      entries (same hold period) over `close`, the no-signal baseline
+    - p_value_random: how often random entries are as far from the baseline as observed
+    Resamples are drawn in seeded blocks of SEED_BLOCK and run in chunks of
+    about chunk_resamples in worker processes; results depend on neither
+    `workers` nor `chunk_resamples`.
+    """
+    if results_df.empty:
+        return pd.DataFrame()
+    close = np.asarray(close, dtype=np.float64)
+    alpha = (1 - ci) / 2
+    workers = workers or os.cpu_count() or 1
+
+    groups = {key: rows['pct_change'].to_numpy(dtype=np.float64)
+              for key, rows in results_df.sort_values('breakout_time', kind='stable').groupby(GROUP_KEYS)}
+    groups = {key: values[~np.isnan(values)] for key, values in groups.items()}
+    groups = {key: values for key, values in groups.items() if len(values) > 1}
+    if not groups:
+        return pd.DataFrame()
+
+    tasks = []
+    seeds = iter(np.random.SeedSequence(seed).generate_state(len(groups) * (-(-n_resamples // SEED_BLOCK))))
+    per_chunk = max(1, chunk_resamples // SEED_BLOCK)
+    for key, values in groups.items():
+        block = block_size or default_block_size(len(values))
+        seed_blocks = [(min(SEED_BLOCK, n_resamples - start), int(next(seeds)))
+                       for start in range(0, n_resamples, SEED_BLOCK)]
+        for i in range(0, len(seed_blocks), per_chunk):
+            tasks.append((key, values, int(key[0]), block, seed_blocks[i:i + per_chunk]))
+
+    if workers == 1 or len(tasks) == 1:
+        _init_worker(close)
+        outputs = [_resample_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(close,)) as pool:
+            outputs = list(pool.map(_resample_chunk, tasks))
+
+    boots: Dict[tuple, list] = {}
+    randoms: Dict[tuple, list] = {}
+    for key, boot, random in outputs:
+        boots.setdefault(key, []).append(boot)
+        randoms.setdefault(key, []).append(random)
+
+    rows = []
+    for key, values in groups.items():
+        boot, random = np.concatenate(boots[key]), np.concatenate(randoms[key])
+        observed = values.mean()
+        random_mean = np.nanmean(random) if not np.isnan(random).all() else np.nan
+        rows.append({
+            'hold_period': key[0],
+            'direction': key[1],
+            'count': len(values),
+            'mean': observed,
+            'mean_ci_low': np.quantile(boot, alpha),
+            'mean_ci_high': np.quantile(boot, 1 - alpha),
+            # Centering the bootstrap distribution on zero gives the null of no mean return
+            'p_value': _p_value(boot - observed, observed, 0.0),
+            'random_mean': random_mean,
+            'random_ci_low': np.nanquantile(random, alpha) if not np.isnan(random_mean) else np.nan,
+            'random_ci_high': np.nanquantile(random, 1 - alpha) if not np.isnan(random_mean) else np.nan,
+            'p_value_random': _p_value(random, observed, random_mean),
+        })
+    return pd.DataFrame(rows).set_index(GROUP_KEYS)
@@ -0,0 +1,14 @@
+import os
+import sys
+import pytest
+
+# Tests import the top-level modules and the stand-in server directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_in import StandIn
+
+@pytest.fixture
+def stand_in():
+    with StandIn() as server:
+        yield server
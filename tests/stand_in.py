@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Pooled client sessions drop keep-alive connections when a test ends
+        pass
+
+class StandIn:
+    """
+    Local HTTP server standing in for the exchange/metrics APIs and webhooks.
+    `routes` maps a path to handler(query, body) returning a JSON payload,
+    (status, payload) or (status, payload, headers). Every request is
+    recorded in `requests` as (path, query-or-JSON-body); `delay` adds
+    per-path latency and `max_in_flight` tracks the peak concurrency.
+    """
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.delay = {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def hits(self, path: str) -> int:
+        with self._lock:
+            return sum(1 for p, _ in self.requests if p == path)
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in._serve(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stand_in._serve(self, json.loads(self.rfile.read(length) or b"null"))
+        return Handler
+
+    def _serve(self, handler, body):
+        parsed = urlparse(handler.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        with self._lock:
+            self.requests.append((parsed.path, query if body is None else body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay.get(parsed.path, 0.0))
+            route = self.routes.get(parsed.path)
+            result = route(query, body) if route else (404, {"msg": "no route"})
+        except Exception as e:
+            result = (500, {"msg": str(e)})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if not isinstance(result, tuple):
+            result = (200, result)
+        status, payload = result[0], result[1]
+        headers = result[2] if len(result) > 2 else {}
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, str(value))
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
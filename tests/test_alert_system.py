@@ -0,0 +1,132 @@
+import json
+import types
+import pytest
+from alert_system import AlertSystem, coalesce
+
+FLUSH = {"scenario_flags": ["SCENARIO_2_FLUSH_FAVORED"], "liquidation_pulse": "NORMAL", "price": 65000.0}
+BREAKDOWN = {"scenario_flags": ["SCENARIO_3_BREAKDOWN_RISK"], "liquidation_pulse": "NORMAL", "price": 64000.0}
+
+class Webhook:
+    """
+    Stand-in webhook answering with the queued status codes, then 204.
+    """
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def __call__(self, query, body):
+        self.posts.append(body["content"])
+        status = self.statuses.pop(0) if self.statuses else 204
+        return status, {}
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "alert_state.json")
+
+def make_alerter(stand_in, state_path, symbol="BTCUSDT", **kwargs):
+    kwargs = dict(dict(cooldown=3600, batch_window=0.05, backoff=0.01), **kwargs)
+    return AlertSystem(webhook_url=stand_in.url("/hook"), symbol=symbol, state_path=state_path, **kwargs)
+
+def test_delivered_alert_names_symbol_and_starts_cooldown(stand_in, state_path):
+    webhook = stand_in.routes["/hook"] = Webhook()
+    alerter = make_alerter(stand_in, state_path)
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+
+    assert webhook.posts == ["🚨 ALERT BTCUSDT: SCENARIO_2_FLUSH_FAVORED @ 65000.0"]
+    with open(state_path) as f:
+        assert list(json.load(f)) == ["BTCUSDT:SCENARIO_2_FLUSH_FAVORED"]
+    # A later cron run for the same symbol stays quiet
+    assert not make_alerter(stand_in, state_path).check_and_alert(FLUSH)
+
+def test_cooldown_is_per_symbol(stand_in, state_path):
+    webhook = stand_in.routes["/hook"] = Webhook()
+    btc = make_alerter(stand_in, state_path)
+    eth = make_alerter(stand_in, state_path, symbol="ETHUSDT")
+    assert btc.check_and_alert(FLUSH) and btc.flush(timeout=5)
+    assert eth.check_and_alert(FLUSH) and eth.flush(timeout=5)
+
+    assert [post.split(":")[0] for post in webhook.posts] == ["🚨 ALERT BTCUSDT", "🚨 ALERT ETHUSDT"]
+    with open(state_path) as f:
+        assert sorted(json.load(f)) == ["BTCUSDT:SCENARIO_2_FLUSH_FAVORED", "ETHUSDT:SCENARIO_2_FLUSH_FAVORED"]
+
+def test_rejected_alert_does_not_start_cooldown(stand_in, state_path):
+    webhook = stand_in.routes["/hook"] = Webhook(400)
+    alerter = make_alerter(stand_in, state_path)
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert alerter.stats["dropped"] == 1
+
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert len(webhook.posts) == 2
+    assert alerter.stats["posts"] == 1
+
+def test_server_errors_are_retried(stand_in, state_path):
+    webhook = stand_in.routes["/hook"] = Webhook(500, 429)
+    alerter = make_alerter(stand_in, state_path)
+    alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert len(webhook.posts) == 3
+    assert alerter.stats == {"alerts": 1, "suppressed": 0, "posts": 1, "retries": 2, "dropped": 0}
+
+def test_alert_still_queued_at_exit_is_not_muted(stand_in, state_path):
+    stand_in.routes["/hook"] = Webhook()
+    stand_in.delay["/hook"] = 1.0
+    alerter = make_alerter(stand_in, state_path)
+    assert alerter.check_and_alert(FLUSH)
+    assert not alerter.flush(timeout=0.1)
+
+    # A process exiting now loses the post; the next run alerts again
+    assert make_alerter(stand_in, state_path).check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+
+def test_alerts_within_batch_window_share_one_post(stand_in, state_path):
+    webhook = stand_in.routes["/hook"] = Webhook()
+    alerter = make_alerter(stand_in, state_path, batch_window=0.5)
+    alerter.check_and_alert(FLUSH)
+    alerter.check_and_alert(BREAKDOWN)
+    assert alerter.flush(timeout=5)
+    assert len(webhook.posts) == 1
+    assert webhook.posts[0].count("\n") == 1
+
+def test_coalesce_splits_at_max_chars():
+    assert coalesce(["a" * 6, "b" * 3, "c" * 20], max_chars=10) == ["aaaaaa\nbbb", "c" * 10]
+
+class FailingOnce:
+    """
+    Session whose first post raises something other than a RequestException.
+    """
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json["content"])
+        if len(self.posts) == 1:
+            raise TypeError("bad payload")
+        return types.SimpleNamespace(status_code=204, headers={})
+
+def test_unexpected_delivery_error_keeps_worker_and_flush(state_path):
+    session = FailingOnce()
+    alerter = AlertSystem(webhook_url="http://hook.invalid", symbol="BTCUSDT", state_path=state_path,
+                          batch_window=0.01, session=session)
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert alerter.stats["dropped"] == 1
+
+    # The failed alert did not start its cooldown, and the same worker delivers the retry
+    worker = alerter._worker
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert alerter._worker is worker and worker.is_alive()
+    assert alerter.stats["posts"] == 1 and len(session.posts) == 2
+
+def test_error_recording_delivery_still_releases_flush(stand_in, state_path, monkeypatch):
+    stand_in.routes["/hook"] = Webhook()
+    alerter = make_alerter(stand_in, state_path)
+    monkeypatch.setattr(alerter, "_save_state", lambda: 1 / 0)
+    assert alerter.check_and_alert(FLUSH)
+    assert alerter.flush(timeout=5)
+    assert alerter.check_and_alert(BREAKDOWN)
+    assert alerter.flush(timeout=5)
+    assert alerter.stats["posts"] == 2
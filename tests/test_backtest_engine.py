@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_engine import CompactSqueezeFrame, IndicatorStream, _RollingWindow, compute_indicators, identify_squeeze_periods, run_breakout_tests
+from benchmark import _reference_breakout_tests, generate_ohlcv
+
+HOLD_PERIODS = [0, 1, 2, 3, 5, 8, 13, 24]
+
+def squeeze_frame(squeeze, seed=0):
+    """
+    Random-walk OHLC with bands around the close and a hand-set squeeze mask.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(squeeze)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    wick = np.abs(rng.normal(0, 1, (2, n)))
+    return pd.DataFrame({
+        "close": close, "high": close + wick[0], "low": close - wick[1],
+        "bb_upper": close + rng.uniform(0, 2, n), "bb_lower": close - rng.uniform(0, 2, n),
+        "squeeze": np.asarray(squeeze, dtype=bool),
+    }, index=pd.date_range("2024-01-01", periods=n, freq="1h"))
+
+def assert_matches_reference(df, hold_periods=HOLD_PERIODS):
+    fast = run_breakout_tests(df.copy(), hold_periods=hold_periods)
+    slow = _reference_breakout_tests(df, hold_periods)
+    assert len(fast) == len(slow)
+    if len(slow):
+        pd.testing.assert_frame_equal(fast.reset_index(drop=True), slow.reset_index(drop=True),
+                                      check_dtype=False, rtol=1e-12)
+    return fast
+
+def test_breakout_tests_match_reference_loop():
+    df = identify_squeeze_periods(compute_indicators(generate_ohlcv(20_000)))
+    fast = assert_matches_reference(df, hold_periods=[1, 4, 12, 24, 168])
+    assert set(fast["hold_period"]) == {1, 4, 12, 24, 168}
+
+@pytest.mark.parametrize("hold", HOLD_PERIODS)
+def test_every_hold_period_matches_reference(hold):
+    rng = np.random.default_rng(hold)
+    assert_matches_reference(squeeze_frame(rng.random(500) < 0.3, seed=hold), hold_periods=[hold])
+
+def test_run_at_series_start_is_tested():
+    squeeze = np.zeros(60, dtype=bool)
+    squeeze[:3] = True
+    df = squeeze_frame(squeeze)
+    fast = assert_matches_reference(df)
+    assert (fast["squeeze_duration"] == 3).all()
+    assert (fast["breakout_time"] == df.index[3]).all()
+
+def test_run_ending_on_last_bar_is_dropped():
+    squeeze = np.zeros(60, dtype=bool)
+    squeeze[10:12] = True
+    squeeze[55:] = True
+    fast = assert_matches_reference(squeeze_frame(squeeze))
+    assert (fast["squeeze_duration"] == 2).all()
+
+def test_horizons_past_the_end_are_dropped_per_period():
+    squeeze = np.zeros(40, dtype=bool)
+    squeeze[30:37] = True
+    df = squeeze_frame(squeeze)
+    fast = assert_matches_reference(df)
+    # Breakout at bar 37 leaves bars 37..39, so only holds 0..2 fit
+    assert list(fast["hold_period"]) == [0, 1, 2]
+
+def test_no_squeeze_returns_empty_frame():
+    assert run_breakout_tests(squeeze_frame(np.zeros(50, dtype=bool))).empty
+
+INDICATOR_COLUMNS = ["bb_mid", "bb_std", "bb_upper", "bb_lower", "bb_bandwidth", "atr"]
+
+def assert_indicators_match(got, expected, rtol=1e-7):
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(np.asarray(got[col], dtype=np.float64), expected[col].to_numpy(), rtol=rtol,
+                                   equal_nan=True, err_msg=col)
+
+def stream_frame(df, split, resync_every=10_000, batch_first=False):
+    """
+    Indicators from IndicatorStream: bars before `split` one at a time and
+    the rest as one micro-batch (or the other way round).
+    """
+    high, low, close = (df[col].to_numpy() for col in ("high", "low", "close"))
+    stream = IndicatorStream(resync_every=resync_every)
+    singles = lambda sl: pd.DataFrame([stream.update(h, l, c) for h, l, c in zip(high[sl], low[sl], close[sl])],
+                                      columns=INDICATOR_COLUMNS)
+    batch = lambda sl: pd.DataFrame(stream.update_batch(high[sl], low[sl], close[sl]))
+    first, rest = slice(None, split), slice(split, None)
+    parts = [batch(first), singles(rest)] if batch_first else [singles(first), batch(rest)]
+    return pd.concat(parts, ignore_index=True).set_axis(df.index)
+
+@pytest.fixture(scope="module")
+def ohlcv_5k():
+    return generate_ohlcv(5_000)
+
+@pytest.mark.parametrize("resync_every", [7, 10_000])
+def test_indicator_stream_matches_compute_indicators(ohlcv_5k, resync_every):
+    expected = compute_indicators(ohlcv_5k.copy())
+    assert_indicators_match(stream_frame(ohlcv_5k, len(ohlcv_5k), resync_every), expected)
+    assert_indicators_match(stream_frame(ohlcv_5k, 0, resync_every), expected)
+
+def test_indicator_stream_handles_missing_closes(ohlcv_5k):
+    df = ohlcv_5k.iloc[:500].copy()
+    df.iloc[200, df.columns.get_loc("close")] = np.nan
+    expected = compute_indicators(df.copy())
+    # A missing close blanks every window it is in, then the bands recover
+    assert expected["bb_mid"].iloc[200:220].isna().all() and expected["bb_mid"].iloc[220:].notna().all()
+    assert_indicators_match(stream_frame(df, 210, resync_every=5), expected)
+    assert_indicators_match(stream_frame(df, 210, resync_every=5, batch_first=True), expected)
+
+@pytest.mark.parametrize("batch_first", [False, True])
+def test_split_inside_a_squeeze_run_keeps_the_run(ohlcv_5k, batch_first):
+    expected = identify_squeeze_periods(compute_indicators(ohlcv_5k.copy()))
+    runs = (expected["squeeze"] != expected["squeeze"].shift()).cumsum()[expected["squeeze"]]
+    lengths = runs.value_counts()
+    run = runs[runs == lengths[lengths >= 4].index[0]]
+    split = ohlcv_5k.index.get_loc(run.index[len(run) // 2])
+
+    streamed = ohlcv_5k.join(stream_frame(ohlcv_5k, split, resync_every=13, batch_first=batch_first))
+    assert_indicators_match(streamed, expected)
+    got = identify_squeeze_periods(streamed)
+    np.testing.assert_array_equal(got["squeeze"].to_numpy(), expected["squeeze"].to_numpy())
+    pd.testing.assert_frame_equal(run_breakout_tests(got), run_breakout_tests(expected))
+
+def test_rolling_window_resync_limits_drift():
+    # Prices far from the first value (the shift) make the running sums lose precision
+    rng = np.random.default_rng(0)
+    xs = np.linspace(1, 1e6, 20_000) + rng.normal(0, 1e-2, 20_000)
+    stds = {}
+    for resync_every in (500, 10**9):
+        window = _RollingWindow(20, resync_every=resync_every)
+        for x in xs:
+            window.push(x)
+        assert window.mean() == pytest.approx(xs[-20:].mean(), rel=1e-12)
+        stds[resync_every] = window.std()
+    assert stds[500] == pytest.approx(xs[-20:].std(), rel=1e-12)
+    assert stds[10**9] != pytest.approx(xs[-20:].std(), rel=1e-12)
+
+@pytest.mark.parametrize("threshold_mode", ["global", "rolling", "expanding"])
+@pytest.mark.parametrize("params", [{}, dict(bb_window=30, bb_std_multiplier=2.5, atr_window=10)])
+def test_compact_frame_matches_full_frame(threshold_mode, params):
+    df = generate_ohlcv(20_000, seed=1)
+    original = df.copy()
+    compact = CompactSqueezeFrame(df, **params).identify_squeeze_periods(threshold_mode=threshold_mode,
+                                                                         threshold_window=500)
+    full = identify_squeeze_periods(compute_indicators(df.copy(), **params), threshold_mode=threshold_mode,
+                                    threshold_window=500)
+    pd.testing.assert_frame_equal(df, original)
+
+    # float32 storage: the bands agree to float32 precision
+    for col in ("bb_upper", "bb_lower", "bb_bandwidth"):
+        np.testing.assert_allclose(getattr(compact, col)(), full[col].to_numpy(), rtol=1e-6, equal_nan=True,
+                                   err_msg=col)
+    np.testing.assert_allclose(compact.atr, full["atr"].to_numpy(), rtol=1e-6, equal_nan=True)
+    for col in ("squeeze", "squeeze_start", "squeeze_end"):
+        np.testing.assert_array_equal(getattr(compact, col), full[col].to_numpy(), err_msg=col)
+    np.testing.assert_array_equal(compact.squeeze_id, (full["squeeze"] != full["squeeze"].shift()).cumsum())
+
+    results = run_breakout_tests(full)
+    assert len(results) > 100
+    pd.testing.assert_frame_equal(compact.run_breakout_tests(), results, rtol=1e-6)
+    assert compact.nbytes() < full.memory_usage(deep=True).sum() - original.memory_usage(deep=True).sum()
+
+def test_compact_frame_needs_thresholds_first():
+    compact = CompactSqueezeFrame(generate_ohlcv(100))
+    with pytest.raises(ValueError):
+        compact.squeeze
+    assert compact.identify_squeeze_periods(threshold_mode="rolling").run_breakout_tests().empty
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+import data_loader
+from batch_backtest import cross_symbol_summary, run_batch
+from benchmark import generate_ohlcv
+
+PARAMS = dict(bb_window=20, bb_std=2.0, atr_window=14, bw_quantile=0.10, atr_quantile=0.10,
+              threshold_mode="global", threshold_window=720)
+HOLD_PERIODS = [1, 4, 12]
+
+def offline(*args, **kwargs):
+    raise ConnectionError("offline")
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # The store lands under tmp_path/data/store; a missing file must not reach Binance
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_loader.requests, "get", offline)
+    (tmp_path / "data").mkdir()
+    for seed, symbol in enumerate(["BTCUSDT", "ETHUSDT"]):
+        generate_ohlcv(3_000, seed=seed, freq="1h").to_csv(tmp_path / "data" / f"{symbol}_1h.csv")
+    return str(tmp_path / "data")
+
+def tasks(data_dir, symbols):
+    return [(symbol, "1h", data_dir, PARAMS, HOLD_PERIODS) for symbol in symbols]
+
+def test_missing_file_becomes_an_error_row(data_dir, tmp_path):
+    results_path = str(tmp_path / "results.csv")
+    infos = run_batch(tasks(data_dir, ["BTCUSDT", "NOPEUSDT", "ETHUSDT"]), results_path, workers=1)
+    by_symbol = {info["symbol"]: info for info in infos}
+    assert by_symbol["NOPEUSDT"]["error"] == "no data"
+    assert by_symbol["NOPEUSDT"]["bars"] == 0
+    assert by_symbol["BTCUSDT"]["error"] is None and by_symbol["BTCUSDT"]["bars"] == 3_000
+
+    results = pd.read_csv(results_path)
+    assert set(results["symbol"]) == {"BTCUSDT", "ETHUSDT"}
+    assert set(results["hold_period"]) == set(HOLD_PERIODS)
+
+def test_pool_writes_the_same_results(data_dir, tmp_path):
+    serial, pooled = str(tmp_path / "serial.csv"), str(tmp_path / "pooled.csv")
+    run_batch(tasks(data_dir, ["BTCUSDT", "ETHUSDT"]), serial, workers=1)
+    run_batch(tasks(data_dir, ["BTCUSDT", "ETHUSDT"]), pooled, workers=2)
+    key = ["symbol", "squeeze_end_time", "hold_period"]
+    pd.testing.assert_frame_equal(pd.read_csv(serial).sort_values(key, ignore_index=True),
+                                  pd.read_csv(pooled).sort_values(key, ignore_index=True))
+
+def test_all_rows_pool_every_symbol(data_dir, tmp_path):
+    results_path = str(tmp_path / "results.csv")
+    run_batch(tasks(data_dir, ["BTCUSDT", "ETHUSDT"]), results_path, workers=1)
+    results = pd.read_csv(results_path)
+    summary = cross_symbol_summary(results).set_index(["symbol", "interval", "hold_period", "direction"])
+
+    for (hold, direction), group in results.groupby(["hold_period", "direction"]):
+        pooled = summary.loc[("ALL", "1h", hold, direction)]
+        assert pooled["pct_change_count"] == len(group)
+        assert pooled["pct_change_mean"] == pytest.approx(group["pct_change"].mean())
+        assert pooled["max_down_pct_min"] == group["max_down_pct"].min()
+        per_symbol = summary.loc[(["BTCUSDT", "ETHUSDT"], "1h", hold, direction), "pct_change_count"]
+        assert per_symbol.sum() == len(group)
+
+def test_empty_results_give_empty_summary():
+    assert cross_symbol_summary(pd.DataFrame()).empty
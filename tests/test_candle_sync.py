@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+from candle_sync import CandleSync, index_to_ms
+from ohlcv_store import read_meta, read_partition, write_partition
+from providers.http import HostLimiter
+from providers.market_data import MarketDataProvider
+
+HOUR = 3_600_000
+T0 = 1_700_000_000_000 // HOUR * HOUR
+
+class Klines:
+    """
+    Binance-style /api/v3/klines over hourly bars T0..now (minus `holes`):
+    startTime pages forward, endTime alone pages back from the newest bar.
+    The close of the newest bar moves with `tick`, like a still-open candle.
+    """
+    def __init__(self, bars: int, holes=()):
+        self.now = T0 + (bars - 1) * HOUR
+        self.holes = set(holes)
+        self.tick = 0.0
+        self.down = False
+
+    def __call__(self, query, body):
+        if self.down:
+            return 500, {"msg": "down"}
+        limit = int(query.get("limit", 500))
+        start, end = query.get("startTime"), query.get("endTime")
+        times = [t for t in range(T0, self.now + 1, HOUR) if t not in self.holes]
+        if end is not None:
+            times = [t for t in times if t <= int(end)]
+        if start is not None:
+            times = [t for t in times if t >= int(start)][:limit]
+        else:
+            times = times[-limit:]
+        rows = []
+        for t in times:
+            close = t / HOUR + (self.tick if t == self.now else 0.0)
+            rows.append([t, str(close), str(close + 1), str(close - 1), str(close), "1.0",
+                         t + HOUR - 1, "0", 0, "0", "0", "0"])
+        return rows
+
+@pytest.fixture
+def exchange(stand_in):
+    klines = Klines(bars=100)
+    stand_in.routes["/api/v3/klines"] = klines
+    return klines
+
+@pytest.fixture
+def syncer(stand_in, exchange, tmp_path):
+    provider = MarketDataProvider(limiter=HostLimiter())
+    provider.sources = [stand_in.url("/api/v3/klines")]
+    return CandleSync(provider, store_root=str(tmp_path), page_limit=30)
+
+def test_initial_sync_fetches_latest_page(syncer):
+    df = syncer.sync("BTCUSDT", "1h")
+    assert len(df) == 30
+    assert index_to_ms(df.index)[-1] == T0 + 99 * HOUR
+    assert syncer.requests == 1
+
+def test_refresh_appends_new_bars_and_rewrites_open_bar(syncer, exchange):
+    syncer.sync("BTCUSDT", "1h")
+    old_last = exchange.now
+    exchange.now += 3 * HOUR
+    exchange.tick = 0.5
+    newest = exchange.now
+
+    df = syncer.sync("BTCUSDT", "1h")
+    assert syncer.requests == 1
+    assert len(df) == 33
+    assert index_to_ms(df.index)[-1] == newest
+    assert df["close"].iloc[-1] == newest / HOUR + 0.5
+    assert df["close"].iloc[-4] == old_last / HOUR
+
+def test_backfill_pages_back_to_since(syncer):
+    syncer.sync("BTCUSDT", "1h")
+    df = syncer.sync("BTCUSDT", "1h", since=pd.Timestamp(T0, unit="ms"))
+    assert len(df) == 100
+    assert index_to_ms(df.index)[0] == T0
+    assert syncer.requests > 3
+
+def test_gap_inside_store_is_refetched(syncer, tmp_path):
+    full = syncer.sync("BTCUSDT", "1h")
+    holed = full.drop(full.index[10:15])
+    write_partition(holed, "BTCUSDT", "1h", str(tmp_path), extra_meta={"origin": "sync", "known_gaps": []})
+
+    df = syncer.sync("BTCUSDT", "1h")
+    assert len(df) == 30
+    assert read_meta("BTCUSDT", "1h", str(tmp_path))["known_gaps"] == []
+
+def test_exchange_side_gap_is_remembered_and_skipped(stand_in, exchange, tmp_path):
+    exchange.holes = {T0 + 80 * HOUR, T0 + 81 * HOUR}
+    provider = MarketDataProvider(limiter=HostLimiter())
+    provider.sources = [stand_in.url("/api/v3/klines")]
+    syncer = CandleSync(provider, store_root=str(tmp_path), page_limit=30)
+
+    syncer.sync("BTCUSDT", "1h")
+    syncer.sync("BTCUSDT", "1h")
+    assert read_meta("BTCUSDT", "1h", str(tmp_path))["known_gaps"] == [[T0 + 79 * HOUR, T0 + 82 * HOUR]]
+
+    syncer.sync("BTCUSDT", "1h")
+    assert syncer.requests == 1
+
+def test_outage_keeps_stored_history(syncer, exchange, tmp_path):
+    before = syncer.sync("BTCUSDT", "1h")
+    exchange.down = True
+    df = syncer.sync("BTCUSDT", "1h")
+    assert syncer.errors
+    assert df.equals(before)
+    assert len(read_partition("BTCUSDT", "1h", str(tmp_path))) == 30
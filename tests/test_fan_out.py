@@ -0,0 +1,53 @@
+import time
+import pytest
+import metrics_fetcher
+import monitor_cli
+from providers.cache import TTLCache
+from providers.derivatives import DerivativesProvider
+from providers.sentiment import SentimentProvider
+from test_metrics_cache import serve_metrics
+
+@pytest.fixture
+def metrics_stand_in(stand_in, monkeypatch):
+    serve_metrics(stand_in)
+    cache = TTLCache()
+    derivatives = DerivativesProvider(cache=cache)
+    derivatives.binance_base = stand_in.url("")
+    sentiment = SentimentProvider(cache=cache)
+    sentiment.fng_url = stand_in.url("/fng/")
+    monkeypatch.setattr(metrics_fetcher, "_derivatives", derivatives)
+    monkeypatch.setattr(metrics_fetcher, "_sentiment", sentiment)
+    monkeypatch.setattr(metrics_fetcher, "COINGECKO_BASE", stand_in.url(""))
+    monkeypatch.setattr(metrics_fetcher, "get_cache", lambda: cache)
+    return stand_in
+
+def test_slow_source_gets_fallback_within_deadline(metrics_stand_in):
+    metrics_stand_in.delay["/global"] = 5.0
+
+    t0 = time.perf_counter()
+    metrics, latency = monitor_cli.fetch_metrics("BTCUSDT", deadline=1.0)
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 2.0
+    assert latency["dominance"] == "timeout"
+    assert (metrics["btc_dom"], metrics["eth_btc"], metrics["sol_btc"]) == monitor_cli.METRIC_FALLBACKS["dominance"]
+    assert metrics["funding_rate"] == 0.0001
+    assert metrics["fear_value"] == 25
+    assert isinstance(latency["funding_oi"], float)
+
+def test_sources_are_fetched_concurrently(metrics_stand_in):
+    for path in ("/fapi/v1/premiumIndex", "/fng/", "/global"):
+        metrics_stand_in.delay[path] = 0.5
+
+    t0 = time.perf_counter()
+    _, latency = monitor_cli.fetch_metrics("BTCUSDT", deadline=5.0)
+    assert time.perf_counter() - t0 < 1.2
+    assert all(isinstance(v, float) for v in latency.values())
+
+def test_failing_call_reports_error_and_falls_back():
+    def boom():
+        raise RuntimeError("upstream down")
+
+    results, latency = monitor_cli.fan_out({"ok": (lambda: 1, 0), "bad": (boom, "fallback")}, deadline=1.0)
+    assert results == {"ok": 1, "bad": "fallback"}
+    assert latency["bad"] == "error"
@@ -0,0 +1,70 @@
+import time
+from alt_scanner import AltScanner
+from providers.http import HostLimiter, get_session
+from providers.market_data import MarketDataProvider
+
+def kline_rows(query, body):
+    symbol = query["symbol"]
+    if symbol == "BADUSDT":
+        return 400, {"msg": "Invalid symbol."}
+    base = 100.0 if symbol == "BTCUSDT" else 10.0
+    limit = int(query.get("limit", 500))
+    return [[i * 3_600_000, str(base + i), str(base + i), str(base + i), str(base + i), "1.0",
+             0, "0", 0, "0", "0", "0"] for i in range(limit)]
+
+def make_provider(stand_in, limiter=None):
+    stand_in.routes["/api/v3/klines"] = kline_rows
+    provider = MarketDataProvider(limiter=limiter or HostLimiter())
+    provider.sources = [stand_in.url("/api/v3/klines")]
+    return provider
+
+def test_batch_fetch_runs_concurrently_in_input_order(stand_in):
+    provider = make_provider(stand_in)
+    stand_in.delay["/api/v3/klines"] = 0.2
+    symbols = [f"ALT{i}USDT" for i in range(40)] + ["BADUSDT"]
+
+    t0 = time.perf_counter()
+    frames = provider.fetch_ohlcv_batch(symbols, limit=48)
+    elapsed = time.perf_counter() - t0
+
+    assert list(frames) == symbols
+    assert all(len(frames[s]) == 48 for s in symbols[:-1])
+    assert frames["BADUSDT"].empty
+    assert elapsed < 0.2 * len(symbols) / 4
+
+def test_limiter_caps_in_flight_requests_per_host(stand_in):
+    provider = make_provider(stand_in, HostLimiter(max_per_host=4))
+    stand_in.delay["/api/v3/klines"] = 0.05
+    provider.fetch_ohlcv_batch([f"ALT{i}USDT" for i in range(20)], limit=5)
+    assert stand_in.max_in_flight == 4
+
+def test_retry_after_pauses_host_then_retries_once(stand_in):
+    calls = []
+
+    def limited(query, body):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return 429, {"msg": "Too many requests"}, {"Retry-After": "0.3"}
+        return {"ok": True}
+    stand_in.routes["/limited"] = limited
+
+    response = HostLimiter().get(get_session(), stand_in.url("/limited"), timeout=5)
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.3
+
+def test_used_weight_near_limit_pauses_host(stand_in):
+    stand_in.routes["/weighted"] = lambda query, body: (200, {}, {"X-MBX-USED-WEIGHT-1M": "95"})
+    limiter = HostLimiter(weight_limit=100)
+    limiter.get(get_session(), stand_in.url("/weighted"), timeout=5)
+    host = stand_in.url("").split("//")[1]
+    assert limiter._paused_until[host] > time.monotonic()
+
+def test_alt_scanner_ranks_alts_from_one_batch(stand_in):
+    provider = make_provider(stand_in)
+    scanner = AltScanner(watchlist=["ETHUSDT", "BADUSDT"], provider=provider)
+    btc = provider.fetch_ohlcv("BTCUSDT", limit=48)
+
+    result = scanner.scan_rotation(btc)
+    assert list(result["symbol"]) == ["ETHUSDT"]
+    assert stand_in.hits("/api/v3/klines") == 3
@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+from datetime import datetime
+import pytest
+import logger
+from logger import SignalLogger, read_log
+
+WRITERS = 4
+ROWS = 300
+
+def write_rows(filepath, fmt, writer):
+    log = SignalLogger(filepath, fmt=fmt, flush_rows=7, flush_seconds=60, max_bytes=4000)
+    for i in range(ROWS):
+        log.log_run({"price": writer * 10_000 + i, "scenario_flags": [f"W{writer}"], "funding": 0.0001})
+    log.close()
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar"])
+def test_concurrent_writers_keep_every_row(tmp_path, fmt):
+    filepath = str(tmp_path / ("monitor_log.csv" if fmt == "csv" else "monitor_log"))
+    procs = [multiprocessing.Process(target=write_rows, args=(filepath, fmt, w)) for w in range(WRITERS)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert all(proc.exitcode == 0 for proc in procs)
+
+    df = read_log(filepath, fmt=fmt)
+    assert len(df) == WRITERS * ROWS
+    assert sorted(df["price"]) == sorted(w * 10_000 + i for w in range(WRITERS) for i in range(ROWS))
+    assert df.groupby("scenario_flags").size().to_dict() == {f"W{w}": ROWS for w in range(WRITERS)}
+
+    # Time-range reads through the index still find the right rows
+    mid = df.index[len(df) // 2]
+    assert len(read_log(filepath, start=mid, fmt=fmt)) == (df.index >= mid).sum()
+
+def test_single_writer_round_trip(tmp_path):
+    filepath = str(tmp_path / "monitor_log.csv")
+    with SignalLogger(filepath, flush_rows=5) as log:
+        for i in range(12):
+            log.log_run({"price": float(i), "scenario_flags": ["S1", "MID"]})
+        df = log.read()
+    assert list(df["price"]) == [float(i) for i in range(12)]
+    assert df["scenario_flags"].iloc[0] == "S1;MID"
+    assert os.path.exists(str(tmp_path / "monitor_log.index.json"))
+
+class FrozenClock(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 3, 1, 12, 0, 0)
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar"])
+def test_rotations_within_one_second_number_before_the_extension(tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(logger, "datetime", FrozenClock)
+    filepath = str(tmp_path / ("monitor_log.csv" if fmt == "csv" else "monitor_log"))
+    with SignalLogger(filepath, fmt=fmt, flush_rows=1, max_bytes=1) as log:
+        for i in range(4):
+            log.log_run({"price": float(i)})
+        df = log.read()
+    assert list(df["price"]) == [0.0, 1.0, 2.0, 3.0]
+
+    names = sorted(os.listdir(tmp_path if fmt == "csv" else filepath))
+    if fmt == "csv":
+        expected = ["monitor_log.20240301T120000.2.csv", "monitor_log.20240301T120000.3.csv",
+                    "monitor_log.20240301T120000.csv", "monitor_log.csv"]
+        assert [n for n in names if n.endswith(".csv")] == expected
+    else:
+        assert {"20240301T120000", "20240301T120000.2", "20240301T120000.3"} <= set(names)
@@ -0,0 +1,61 @@
+import metrics_fetcher
+from providers.cache import TTLCache
+from providers.derivatives import DerivativesProvider
+from providers.sentiment import SentimentProvider
+
+def oi_rows(values):
+    return [{"timestamp": i * 3_600_000, "sumOpenInterest": str(v)} for i, v in enumerate(values)]
+
+def serve_metrics(stand_in):
+    stand_in.routes.update({
+        "/fapi/v1/premiumIndex": lambda q, b: {"lastFundingRate": "0.0001"},
+        "/futures/data/openInterestHist": lambda q, b: oi_rows([100.0, 110.0]),
+        "/fng/": lambda q, b: {"data": [{"value": "25", "value_classification": "Extreme Fear"}]},
+        "/global": lambda q, b: {"data": {"market_cap_percentage": {"btc": 56.5}}},
+        "/simple/price": lambda q, b: {"ethereum": {"btc": 0.05}, "solana": {"btc": 0.002}},
+    })
+
+def test_repeated_rounds_make_one_request_per_endpoint(stand_in, monkeypatch):
+    serve_metrics(stand_in)
+    cache = TTLCache()
+    derivatives = DerivativesProvider(cache=cache)
+    derivatives.binance_base = stand_in.url("")
+    sentiment = SentimentProvider(cache=cache)
+    sentiment.fng_url = stand_in.url("/fng/")
+    monkeypatch.setattr(metrics_fetcher, "COINGECKO_BASE", stand_in.url(""))
+    monkeypatch.setattr(metrics_fetcher, "get_cache", lambda: cache)
+
+    for _ in range(20):
+        assert derivatives.fetch_funding_and_oi("BTCUSDT") == (0.0001, 110.0, 10.0)
+        assert sentiment.fetch_fear_greed() == (25, "Extreme Fear")
+        assert metrics_fetcher.fetch_btc_dominance_and_pairs() == (56.5, 0.05, 0.002)
+
+    for path in ("/fapi/v1/premiumIndex", "/futures/data/openInterestHist", "/fng/", "/global", "/simple/price"):
+        assert stand_in.hits(path) == 1
+    assert cache.stats["misses"] == 5
+
+def test_empty_open_interest_keeps_last_value(stand_in):
+    serve_metrics(stand_in)
+    cache = TTLCache(ttls={"open_interest": 0})
+    derivatives = DerivativesProvider(cache=cache)
+    derivatives.binance_base = stand_in.url("")
+    assert derivatives.fetch_funding_and_oi("BTCUSDT")[1:] == (110.0, 10.0)
+
+    stand_in.routes["/futures/data/openInterestHist"] = lambda q, b: []
+    assert derivatives.fetch_funding_and_oi("BTCUSDT")[1:] == (110.0, 10.0)
+    assert cache.stats["errors"] == 1
+    assert cache._entries["open_interest:BTCUSDT"]["value"] == (110.0, 10.0)
+
+def test_one_shot_run_can_wait_for_stale_refresh(stand_in, tmp_path):
+    serve_metrics(stand_in)
+    stand_in.delay["/fng/"] = 0.3
+    disk_path = str(tmp_path / "metrics_cache.json")
+    cache = TTLCache(disk_path=disk_path, ttls={"fear_greed": 60})
+    cache.set("fear_greed", (70, "Greed"))
+    cache._entries["fear_greed"]["ts"] -= 120
+    sentiment = SentimentProvider(cache=cache)
+    sentiment.fng_url = stand_in.url("/fng/")
+
+    assert sentiment.fetch_fear_greed() == (70, "Greed")
+    assert cache.wait_for_refreshes(timeout=5)
+    assert TTLCache(disk_path=disk_path).get("fear_greed", "fear_greed", lambda: None) == (25, "Extreme Fear")
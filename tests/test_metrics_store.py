@@ -0,0 +1,52 @@
+import pandas as pd
+from metrics_store import backfill_metrics, read_series
+from providers.cache import TTLCache
+from providers.derivatives import DerivativesProvider
+from providers.sentiment import SentimentProvider
+
+HOUR = 3_600_000
+
+class History:
+    """
+    Paged Binance history endpoint over fixed timestamps (startTime/endTime/limit).
+    """
+    def __init__(self, times, time_key, value_key):
+        self.times = times
+        self.time_key = time_key
+        self.value_key = value_key
+        self.starts = []
+
+    def __call__(self, query, body):
+        start = int(query.get("startTime", 0))
+        self.starts.append(start)
+        times = [t for t in self.times if t >= start][:int(query.get("limit", 500))]
+        return [{self.time_key: t, self.value_key: "1.0"} for t in times]
+
+def test_backfill_with_old_since_only_fetches_new_points(stand_in, tmp_path):
+    now_ms = int(pd.Timestamp.now().value // 1_000_000) // HOUR * HOUR
+    oi = History([now_ms - i * HOUR for i in range(29 * 24 - 1, -1, -1)], "timestamp", "sumOpenInterest")
+    funding = History([now_ms - i * 8 * HOUR for i in range(300, -1, -1)], "fundingTime", "fundingRate")
+    stand_in.routes.update({
+        "/futures/data/openInterestHist": oi,
+        "/fapi/v1/fundingRate": funding,
+        "/fng/": lambda q, b: {"data": []},
+    })
+    derivatives = DerivativesProvider(cache=TTLCache())
+    derivatives.binance_base = stand_in.url("")
+    sentiment = SentimentProvider(cache=TTLCache())
+    sentiment.fng_history_url = stand_in.url("/fng/")
+    since = pd.Timestamp(now_ms - 400 * 24 * HOUR, unit="ms")
+    root = str(tmp_path)
+
+    rows = backfill_metrics("BTCUSDT", since=since, root=root, derivatives=derivatives, sentiment=sentiment)
+    assert rows["BTCUSDT_oi"] == 29 * 24
+    assert rows["BTCUSDT_funding_rate"] == 301
+    first_requests = stand_in.hits("/futures/data/openInterestHist")
+
+    oi.times.append(now_ms + HOUR)
+    rows = backfill_metrics("BTCUSDT", since=since, root=root, derivatives=derivatives, sentiment=sentiment)
+    assert rows["BTCUSDT_oi"] == 29 * 24 + 1
+    assert stand_in.hits("/futures/data/openInterestHist") == first_requests + 1
+    assert oi.starts[-1] == now_ms + 1
+    assert funding.starts[-1] == now_ms + 1
+    assert read_series("BTCUSDT_oi", root).index[-1] == pd.Timestamp(now_ms + HOUR, unit="ms")
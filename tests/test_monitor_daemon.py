@@ -0,0 +1,117 @@
+import argparse
+import os
+import signal
+import time
+import types
+import numpy as np
+import pandas as pd
+import pytest
+import monitor_cli
+from benchmark import generate_ohlcv
+from candle_sync import index_to_ms
+from providers.http import HostLimiter
+from providers.market_data import MarketDataProvider
+from resampler import ResampleStream, resample_ohlcv
+
+MINUTE = 60_000
+
+class MinuteKlines:
+    """
+    /api/v3/klines over 1m bars of a synthetic series, published up to `now`.
+    """
+    def __init__(self, df, now):
+        self.df = df
+        self.ms = index_to_ms(df.index)
+        self.now = now
+        self.starts = []
+
+    def __call__(self, query, body):
+        start = int(query["startTime"])
+        self.starts.append(start)
+        rows = []
+        for i in np.flatnonzero((self.ms >= start) & (self.ms <= self.now))[:int(query.get("limit", 500))]:
+            bar = self.df.iloc[i]
+            rows.append([int(self.ms[i]), str(bar["open"]), str(bar["high"]), str(bar["low"]), str(bar["close"]),
+                         str(bar["volume"]), int(self.ms[i]) + MINUTE - 1, "0", 0, "0", "0", "0"])
+        return rows
+
+def test_resample_stream_matches_full_resample():
+    base = generate_ohlcv(1000)
+    rng = np.random.default_rng(3)
+    stream = ResampleStream("15m", "1m", int(index_to_ms(base.index)[0]))
+    out = None
+    cuts = np.sort(rng.choice(np.arange(1, len(base)), size=40, replace=False))
+    for chunk in np.split(np.arange(len(base)), cuts):
+        fresh = stream.update(base.iloc[chunk])
+        # Each update rebuilds the newest bucket, so later rows replace earlier ones
+        out = fresh if out is None else pd.concat([out[out.index < fresh.index[0]], fresh])
+    # 1000 bars end inside a bucket: the partial last bucket matches too
+    pd.testing.assert_frame_equal(out, resample_ohlcv(base, "15m", "1m"), check_freq=False)
+
+def test_resample_stream_ignores_bars_already_seen():
+    base = generate_ohlcv(60)
+    stream = ResampleStream("15m", "1m", int(index_to_ms(base.index)[0]))
+    stream.update(base.iloc[:40])
+    fresh = stream.update(base.iloc[20:])
+    pd.testing.assert_frame_equal(fresh, resample_ohlcv(base, "15m", "1m").iloc[2:], check_freq=False)
+
+def test_daemon_base_fetch_requests_only_new_candles(stand_in):
+    base = generate_ohlcv(300)
+    base_ms = index_to_ms(base.index)
+    klines = MinuteKlines(base, now=int(base_ms[88]))
+    stand_in.routes["/api/v3/klines"] = klines
+    provider = MarketDataProvider(limiter=HostLimiter())
+    provider.sources = [stand_in.url("/api/v3/klines")]
+    args = argparse.Namespace(symbol="BTCUSDT", interval="15m", base_interval="1m")
+    expected = resample_ohlcv(base, "15m", "1m")
+
+    # Bars up to 00:45 are loaded; the stream starts at the next bucket
+    stream = ResampleStream("15m", "1m", int(base_ms[60]))
+    fresh = monitor_cli.fetch_new_bars(provider, args, int(base_ms[45]), 15 * MINUTE, stream)
+    assert klines.starts == [int(base_ms[60])]
+    # Bars 60..88 are out: the 01:00 bucket is complete, 01:15 still lacks its last bar
+    pd.testing.assert_frame_equal(fresh, expected.iloc[4:5], check_freq=False, check_index_type=False)
+
+    klines.now = int(base_ms[120])
+    fresh = monitor_cli.fetch_new_bars(provider, args, int(base_ms[60]), 15 * MINUTE, stream)
+    assert klines.starts[-1] == int(base_ms[89])
+    pd.testing.assert_frame_equal(fresh, expected.iloc[5:8], check_freq=False, check_index_type=False)
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def close(self):
+        self.calls.append("close")
+
+    def flush(self, timeout=None):
+        self.calls.append("flush")
+        return True
+
+@pytest.mark.parametrize("stop", ["sigterm", "error"])
+def test_daemon_cleans_up_on_sigterm_and_errors(monkeypatch, stop):
+    df = generate_ohlcv(100, freq="1h")
+    logger, alerter = Recorder(), Recorder()
+    monkeypatch.setattr(monitor_cli, "load_history", lambda provider, args, limit: df)
+    monkeypatch.setattr(monitor_cli, "market_data", lambda: None)
+    monkeypatch.setattr(monitor_cli, "make_logger", lambda args: logger)
+    monkeypatch.setattr(monitor_cli, "make_alerter", lambda args: alerter)
+
+    def sleep(seconds):
+        if stop == "sigterm":
+            os.kill(os.getpid(), signal.SIGTERM)
+        else:
+            raise RuntimeError("boom")
+    monkeypatch.setattr(monitor_cli, "time", types.SimpleNamespace(sleep=sleep, time=time.time,
+                                                                   perf_counter=time.perf_counter))
+    previous = signal.getsignal(signal.SIGTERM)
+    args = argparse.Namespace(symbol="BTCUSDT", interval="1h", base_interval=None, history=100, risk_stop=0.0,
+                              grace=0.0, deadline=1.0)
+    if stop == "sigterm":
+        monitor_cli.run_daemon(args)
+    else:
+        with pytest.raises(RuntimeError):
+            monitor_cli.run_daemon(args)
+    assert logger.calls == ["close"]
+    assert alerter.calls == ["flush"]
+    assert signal.getsignal(signal.SIGTERM) == previous
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from benchmark import generate_ohlcv
+from candle_sync import index_to_ms
+from multi_timeframe import align_to_base, multi_timeframe_squeezes, timeframe_squeeze
+
+MINUTE = 60_000
+
+def test_value_is_seen_from_the_bar_that_closes_with_it():
+    tf_close = np.array([15, 30]) * MINUTE
+    base_close = np.array([14, 15, 16, 29, 30, 31]) * MINUTE
+    np.testing.assert_array_equal(align_to_base(np.array([1.0, 2.0]), tf_close, base_close),
+                                  [np.nan, 1.0, 1.0, 1.0, 2.0, 2.0])
+
+@pytest.mark.parametrize("mode", ["rolling", "expanding"])
+def test_higher_timeframe_bar_is_visible_only_after_it_closes(mode):
+    df = generate_ohlcv(6_000, seed=3)
+    params = dict(threshold_mode=mode, threshold_window=50)
+    full = timeframe_squeeze(df, "15m", "1m", **params)
+    assert full.any() and not full.all()
+
+    # The flag only changes on the last 1m bar of a 15m candle
+    closes_bucket = (index_to_ms(df.index) // MINUTE + 1) % 15 == 0
+    changes = np.flatnonzero(full[1:] != full[:-1]) + 1
+    assert closes_bucket[changes].all()
+
+    # Cutting the history at a bar (mid-candle or not) leaves that bar's flag unchanged
+    rng = np.random.default_rng(0)
+    ends = np.concatenate((changes[:10], changes[:10] - 1, rng.choice(np.arange(1_000, len(df)), size=10)))
+    for end in ends:
+        assert timeframe_squeeze(df.iloc[:end + 1], "15m", "1m", **params)[-1] == full[end], end
+
+def test_confluence_combines_the_timeframe_masks():
+    df = generate_ohlcv(6_000, seed=3)
+    both = multi_timeframe_squeezes(df.copy(), "1m", ["1m", "15m"])
+    either = multi_timeframe_squeezes(df.copy(), "1m", ["1m", "15m"], combine="any")
+    np.testing.assert_array_equal(both["squeeze"], both["squeeze_1m"] & both["squeeze_15m"])
+    np.testing.assert_array_equal(either["squeeze"], either["squeeze_1m"] | either["squeeze_15m"])
+    assert both["squeeze"].any()
+    assert (both["squeeze_start"] == (both["squeeze"] & ~both["squeeze"].shift(fill_value=False))).all()
+
+    with pytest.raises(ValueError):
+        multi_timeframe_squeezes(df.copy(), "1m", ["15m"], combine="most")
+    assert not multi_timeframe_squeezes(df.copy(), "1m", [])["squeeze"].any()
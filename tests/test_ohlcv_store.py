@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+from benchmark import generate_ohlcv
+from ohlcv_store import _append_npy, append_partition, load_if_fresh, read_meta, read_partition, write_partition
+
+WRITERS = 3
+ROUNDS = 20
+
+def frame(writer, n=500):
+    # Every writer's frame has its own length and price level
+    df = generate_ohlcv(n + writer, seed=writer, freq="1h")
+    df["close"] = float(writer)
+    return df
+
+def write_rounds(root, writer):
+    df = frame(writer)
+    for _ in range(ROUNDS):
+        write_partition(df, "BTCUSDT", "1h", root)
+
+def test_round_trip_memory_maps_columns(tmp_path):
+    df = generate_ohlcv(1000, freq="1h")
+    write_partition(df, "btcusdt", "1h", str(tmp_path))
+    stored = read_partition("BTCUSDT", "1h", str(tmp_path))
+    pd.testing.assert_frame_equal(stored, df, check_freq=False)
+    assert read_meta("BTCUSDT", "1h", str(tmp_path))["rows"] == 1000
+
+def test_concurrent_writers_and_readers_see_whole_partitions(tmp_path):
+    root = str(tmp_path)
+    write_partition(frame(0), "BTCUSDT", "1h", root)
+    procs = [multiprocessing.Process(target=write_rounds, args=(root, w)) for w in range(WRITERS)]
+    for proc in procs:
+        proc.start()
+    reads = 0
+    while any(proc.is_alive() for proc in procs) or reads == 0:
+        df = read_partition("BTCUSDT", "1h", root)
+        writer = int(df["close"].iloc[0])
+        assert len(df) == 500 + writer
+        assert (df["close"] == writer).all()
+        reads += 1
+    for proc in procs:
+        proc.join()
+    assert all(proc.exitcode == 0 for proc in procs)
+
+    # No scratch directories are left next to the partition
+    assert sorted(os.listdir(tmp_path / "BTCUSDT")) == ["1h", "1h.lock"]
+
+def test_missing_partition_reads_empty_without_creating_it(tmp_path):
+    assert read_partition("ETHUSDT", "1h", str(tmp_path)).empty
+    assert read_meta("ETHUSDT", "1h", str(tmp_path)) is None
+    assert os.listdir(tmp_path) == []
+
+def test_load_if_fresh_follows_the_source_file(tmp_path):
+    csv = tmp_path / "BTCUSDT_1h.csv"
+    df = generate_ohlcv(100, freq="1h")
+    df.to_csv(csv)
+    root = str(tmp_path / "store")
+    write_partition(df, "BTCUSDT", "1h", root, source=str(csv))
+    assert load_if_fresh(str(csv), "BTCUSDT", "1h", root) is not None
+
+    os.utime(csv, (0, 0))
+    assert load_if_fresh(str(csv), "BTCUSDT", "1h", root) is None
+
+    os.remove(csv)
+    assert load_if_fresh(str(csv), "BTCUSDT", "1h", root) is not None
+    assert load_if_fresh(str(tmp_path / "other.csv"), "BTCUSDT", "1h", root) is None
+
+def test_load_if_fresh_serves_synced_partition_only_for_its_name(tmp_path):
+    root = str(tmp_path)
+    write_partition(generate_ohlcv(100, freq="1h"), "BTCUSDT", "1h", root, extra_meta={"origin": "sync"})
+    assert load_if_fresh(str(tmp_path / "BTCUSDT_1h.csv"), "BTCUSDT", "1h", root) is not None
+    assert load_if_fresh(str(tmp_path / "ETHUSDT_1h.csv"), "BTCUSDT", "1h", root) is None
+
+def append_bars(root, start, count):
+    for i in range(start, start + count):
+        assert append_partition(frame_at(i, i + 1), "BTCUSDT", "1h", root)
+
+def frame_at(start, stop):
+    # close = bar number, so a read can check every column against its timestamps
+    index = pd.date_range("2024-01-01", periods=stop, freq="1h", name="timestamp")[start:]
+    values = np.arange(start, stop, dtype=np.float64)
+    return pd.DataFrame({"open": values, "high": values, "low": values, "close": values, "volume": values},
+                        index=index)
+
+def assert_consistent(df):
+    assert (df["close"].to_numpy() == np.arange(len(df))).all()
+    assert df.index.equals(pd.date_range("2024-01-01", periods=len(df), freq="1h", name="timestamp"))
+    for col in ("open", "high", "low", "volume"):
+        assert (df[col] == df["close"]).all()
+
+def test_readers_never_see_a_partial_append(tmp_path):
+    root = str(tmp_path)
+    write_partition(frame_at(0, 10), "BTCUSDT", "1h", root)
+    proc = multiprocessing.Process(target=append_bars, args=(root, 10, 300))
+    proc.start()
+    while proc.is_alive():
+        assert_consistent(read_partition("BTCUSDT", "1h", root))
+    proc.join()
+    assert proc.exitcode == 0
+    df = read_partition("BTCUSDT", "1h", root)
+    assert len(df) == 310
+    assert_consistent(df)
+
+def test_interrupted_append_is_ignored_and_overwritten(tmp_path):
+    root = str(tmp_path)
+    write_partition(frame_at(0, 10), "BTCUSDT", "1h", root)
+    # An append that died after writing two columns and before meta.json
+    path = tmp_path / "BTCUSDT" / "1h"
+    _append_npy(str(path / "timestamp.npy"), np.array([123], dtype=np.int64))
+    _append_npy(str(path / "open.npy"), np.array([-1.0, -1.0]))
+
+    df = read_partition("BTCUSDT", "1h", root)
+    assert len(df) == 10
+    assert_consistent(df)
+
+    assert append_partition(frame_at(9, 12), "BTCUSDT", "1h", root)
+    df = read_partition("BTCUSDT", "1h", root)
+    assert len(df) == 12
+    assert_consistent(df)
+    assert len(np.load(str(path / "open.npy"))) == 12
+
+def test_append_rejects_bars_before_the_tail(tmp_path):
+    root = str(tmp_path)
+    write_partition(frame_at(0, 10), "BTCUSDT", "1h", root)
+    assert not append_partition(frame_at(5, 12), "BTCUSDT", "1h", root)
+    assert not append_partition(frame_at(0, 3), "ETHUSDT", "1h", root)
+    assert len(read_partition("BTCUSDT", "1h", root)) == 10
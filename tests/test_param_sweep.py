@@ -0,0 +1,71 @@
+from multiprocessing import shared_memory
+import pandas as pd
+import pytest
+import param_sweep
+from benchmark import generate_ohlcv
+from param_sweep import build_grid, run_sweep
+
+GRID = build_grid([14, 20], [1.5, 2.0], [14], [0.05, 0.10], [0.10])
+
+@pytest.fixture(scope="module")
+def ohlcv():
+    return generate_ohlcv(5_000, freq="1h")
+
+@pytest.fixture
+def segments(monkeypatch):
+    """
+    Names of the shared-memory blocks run_sweep creates.
+    """
+    names = []
+    to_shared = param_sweep._to_shared
+
+    def recording(df):
+        shm, n = to_shared(df)
+        names.append(shm.name)
+        return shm, n
+    monkeypatch.setattr(param_sweep, "_to_shared", recording)
+    return names
+
+def assert_unlinked(name):
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+@pytest.mark.parametrize("mode", ["global", "rolling"])
+def test_one_worker_and_a_pool_agree(ohlcv, mode):
+    serial = run_sweep(ohlcv, GRID, workers=1, threshold_mode=mode, threshold_window=500)
+    pooled = run_sweep(ohlcv, GRID, workers=2, threshold_mode=mode, threshold_window=500)
+    assert not serial.empty
+    assert set(zip(serial["bb_window"], serial["bb_std"])) == {(14, 1.5), (14, 2.0), (20, 1.5), (20, 2.0)}
+    pd.testing.assert_frame_equal(serial, pooled)
+
+def test_sweep_matches_a_single_backtest(ohlcv):
+    from backtest_engine import compute_indicators, identify_squeeze_periods, run_breakout_tests, summarize_results
+    df = identify_squeeze_periods(compute_indicators(ohlcv.copy(), bb_window=20, bb_std_multiplier=2.0, atr_window=14),
+                                  bandwidth_threshold_quantile=0.10, atr_threshold_quantile=0.10)
+    expected = summarize_results(run_breakout_tests(df)).reset_index()
+    sweep = run_sweep(ohlcv, build_grid([20], [2.0], [14], [0.10], [0.10]), workers=1)
+    pd.testing.assert_frame_equal(sweep[expected.columns], expected, check_dtype=False)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_shared_memory_is_unlinked_when_a_worker_raises(ohlcv, segments, workers):
+    with pytest.raises(ValueError, match="threshold_mode"):
+        run_sweep(ohlcv, GRID, workers=workers, threshold_mode="bogus")
+    assert len(segments) == 1
+    assert_unlinked(segments[0])
+
+def test_shared_memory_is_unlinked_after_a_sweep(ohlcv, segments):
+    run_sweep(ohlcv, GRID[:1], workers=2)
+    assert_unlinked(segments[0])
+
+def test_bad_frame_leaves_no_segment(ohlcv, monkeypatch):
+    created = []
+    init = shared_memory.SharedMemory.__init__
+
+    def recording(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        created.append(self.name)
+    monkeypatch.setattr(shared_memory.SharedMemory, "__init__", recording)
+    with pytest.raises(KeyError):
+        run_sweep(ohlcv.drop(columns="volume"), GRID, workers=1)
+    assert len(created) == 1
+    assert_unlinked(created[0])
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import resampler
+from benchmark import generate_ohlcv
+from ohlcv_store import read_meta
+from resampler import derived_key, resample_cached, resample_ohlcv
+
+@pytest.fixture
+def rewrites(monkeypatch):
+    """
+    Number of full partition rewrites resample_cached makes.
+    """
+    calls = []
+    write_partition = resampler.write_partition
+
+    def counting(*args, **kwargs):
+        calls.append(args[2])
+        return write_partition(*args, **kwargs)
+    monkeypatch.setattr(resampler, "write_partition", counting)
+    return calls
+
+def assert_same(got, expected):
+    pd.testing.assert_frame_equal(got, expected, check_freq=False, check_index_type=False)
+
+@pytest.mark.parametrize("interval", ["5m", "15m", "1h"])
+def test_appended_base_bars_resample_like_the_full_history(tmp_path, rewrites, interval):
+    base = generate_ohlcv(3_000, seed=4)
+    rng = np.random.default_rng(0)
+    # Cuts land mid-bucket, so every step rebuilds a partial last bucket
+    cuts = np.sort(rng.choice(np.arange(100, len(base)), size=12, replace=False))
+    for end in list(cuts) + [len(base)]:
+        got = resample_cached(base.iloc[:end], "BTCUSDT", interval, "1m", str(tmp_path))
+        assert_same(got, resample_ohlcv(base.iloc[:end], interval, "1m"))
+    assert rewrites == [derived_key(interval, "1m")]
+    assert read_meta("BTCUSDT", derived_key(interval, "1m"), str(tmp_path))["rows"] == len(got)
+
+def test_revised_last_base_bar_rebuilds_only_the_tail(tmp_path, rewrites):
+    base = generate_ohlcv(200, seed=4)
+    resample_cached(base, "BTCUSDT", "15m", "1m", str(tmp_path))
+    revised = base.copy()
+    revised.iloc[-1, revised.columns.get_loc("close")] += 5
+    revised.iloc[-1, revised.columns.get_loc("high")] += 10
+    assert_same(resample_cached(revised, "BTCUSDT", "15m", "1m", str(tmp_path)), resample_ohlcv(revised, "15m", "1m"))
+    assert len(rewrites) == 1
+
+@pytest.mark.parametrize("change", ["backfill", "gap_fill"])
+def test_changed_history_rebuilds_the_partition(tmp_path, rewrites, change):
+    base = generate_ohlcv(1_000, seed=4)
+    if change == "backfill":
+        before, after = base.iloc[300:], base
+    else:
+        before, after = base.drop(base.index[400:410]), base
+    resample_cached(before, "BTCUSDT", "1h", "1m", str(tmp_path))
+    assert_same(resample_cached(after, "BTCUSDT", "1h", "1m", str(tmp_path)), resample_ohlcv(after, "1h", "1m"))
+    assert len(rewrites) == 2
+
+def test_weekly_buckets_open_on_monday():
+    base = generate_ohlcv(24 * 30, freq="1h")
+    weekly = resample_ohlcv(base, "1w", "1h")
+    assert (weekly.index.dayofweek == 0).all() and (weekly.index.hour == 0).all()
+    assert weekly.index[0] <= base.index[0] < weekly.index[1]
+    assert weekly["volume"].sum() == pytest.approx(base["volume"].sum())
+
+def test_interval_must_be_a_multiple_of_the_base():
+    with pytest.raises(ValueError):
+        resample_ohlcv(generate_ohlcv(10), "7m", "5m")
+
+def test_no_store_and_same_interval(tmp_path):
+    base = generate_ohlcv(100)
+    assert resample_cached(base, "BTCUSDT", "1m", "1m", str(tmp_path)) is base
+    assert_same(resample_cached(base, "BTCUSDT", "5m", "1m", root=None), resample_ohlcv(base, "5m", "1m"))
+    assert read_meta("BTCUSDT", derived_key("5m", "1m"), str(tmp_path)) is None
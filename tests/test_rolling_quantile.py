@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rolling_quantile import BLOCK_SIZE, expanding_rank, quantile_mask, rolling_rank
+
+def sample(n=2_000, levels=None, nan_share=0.05, seed=0):
+    """
+    Random values, optionally rounded onto a few levels (ties), with NaN gaps.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0, 1, n)
+    if levels:
+        x = np.round(x * levels / 3) / levels
+    x[rng.random(n) < nan_share] = np.nan
+    x[100:130] = np.nan
+    return x
+
+def assert_ranks(x, less, valid, pandas_window):
+    s = pd.Series(x)
+    # rank(method="min") - 1 counts values strictly below; pct divides by the non-NaN count
+    expected_rank = pandas_window(s).rank(method="min")
+    expected_pct = pandas_window(s).rank(method="min", pct=True)
+    np.testing.assert_array_equal(valid, pandas_window(s).count().to_numpy())
+    ok = ~np.isnan(x)
+    np.testing.assert_array_equal(less[ok] + 1, expected_rank[ok].to_numpy())
+    np.testing.assert_allclose((less[ok] + 1) / valid[ok], expected_pct[ok].to_numpy(), rtol=1e-12)
+
+@pytest.mark.parametrize("window", [1, 2, 5, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 300, 2_500])
+@pytest.mark.parametrize("levels", [None, 4])
+def test_rolling_rank_matches_pandas(window, levels):
+    x = sample(levels=levels)
+    less, valid = rolling_rank(x, window)
+    assert_ranks(x, less, valid, lambda s: s.rolling(window, min_periods=1))
+
+@pytest.mark.parametrize("block", [1, 3, 50])
+def test_rolling_rank_block_size_does_not_matter(block):
+    x = sample(500, levels=3)
+    expected = rolling_rank(x, 37)
+    less, valid = rolling_rank(x, 37, block=block)
+    # Ranks of NaN bars are never used (quantile_mask is False there)
+    ok = ~np.isnan(x)
+    np.testing.assert_array_equal(less[ok], expected[0][ok])
+    np.testing.assert_array_equal(valid, expected[1])
+
+@pytest.mark.parametrize("levels", [None, 4])
+@pytest.mark.parametrize("block", [7, 256])
+def test_expanding_rank_matches_pandas(levels, block):
+    x = sample(levels=levels)
+    less, valid = expanding_rank(x, block=block)
+    assert_ranks(x, less, valid, lambda s: s.expanding(min_periods=1))
+
+@pytest.mark.parametrize("q", [0.0, 0.05, 0.1, 0.25, 0.5, 1.0])
+@pytest.mark.parametrize("min_periods", [1, 50, 200])
+def test_quantile_mask_matches_pandas_quantiles(q, min_periods):
+    x = sample(levels=5)
+    s = pd.Series(x)
+    window = 200
+    less, valid = rolling_rank(x, window)
+    expected = (s <= s.rolling(window, min_periods=min_periods).quantile(q)).to_numpy()
+    np.testing.assert_array_equal(quantile_mask(x, less, valid, q, min_periods), expected)
+
+    less, valid = expanding_rank(x)
+    expected = (s <= s.expanding(min_periods=min_periods).quantile(q)).to_numpy()
+    np.testing.assert_array_equal(quantile_mask(x, less, valid, q, min_periods), expected)
+
+def test_all_nan_and_empty_input():
+    less, valid = rolling_rank(np.full(10, np.nan), 4)
+    assert (valid == 0).all()
+    assert not quantile_mask(np.full(10, np.nan), less, valid, 0.5).any()
+    less, valid = rolling_rank(np.empty(0), 4)
+    assert len(less) == len(valid) == 0
+    with pytest.raises(ValueError):
+        rolling_rank(np.ones(3), 0)
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_engine import compute_indicators
+from benchmark import generate_ohlcv
+from scenario_engine import (BIT, FLAG_NAMES, ROTATION_PHASES, SENTIMENT_TAGS, VOLUME_MA_WINDOW, ScenarioStream,
+                             decode_flags, evaluate_scenarios, evaluate_scenarios_array, evaluate_scenarios_batch,
+                             flag_counts, flag_names)
+from thesis_config import ThesisLevels, Thresholds
+
+N_BARS = 400
+KEYS = ["price", "atr_pct", "price_pos_in_bb", "compression", "rotation_phase", "sentiment_tag", "liquidation_pulse"]
+
+@pytest.fixture(scope="module")
+def bars():
+    df = compute_indicators(generate_ohlcv(N_BARS, seed=7, freq="1h"))
+    # A few volume spikes on wide bars so the liquidation pulse fires, one inside the warm-up
+    for i in (18, 120, 300):
+        df.iloc[i, df.columns.get_loc("volume")] *= 20
+        df.iloc[i, df.columns.get_loc("high")] += 0.05 * df["close"].iloc[i]
+    return df
+
+@pytest.fixture(scope="module")
+def levels(bars):
+    # Levels spread over the path's range so every price branch is taken
+    q = bars["close"].quantile([0.1, 0.3, 0.35, 0.5, 0.55, 0.8, 0.85]).to_numpy()
+    return ThesisLevels(invalidation_level=q[0], flush_low=q[1], flush_high=q[2], primary_support_low=q[3],
+                        primary_support_high=q[4], mini_support_low=q[5], mini_support_high=q[6])
+
+@pytest.fixture(scope="module")
+def metrics():
+    rng = np.random.default_rng(1)
+    return {"funding_rate": rng.normal(0, 0.0008, N_BARS),
+            "btc_dom": rng.uniform(56, 62, N_BARS),
+            "fear_value": rng.integers(10, 60, N_BARS)}
+
+def per_bar(bars, levels, thresholds, metrics):
+    return [evaluate_scenarios(bars.iloc[:i + 1], levels, thresholds, metrics["funding_rate"][i],
+                               metrics["btc_dom"][i], int(metrics["fear_value"][i])) for i in range(len(bars))]
+
+def joined(flags):
+    # evaluate_scenarios lists the flags, evaluate_scenarios_batch joins them with ';'
+    return flags if isinstance(flags, str) else ";".join(flags)
+
+def assert_same(expected, got, i):
+    for key in KEYS:
+        a, b = expected[key], got[key]
+        if isinstance(a, float) and np.isnan(a):
+            assert np.isnan(b), (i, key)
+        else:
+            assert a == b, (i, key, a, b)
+    assert joined(expected["scenario_flags"]) == joined(got["scenario_flags"]), i
+
+def test_batch_and_stream_match_per_bar_evaluation(bars, levels, metrics):
+    thresholds = Thresholds(atr_low_percent=float(np.nanmedian(bars["atr"] / bars["close"])))
+    expected = per_bar(bars, levels, thresholds, metrics)
+    batch = evaluate_scenarios_batch(bars, levels, thresholds, **metrics)
+    stream = ScenarioStream(levels, thresholds)
+
+    assert len(batch) == len(bars)
+    for i, (_, bar) in enumerate(bars.iterrows()):
+        streamed = stream.update(bar, metrics["funding_rate"][i], metrics["btc_dom"][i], int(metrics["fear_value"][i]))
+        assert_same(expected[i], batch.iloc[i].to_dict(), i)
+        assert_same(expected[i], streamed, i)
+
+    flags = {f for row in expected for f in row["scenario_flags"]}
+    assert {"SCENARIO_3_BREAKDOWN_RISK", "SCENARIO_1_BASE_BUILDING", "MID_RANGE_UNCLEAR",
+            "LIQUIDATION_PULSE_DETECTED"} <= flags
+    assert flags & {"SCENARIO_2_FLUSH_FAVORED", "SCENARIO_2_OR_NOISE"}
+
+def test_warm_up_bars_have_no_volume_average(bars, levels, metrics):
+    thresholds = Thresholds()
+    batch = evaluate_scenarios_batch(bars, levels, thresholds, **metrics)
+    # The spike at bar 18 is a wide bar but precedes a full volume window, so no pulse is flagged there
+    assert (batch["liquidation_pulse"].iloc[:VOLUME_MA_WINDOW - 1] == "NORMAL").all()
+    assert batch["liquidation_pulse"].iloc[120] == "HIGH_LIQ_RISK"
+
+    stream = ScenarioStream(levels, thresholds)
+    for i, (_, bar) in enumerate(bars.iloc[:VOLUME_MA_WINDOW + 1].iterrows()):
+        expected = evaluate_scenarios(bars.iloc[:i + 1], levels, thresholds, 0.0, 59.0, 50)
+        assert_same(expected, stream.update(bar, 0.0, 59.0, 50), i)
+
+def test_empty_frame():
+    empty = generate_ohlcv(0)
+    assert evaluate_scenarios(empty, ThesisLevels(), Thresholds(), 0.0, 59.0, 50) == {}
+    assert evaluate_scenarios_batch(empty, ThesisLevels(), Thresholds(), 0.0, 59.0, 50).empty
+
+@pytest.fixture(scope="module")
+def level_sets(levels):
+    # The same ladder shifted down and up, so each set flags different bars
+    shifts = [-0.04, -0.02, 0.0, 0.02, 0.04]
+    return [ThesisLevels(**{f: getattr(levels, f) * (1 + s) for f in vars(levels)}) for s in shifts]
+
+@pytest.fixture(scope="module")
+def threshold_sets(bars):
+    median_atr = float(np.nanmedian(bars["atr"] / bars["close"]))
+    return [Thresholds(atr_low_percent=median_atr * m, funding_strong_negative=f, btc_dom_phase2=57 + m,
+                       fear_extreme=20 + 10 * m) for m, f in zip([0.5, 0.8, 1.0, 1.2, 1.5],
+                                                                 [-0.002, -0.001, -0.0005, 0.0, 0.001])]
+
+def nth(configs, j):
+    # Config j of a broadcast argument: one config, a length-1 list or a list of k
+    if not isinstance(configs, list):
+        return configs
+    return configs[j] if len(configs) > 1 else configs[0]
+
+def assert_config_matches_batch(res, j, bars, levels, thresholds, metrics):
+    expected = evaluate_scenarios_batch(bars, levels, thresholds, **metrics)
+    assert list(decode_flags(res["flags"][j])) == list(expected["scenario_flags"]), j
+    np.testing.assert_array_equal(np.array(ROTATION_PHASES, dtype=object)[res["rotation_phase"][j]],
+                                  expected["rotation_phase"].to_numpy())
+    np.testing.assert_array_equal(np.array(SENTIMENT_TAGS, dtype=object)[res["sentiment_tag"][j]],
+                                  expected["sentiment_tag"].to_numpy())
+    np.testing.assert_array_equal(res["compression"][j], expected["compression"].to_numpy(dtype=bool))
+
+@pytest.mark.parametrize("shape", ["levels", "thresholds", "both", "single_level_set"])
+def test_array_broadcasts_config_sets(bars, levels, level_sets, threshold_sets, metrics, shape):
+    if shape == "levels":
+        lv, th = level_sets, Thresholds()
+    elif shape == "thresholds":
+        lv, th = levels, threshold_sets
+    elif shape == "both":
+        lv, th = level_sets, threshold_sets
+    else:
+        lv, th = [levels], threshold_sets
+    res = evaluate_scenarios_array(bars, lv, th, **metrics)
+    k = len(level_sets)
+    assert res["flags"].shape == res["compression"].shape == res["rotation_phase"].shape == (k, N_BARS)
+    assert res["price"].shape == res["liquidation_pulse"].shape == (N_BARS,)
+
+    # Small chunks split the bars across several passes
+    chunked = evaluate_scenarios_array(bars, lv, th, **metrics, chunk_cells=3 * k + 1)
+    np.testing.assert_array_equal(chunked["flags"], res["flags"])
+    for j in range(k):
+        assert_config_matches_batch(res, j, bars, nth(lv, j), nth(th, j), metrics)
+
+    counts = flag_counts(res["flags"])
+    assert list(counts.columns) == FLAG_NAMES and len(counts) == k
+    for j in range(k):
+        flags = [f for row in decode_flags(res["flags"][j]) for f in row.split(";") if f]
+        assert counts.iloc[j].to_dict() == {name: flags.count(name) for name in FLAG_NAMES}
+    assert len({tuple(row) for row in counts.to_numpy()}) > 1
+
+def test_single_configs_give_one_dimensional_arrays(bars, levels, metrics):
+    res = evaluate_scenarios_array(bars, levels, Thresholds(), **metrics)
+    assert res["flags"].shape == (N_BARS,)
+    assert flag_counts(res["flags"]).shape == (1, len(FLAG_NAMES))
+
+def test_mismatched_config_counts_are_rejected(bars, level_sets, threshold_sets, metrics):
+    with pytest.raises(ValueError):
+        evaluate_scenarios_array(bars, level_sets[:2], threshold_sets[:3], **metrics)
+
+def test_flag_bits_round_trip():
+    assert sorted(BIT.values()) == list(range(len(FLAG_NAMES))) and len(FLAG_NAMES) <= 8
+    masks = np.arange(1 << len(FLAG_NAMES), dtype=np.uint8)
+    for mask in masks:
+        names = flag_names(int(mask))
+        assert sum(1 << BIT[name] for name in names) == mask
+        assert names == [name for name in FLAG_NAMES if name in names]
+    decoded = decode_flags(masks.reshape(8, -1))
+    assert decoded.shape == (8, len(masks) // 8)
+    assert list(decoded.ravel()) == [";".join(flag_names(int(m))) for m in masks]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_engine import compute_indicators, identify_squeeze_periods, run_breakout_tests
+from benchmark import generate_ohlcv
+from significance import significance_table
+
+@pytest.fixture(scope="module")
+def breakouts():
+    df = identify_squeeze_periods(compute_indicators(generate_ohlcv(5_000, seed=2, freq="1h")))
+    return run_breakout_tests(df, hold_periods=[1, 4, 12]), df["close"].to_numpy()
+
+def test_same_seed_same_table(breakouts):
+    results, close = breakouts
+    first = significance_table(results, close, n_resamples=500, seed=3, workers=1)
+    pd.testing.assert_frame_equal(first, significance_table(results, close, n_resamples=500, seed=3, workers=1))
+    other = significance_table(results, close, n_resamples=500, seed=4, workers=1)
+    assert not np.allclose(first["mean_ci_low"], other["mean_ci_low"])
+    pd.testing.assert_series_equal(first["mean"], other["mean"])
+
+@pytest.mark.parametrize("workers, chunk_resamples", [(2, 1000), (1, 100), (2, 250), (1, 10_000), (1, 1)])
+def test_table_ignores_workers_and_chunking(breakouts, workers, chunk_resamples):
+    results, close = breakouts
+    expected = significance_table(results, close, n_resamples=1_050, seed=3, workers=1)
+    got = significance_table(results, close, n_resamples=1_050, seed=3, workers=workers,
+                             chunk_resamples=chunk_resamples)
+    pd.testing.assert_frame_equal(got, expected)
+
+def test_single_event_and_all_nan_groups_are_dropped():
+    times = pd.date_range("2024-01-01", periods=8, freq="1h")
+    results = pd.DataFrame({
+        "breakout_time": times,
+        "hold_period": [1, 1, 1, 1, 4, 4, 12, 12],
+        "direction": ["up", "up", "up", "down", "up", "up", "up", "up"],
+        "pct_change": [0.5, 1.0, 1.5, -0.3, np.nan, np.nan, 2.0, np.nan],
+    })
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, 200))
+    table = significance_table(results, close, n_resamples=200, workers=1)
+    # (1, down) has one event, (4, up) only NaN, (12, up) one event once NaN is dropped
+    assert list(table.index) == [(1, "up")]
+    row = table.loc[(1, "up")]
+    assert row["count"] == 3 and row["mean"] == pytest.approx(1.0)
+    assert row["mean_ci_low"] <= row["mean"] <= row["mean_ci_high"]
+    assert 0 < row["p_value"] <= 1 and 0 < row["p_value_random"] <= 1
+
+    assert significance_table(results[results["hold_period"] == 4], close, n_resamples=200, workers=1).empty
+    assert significance_table(pd.DataFrame(), close).empty
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from trade_simulator import TradeConfig, first_exits, simulate_trades
+
+FRICTIONLESS = TradeConfig(fee_bps=0.0, slippage_bps=0.0)
+
+def breakout(after):
+    """
+    Flat bars at 100 with a squeeze on bars 2..4 (bands 98/102), a long
+    breakout closing at 103 on bar 5, then the (open, high, low, close)
+    bars in `after`. With the default stop at the lower band the trade
+    risks 5 and targets 113.
+    """
+    bars = [(100, 101, 99, 100)] * 5 + [(101, 104, 100, 103)] + list(after)
+    df = pd.DataFrame(bars, columns=["open", "high", "low", "close"], dtype=float,
+                      index=pd.date_range("2024-01-01", periods=len(bars), freq="1h"))
+    df["squeeze"] = [2 <= i <= 4 for i in range(len(df))]
+    df["bb_upper"], df["bb_lower"], df["atr"] = 102.0, 98.0, 2.0
+    return df
+
+def test_bar_touching_stop_and_target_exits_at_the_stop():
+    trades, equity = simulate_trades(breakout([(103, 105, 101, 104), (104, 115, 97, 110), (110, 111, 109, 110)]),
+                                     FRICTIONLESS)
+    trade = trades.iloc[0]
+    assert (trade["entry_price"], trade["stop"], trade["target"]) == (103, 98, 113)
+    assert trade["exit_reason"] == "stop" and trade["exit_price"] == 98 and trade["bars_held"] == 2
+    assert trade["r_multiple"] == pytest.approx(-1)
+    assert equity.iloc[-1] == pytest.approx(trade["equity_after"])
+
+def test_gap_through_the_stop_fills_at_the_open():
+    df = breakout([(103, 105, 101, 104), (95, 96, 94, 95), (95, 96, 94, 95)])
+    trade = simulate_trades(df, FRICTIONLESS)[0].iloc[0]
+    assert trade["exit_reason"] == "stop" and trade["exit_price"] == 95
+    assert trade["r_multiple"] == pytest.approx(-8 / 5)
+
+    # Slippage is charged on top of the gapped open
+    trade = simulate_trades(df, TradeConfig(fee_bps=0.0, slippage_bps=10.0))[0].iloc[0]
+    assert trade["exit_price"] == pytest.approx(95 * (1 - 0.001))
+
+def test_gap_through_the_target_fills_at_the_open():
+    trade = simulate_trades(breakout([(120, 121, 119, 120)] * 2), FRICTIONLESS)[0].iloc[0]
+    assert trade["exit_reason"] == "target" and trade["exit_price"] == 120
+
+def test_trade_open_when_data_ends_exits_at_the_last_close():
+    after = [(103, 105, 101, 104)] * 10
+    trades, equity = simulate_trades(breakout(after), FRICTIONLESS)
+    trade = trades.iloc[0]
+    assert trade["exit_reason"] == "end"
+    assert trade["exit_time"] == equity.index[-1] and trade["bars_held"] == len(after)
+    assert trade["exit_price"] == 104
+    assert equity.iloc[-1] == pytest.approx(trade["equity_after"])
+
+    # The same bars with a shorter max_hold are a timeout instead
+    trade = simulate_trades(breakout(after), TradeConfig(fee_bps=0.0, slippage_bps=0.0, max_hold=4))[0].iloc[0]
+    assert trade["exit_reason"] == "timeout" and trade["bars_held"] == 4
+
+def test_breakout_on_last_bar_is_not_traded():
+    trades, equity = simulate_trades(breakout([]), FRICTIONLESS)
+    assert trades.empty and (equity == 10_000).all()
+
+def reference_first_exits(high, low, entry_locs, side, stop, target, max_hold):
+    first, hit = [], []
+    for loc, s, st, tg in zip(entry_locs, side, stop, target):
+        end = min(loc + max_hold, len(high) - 1)
+        for j in range(loc + 1, end + 1):
+            stopped = low[j] <= st if s > 0 else high[j] >= st
+            reached = high[j] >= tg if s > 0 else low[j] <= tg
+            if stopped or reached:
+                first.append(j - loc)
+                hit.append(1 if stopped else 2)
+                break
+        else:
+            first.append(end - loc)
+            hit.append(0)
+    return np.array(first), np.array(hit)
+
+@pytest.mark.parametrize("max_hold", [1, 5, 40])
+def test_first_exits_match_bar_loop(max_hold):
+    rng = np.random.default_rng(max_hold)
+    close = 100 + np.cumsum(rng.normal(0, 1, 500))
+    high, low = close + rng.uniform(0, 2, 500), close - rng.uniform(0, 2, 500)
+    entry_locs = np.sort(rng.choice(500, 80, replace=False))
+    side = rng.choice([-1, 1], 80)
+    stop = close[entry_locs] - side * rng.uniform(0.5, 4, 80)
+    target = close[entry_locs] + side * rng.uniform(0.5, 8, 80)
+
+    expected = reference_first_exits(high, low, entry_locs, side, stop, target, max_hold)
+    # A small chunk_cells splits the entries over several blocks
+    for chunk_cells in (2_000_000, 3 * max_hold):
+        got = first_exits(high, low, entry_locs, side, stop, target, max_hold, chunk_cells=chunk_cells)
+        np.testing.assert_array_equal(got[0], expected[0])
+        np.testing.assert_array_equal(got[1], expected[1])
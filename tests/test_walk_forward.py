@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmark import generate_ohlcv
+from param_sweep import build_grid
+from walk_forward import make_folds, run_walk_forward
+
+GRID = build_grid([14, 20], [1.5, 2.0], [14], [0.10, 0.20], [0.20])
+TRAIN_BARS, TEST_BARS = 1_500, 500
+HOLD_PERIODS = [1, 4, 12]
+TRAIN_COLUMNS = ["bb_window", "bb_std", "atr_window", "bw_quantile", "atr_quantile", "train_score", "train_events"]
+
+@pytest.fixture(scope="module")
+def ohlcv():
+    return generate_ohlcv(4_000, seed=5, freq="1h")
+
+def walk(df, mode, workers=1):
+    return run_walk_forward(df, GRID, TRAIN_BARS, TEST_BARS, hold_periods=HOLD_PERIODS, threshold_mode=mode,
+                            threshold_window=500, hold_period=4, min_events=2, workers=workers)
+
+def replace_from(df, start, seed):
+    """
+    df with every bar from `start` on swapped for an unrelated path.
+    """
+    other = generate_ohlcv(len(df), seed=seed, freq="1h").set_axis(df.index)
+    out = df.copy()
+    out.iloc[start:] = other.iloc[start:].to_numpy()
+    return out
+
+@pytest.mark.parametrize("mode", ["global", "rolling"])
+def test_train_folds_never_read_test_bars(ohlcv, mode):
+    folds, results = walk(ohlcv, mode)
+    assert len(folds) == len(make_folds(len(ohlcv), TRAIN_BARS, TEST_BARS)) == 5
+    assert folds["train_score"].notna().all()
+
+    for k, (_, train_end, _, _) in enumerate(make_folds(len(ohlcv), TRAIN_BARS, TEST_BARS)):
+        changed, _ = walk(replace_from(ohlcv, train_end, seed=99), mode)
+        # Everything fitted on the train fold is unchanged; the test fold saw the new bars
+        pd.testing.assert_series_equal(changed.loc[k, TRAIN_COLUMNS], folds.loc[k, TRAIN_COLUMNS])
+        assert changed.loc[k, "test_score"] != folds.loc[k, "test_score"]
+
+@pytest.mark.parametrize("mode", ["global", "rolling"])
+def test_out_of_sample_horizons_stay_inside_the_test_fold(ohlcv, mode):
+    folds, results = walk(ohlcv, mode)
+    assert not results.empty
+    locs = ohlcv.index.get_indexer(results["breakout_time"])
+    ends = dict(zip(folds["fold"], ohlcv.index.get_indexer(folds["test_end"])))
+    starts = dict(zip(folds["fold"], ohlcv.index.get_indexer(folds["test_start"])))
+    assert (locs + results["hold_period"].to_numpy() <= results["fold"].map(ends).to_numpy()).all()
+    assert (ohlcv.index.get_indexer(results["squeeze_end_time"]) >= results["fold"].map(starts).to_numpy()).all()
+
+@pytest.mark.parametrize("mode", ["global", "rolling"])
+def test_one_worker_and_a_pool_agree(ohlcv, mode):
+    serial_folds, serial_results = walk(ohlcv, mode, workers=1)
+    pooled_folds, pooled_results = walk(ohlcv, mode, workers=2)
+    pd.testing.assert_frame_equal(serial_folds, pooled_folds)
+    pd.testing.assert_frame_equal(serial_results, pooled_results)
+
+def test_too_few_bars_for_a_fold(ohlcv):
+    folds, results = walk(ohlcv.iloc[:TRAIN_BARS + TEST_BARS - 1], "global")
+    assert folds.empty and results.empty
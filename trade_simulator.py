@@ -0,0 +1,215 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from risk_engine import RiskEngine
+from backtest_engine import CompactSqueezeFrame, _squeeze_runs
+from profiling import timed
+
+@dataclass
+class TradeConfig:
+    fee_bps: float = 4.0           # per side, on notional (taker)
+    slippage_bps: float = 2.0      # market orders only: entries, stops, timeouts
+    stop_atr: Optional[float] = None  # None: stop at the opposite band of the last squeeze bar
+    target_r: float = 2.0          # take profit at this multiple of the stop distance
+    max_hold: int = 168            # bars before a time exit at the close
+    compound: bool = True          # size each trade from current equity, not the starting account
+
+def breakout_entries(squeezes) -> dict:
+    """
+    Long/short entries at the close of every directional breakout bar.
+    `squeezes` is a frame from identify_squeeze_periods or a CompactSqueezeFrame.
+    Stops/targets are not set here (see simulate_trades).
+    """
+    compact = isinstance(squeezes, CompactSqueezeFrame)
+    if compact:
+        arrays = dict(open=squeezes.open, high=squeezes.high, low=squeezes.low, close=squeezes.close)
+        squeeze = squeezes.squeeze
+        atr = squeezes.atr.astype(np.float64)
+    else:
+        arrays = {col: squeezes[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close')}
+        squeeze = squeezes['squeeze'].to_numpy(dtype=bool)
+        atr = squeezes['atr'].to_numpy(dtype=np.float64)
+
+    last_locs, _ = _squeeze_runs(squeeze)
+    entry_locs = last_locs + 1
+    close = arrays['close']
+    if compact:
+        upper_ref, lower_ref = squeezes.bb_upper(last_locs), squeezes.bb_lower(last_locs)
+    else:
+        upper_ref = squeezes['bb_upper'].to_numpy(dtype=np.float64)[last_locs]
+        lower_ref = squeezes['bb_lower'].to_numpy(dtype=np.float64)[last_locs]
+    side = np.where(close[entry_locs] > upper_ref, 1, np.where(close[entry_locs] < lower_ref, -1, 0))
+    # 'expansion' breakouts (close still inside the bands) are not traded
+    keep = side != 0
+    return dict(arrays, index=squeezes.index, atr=atr, entry_locs=entry_locs[keep], side=side[keep],
+                upper_ref=upper_ref[keep], lower_ref=lower_ref[keep])
+
+def first_exits(high, low, entry_locs, side, stop, target, max_hold, chunk_cells=2_000_000):
+    """
+    (offset, hit) of the first bar after each entry whose range touches the
+    stop or target, within max_hold bars. hit is 1 = stop, 2 = target,
+    0 = neither (offset is then the last bar searched). A bar touching both
+    counts as a stop. Searched as an (entries x max_hold) block per chunk.
+    """
+    n = len(high)
+    offsets = np.arange(1, max_hold + 1)
+    first = np.zeros(len(entry_locs), dtype=np.int64)
+    hit = np.zeros(len(entry_locs), dtype=np.int8)
+    chunk = max(1, chunk_cells // max(max_hold, 1))
+    for i in range(0, len(entry_locs), chunk):
+        sl = slice(i, i + chunk)
+        idx = entry_locs[sl, None] + offsets
+        in_data = idx < n
+        idx = np.minimum(idx, n - 1)
+        long = side[sl, None] > 0
+        # Adverse/favourable extremes as seen by the position: lows/highs for longs, flipped for shorts
+        stop_hit = in_data & np.where(long, low[idx] <= stop[sl, None], high[idx] >= stop[sl, None])
+        target_hit = in_data & np.where(long, high[idx] >= target[sl, None], low[idx] <= target[sl, None])
+        any_hit = stop_hit | target_hit
+        pos = np.argmax(any_hit, axis=1)
+        rows = np.arange(len(pos))
+        found = any_hit[rows, pos]
+        last_searched = np.minimum(entry_locs[sl] + max_hold, n - 1) - entry_locs[sl]
+        first[sl] = np.where(found, pos + 1, last_searched)
+        hit[sl] = np.where(found, np.where(stop_hit[rows, pos], 1, 2), 0)
+    return first, hit
+
+def non_overlapping(entry_locs, exit_locs) -> np.ndarray:
+    """
+    Indices of the trades taken when only one position is open at a time:
+    entries while a position is open are skipped. Loops over taken trades only.
+    """
+    taken = []
+    i = 0
+    while i < len(entry_locs):
+        taken.append(i)
+        # A new entry can fill on the close of the bar the previous trade exited
+        i = max(i + 1, int(np.searchsorted(entry_locs, exit_locs[i], side="left")))
+    return np.asarray(taken, dtype=np.int64)
+
+@timed()
+def simulate_trades(squeezes, config: Optional[TradeConfig] = None,
+                    risk: Optional[RiskEngine] = None) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Trade every directional squeeze breakout: enter at the breakout close,
+    exit at the stop, the take profit, or after max_hold bars, one position
+    at a time. Positions are sized by RiskEngine (risk % of equity per stop
+    distance, leverage capped). Fees/slippage are charged in the prices and
+    PnL. Returns (trades, equity) where equity is marked to market every bar.
+    """
+    config = config or TradeConfig()
+    risk = risk or RiskEngine()
+    ev = breakout_entries(squeezes)
+    index, open_, high, low, close = ev['index'], ev['open'], ev['high'], ev['low'], ev['close']
+    n = len(close)
+    initial = risk.config.account_size
+    empty = pd.DataFrame(), pd.Series(np.full(n, initial), index=index, name='equity')
+
+    # Entries on the last bar have nothing to exit into
+    keep = ev['entry_locs'] < n - 1
+    entry_locs, side = ev['entry_locs'][keep], ev['side'][keep]
+    if len(entry_locs) == 0:
+        return empty
+
+    slip = config.slippage_bps / 10_000
+    fee = config.fee_bps / 10_000
+    entry_price = close[entry_locs] * (1 + side * slip)
+    if config.stop_atr is None:
+        stop = np.where(side > 0, ev['lower_ref'][keep], ev['upper_ref'][keep])
+    else:
+        stop = entry_price - side * config.stop_atr * ev['atr'][entry_locs]
+    target = entry_price + side * config.target_r * np.abs(entry_price - stop)
+
+    # Stops on the wrong side of the entry (or NaN bands/ATR) cannot be sized
+    valid = (side * (entry_price - stop) > 0) & np.isfinite(risk.size_positions(entry_price, stop)['leverage'])
+    entry_locs, side, entry_price, stop, target = (a[valid] for a in (entry_locs, side, entry_price, stop, target))
+    if len(entry_locs) == 0:
+        return empty
+
+    offset, hit = first_exits(high, low, entry_locs, side, stop, target, config.max_hold)
+    exit_locs = entry_locs + offset
+    taken = non_overlapping(entry_locs, exit_locs)
+    entry_locs, side, entry_price, stop, target, exit_locs, hit = (
+        a[taken] for a in (entry_locs, side, entry_price, stop, target, exit_locs, hit))
+
+    # Stops/targets fill at the level, or at the open if the bar gapped through it.
+    # Stops and time exits are market orders and pay slippage; targets are limits.
+    bar_open = open_[exit_locs]
+    gap_stop = np.where(side > 0, np.minimum(bar_open, stop), np.maximum(bar_open, stop))
+    gap_target = np.where(side > 0, np.maximum(bar_open, target), np.minimum(bar_open, target))
+    exit_price = np.where(hit == 1, gap_stop * (1 - side * slip),
+                          np.where(hit == 2, gap_target, close[exit_locs] * (1 - side * slip)))
+    reason = np.where(hit == 1, 'stop', np.where(hit == 2, 'target',
+                      np.where(exit_locs - entry_locs < config.max_hold, 'end', 'timeout')))
+
+    # Net return on notional after both fees; notional = equity x leverage, so
+    # compounding is a running product over the (sequential) trades.
+    leverage = risk.size_positions(entry_price, stop)['leverage']
+    net_return = side * (exit_price - entry_price) / entry_price - fee * (1 + exit_price / entry_price)
+    if config.compound:
+        growth = np.maximum(1 + leverage * net_return, 0.0)
+        equity_before = initial * np.concatenate(([1.0], np.cumprod(growth)[:-1]))
+    else:
+        equity_before = np.full(len(entry_locs), initial)
+    sized = risk.size_positions(entry_price, stop, equity_before)
+    quantity = sized['quantity']
+    fees = fee * quantity * (entry_price + exit_price)
+    pnl = side * quantity * (exit_price - entry_price) - fees
+
+    trades = pd.DataFrame({
+        'entry_time': index[entry_locs],
+        'exit_time': index[exit_locs],
+        'direction': np.where(side > 0, 'long', 'short').astype(object),
+        'entry_price': entry_price,
+        'stop': stop,
+        'target': target,
+        'exit_price': exit_price,
+        'exit_reason': reason.astype(object),
+        'bars_held': exit_locs - entry_locs,
+        'quantity': quantity,
+        'position_notional': sized['position_notional'],
+        'leverage': sized['leverage'],
+        'fees': fees,
+        'pnl': pnl,
+        'r_multiple': pnl / sized['risk_amount'],
+        'equity_after': initial + np.cumsum(pnl),
+    })
+    return trades, equity_curve(close, entry_locs, exit_locs, side * quantity, entry_price, pnl, initial, index)
+
+def equity_curve(close, entry_locs, exit_locs, signed_qty, entry_price, pnl, initial, index) -> pd.Series:
+    """
+    Per-bar equity: realized PnL booked on exit bars plus the open position
+    marked at each close. Built from difference arrays, no per-bar loop.
+    """
+    n = len(close)
+    position = np.zeros(n)
+    cost = np.zeros(n)
+    realized = np.zeros(n)
+    np.add.at(position, entry_locs, signed_qty)
+    np.add.at(position, exit_locs, -signed_qty)
+    np.add.at(cost, entry_locs, signed_qty * entry_price)
+    np.add.at(cost, exit_locs, -signed_qty * entry_price)
+    np.add.at(realized, exit_locs, pnl)
+    unrealized = np.cumsum(position) * close - np.cumsum(cost)
+    return pd.Series(initial + np.cumsum(realized) + unrealized, index=index, name='equity')
+
+def trade_stats(trades: pd.DataFrame, equity: pd.Series) -> dict:
+    """
+    Headline statistics of a simulate_trades run.
+    """
+    if trades.empty:
+        return {"trades": 0}
+    wins = trades['pnl'] > 0
+    gross_loss = -trades.loc[~wins, 'pnl'].sum()
+    drawdown = equity / equity.cummax() - 1
+    return {
+        "trades": len(trades),
+        "win_rate_pct": wins.mean() * 100,
+        "total_return_pct": (equity.iloc[-1] / equity.iloc[0] - 1) * 100,
+        "max_drawdown_pct": drawdown.min() * 100,
+        "profit_factor": trades.loc[wins, 'pnl'].sum() / gross_loss if gross_loss > 0 else np.inf,
+        "avg_r": trades['r_multiple'].mean(),
+        "fees_paid": trades['fees'].sum(),
+        "exits": trades['exit_reason'].value_counts().to_dict(),
+    }
@@ -0,0 +1,302 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from data_loader import load_data
+from backtest_engine import (compute_atr, identify_squeeze_periods, mark_squeezes, run_breakout_tests,
+                             set_band_multiplier, summarize_results, threshold_ranks)
+from param_sweep import PARAM_COLUMNS, build_grid
+from trade_simulator import TradeConfig, simulate_trades, trade_stats
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+# Per-process state: every full-series column, by name, as views into one shared block
+_worker_shm = None
+_worker_columns: Dict[str, np.ndarray] = {}
+_worker_index: Optional[pd.DatetimeIndex] = None
+
+def make_folds(n_bars: int, train_bars: int, test_bars: int, step: Optional[int] = None,
+               anchored: bool = False) -> List[Tuple[int, int, int, int]]:
+    """
+    (train_start, train_end, test_start, test_end) bar positions, ends
+    exclusive. Each test fold directly follows its train fold; folds advance
+    by `step` bars (default: test_bars). Anchored folds always train from bar 0.
+    """
+    step = step or test_bars
+    folds = []
+    train_end = train_bars
+    while train_end + test_bars <= n_bars:
+        train_start = 0 if anchored else train_end - train_bars
+        folds.append((train_start, train_end, train_end, train_end + test_bars))
+        train_end += step
+    return folds
+
+def _band_key(bb_window: int) -> Tuple[str, str]:
+    return f"bb_mid_{bb_window}", f"bb_std_{bb_window}"
+
+def _rank_keys(col: str, window: int, bb_std: float = None) -> Tuple[str, str]:
+    name = f"{col}_{window}" if bb_std is None else f"{col}_{window}_{bb_std}"
+    return f"less_{name}", f"valid_{name}"
+
+def full_series_columns(df: pd.DataFrame, grid: List[Dict[str, float]], threshold_mode: str = "global",
+                        threshold_window: int = 720, workers: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Every array the folds need, computed once over the whole series: OHLC,
+    BB mid/std per bb_window, ATR per atr_window and, for rolling/expanding
+    thresholds, the rank arrays of each bandwidth and ATR column. Every
+    value uses only bars up to its own, so fold slices have no look-ahead.
+    They do not equal a fold's own computation: a fold's first bars are
+    warmed up by the preceding history instead of NaN, and expanding ranks
+    count from the start of the series, as a live run would have seen them.
+    """
+    columns = {col: df[col].to_numpy(dtype=np.float64) for col in PRICE_COLUMNS}
+    close = df['close']
+    for bb_window in sorted({int(p['bb_window']) for p in grid}):
+        mid_key, std_key = _band_key(bb_window)
+        columns[mid_key] = close.rolling(window=bb_window).mean().to_numpy()
+        columns[std_key] = close.rolling(window=bb_window).std(ddof=0).to_numpy()
+    for atr_window in sorted({int(p['atr_window']) for p in grid}):
+        columns[f"atr_{atr_window}"] = compute_atr(df[['high', 'low', 'close']].copy(), atr_window)['atr'].to_numpy()
+
+    if threshold_mode != "global":
+        # Rank arrays for every bandwidth (bb_window, bb_std) and ATR column
+        rank_inputs = {}
+        for bb_window, bb_std in sorted({(int(p['bb_window']), float(p['bb_std'])) for p in grid}):
+            mid_key, std_key = _band_key(bb_window)
+            bands = set_band_multiplier(pd.DataFrame({'bb_mid': columns[mid_key], 'bb_std': columns[std_key]}), bb_std)
+            rank_inputs[_rank_keys('bb_bandwidth', bb_window, bb_std)] = bands['bb_bandwidth'].to_numpy()
+        for atr_window in sorted({int(p['atr_window']) for p in grid}):
+            rank_inputs[_rank_keys('atr', atr_window)] = columns[f"atr_{atr_window}"]
+
+        args = [(values, threshold_mode, threshold_window) for values in rank_inputs.values()]
+        if workers > 1 and len(args) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+                ranks = list(pool.map(_ranks, args))
+        else:
+            ranks = [_ranks(a) for a in args]
+        for (less_key, valid_key), (less, valid) in zip(rank_inputs, ranks):
+            columns[less_key] = less.astype(np.float64)
+            columns[valid_key] = valid.astype(np.float64)
+    return columns
+
+def _ranks(args):
+    return threshold_ranks(*args)
+
+def _to_shared(columns: Dict[str, np.ndarray]) -> shared_memory.SharedMemory:
+    n = len(next(iter(columns.values())))
+    shm = shared_memory.SharedMemory(create=True, size=max(n, 1) * 8 * len(columns))
+    block = np.ndarray((len(columns), n), dtype=np.float64, buffer=shm.buf)
+    for i, values in enumerate(columns.values()):
+        block[i] = values
+    return shm
+
+def _init_worker(shm_name: str, names: List[str], index: pd.DatetimeIndex):
+    global _worker_shm, _worker_index
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(names), len(index)), dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_columns.clear()
+    _worker_columns.update({name: block[i] for i, name in enumerate(names)})
+    _worker_index = index
+
+def _release_worker():
+    global _worker_shm, _worker_index
+    _worker_columns.clear()
+    _worker_index = None
+    if _worker_shm is not None:
+        _worker_shm.close()
+        _worker_shm = None
+
+def _fold_frame(params: dict, start: int, end: int) -> pd.DataFrame:
+    """
+    Indicator frame for bars [start, end) as slices of the full-series columns.
+    """
+    bb_window, atr_window = int(params['bb_window']), int(params['atr_window'])
+    mid_key, std_key = _band_key(bb_window)
+    cols = {col: _worker_columns[col][start:end] for col in PRICE_COLUMNS}
+    cols.update(bb_mid=_worker_columns[mid_key][start:end], bb_std=_worker_columns[std_key][start:end],
+                atr=_worker_columns[f"atr_{atr_window}"][start:end])
+    df = pd.DataFrame(cols, index=_worker_index[start:end], copy=False)
+    return set_band_multiplier(df, float(params['bb_std']))
+
+def _fold_squeezes(df: pd.DataFrame, params: dict, start: int, end: int, threshold_mode: str,
+                   threshold_window: int, thresholds: Optional[Tuple[float, float]] = None) -> pd.DataFrame:
+    """
+    Squeeze columns for a fold frame. Rolling/expanding thresholds slice the
+    full-series ranks. Global thresholds are the quantiles of the frame
+    itself, or the fixed `thresholds` fitted on the train fold.
+    """
+    if threshold_mode != "global":
+        bb_window, atr_window, bb_std = int(params['bb_window']), int(params['atr_window']), float(params['bb_std'])
+        ranks = {}
+        for col, keys in (('bb_bandwidth', _rank_keys('bb_bandwidth', bb_window, bb_std)),
+                          ('atr', _rank_keys('atr', atr_window))):
+            ranks[col] = tuple(_worker_columns[key][start:end] for key in keys)
+        return identify_squeeze_periods(df, params['bw_quantile'], params['atr_quantile'], threshold_mode=threshold_mode,
+                                        threshold_window=threshold_window, ranks=ranks)
+    if thresholds is None:
+        return identify_squeeze_periods(df, params['bw_quantile'], params['atr_quantile'])
+    bw_thresh, atr_thresh = thresholds
+    return mark_squeezes(df, (df['bb_bandwidth'] <= bw_thresh) & (df['atr'] <= atr_thresh))
+
+def fold_score(df: pd.DataFrame, results: pd.DataFrame, objective: str = "edge", hold_period: int = 24,
+               min_events: int = 5) -> Tuple[float, int]:
+    """
+    (score, events) of one squeeze-annotated fold frame:
+      "edge"       — mean breakout return at hold_period, signed by direction
+                     (up = long, down = short; expansion breakouts ignored)
+      "sim_return" — total return % of simulate_trades over the fold
+    NaN when fewer than min_events directional breakouts.
+    """
+    if results.empty:
+        return np.nan, 0
+    rows = results[(results['hold_period'] == hold_period) & (results['direction'] != 'expansion')]
+    events = len(rows)
+    if events < min_events:
+        return np.nan, events
+    if objective == "edge":
+        sign = np.where(rows['direction'] == 'up', 1.0, -1.0)
+        return float(np.mean(sign * rows['pct_change'].to_numpy())), events
+    if objective == "sim_return":
+        trades, equity = simulate_trades(df, TradeConfig(max_hold=hold_period))
+        return float(trade_stats(trades, equity).get("total_return_pct", np.nan)), events
+    raise ValueError(f"Unknown objective: {objective}")
+
+def _run_fold(task) -> Tuple[dict, pd.DataFrame]:
+    """
+    Sweep the grid on one train fold, then backtest the best set on the test fold.
+    """
+    fold, (train_start, train_end, test_start, test_end), grid, hold_periods, settings = task
+    threshold_mode, threshold_window, objective, hold_period, min_events = settings
+
+    best, best_score, best_events, best_thresholds = None, -np.inf, 0, None
+    for params in grid:
+        df = _fold_frame(params, train_start, train_end)
+        df = _fold_squeezes(df, params, train_start, train_end, threshold_mode, threshold_window)
+        score, events = fold_score(df, run_breakout_tests(df, hold_periods=hold_periods), objective, hold_period, min_events)
+        if score > best_score:
+            best, best_score, best_events = params, score, events
+            if threshold_mode == "global":
+                # Fitted cutoffs travel to the test fold, so it never sees its own distribution
+                best_thresholds = (df['bb_bandwidth'].quantile(params['bw_quantile']),
+                                   df['atr'].quantile(params['atr_quantile']))
+
+    row = dict(fold=fold, train_start=_worker_index[train_start], train_end=_worker_index[train_end - 1],
+               test_start=_worker_index[test_start], test_end=_worker_index[test_end - 1])
+    if best is None:
+        row.update({key: np.nan for key in PARAM_COLUMNS}, train_score=np.nan, train_events=best_events,
+                   test_score=np.nan, test_events=0)
+        return row, pd.DataFrame()
+
+    df = _fold_frame(best, test_start, test_end)
+    df = _fold_squeezes(df, best, test_start, test_end, threshold_mode, threshold_window, best_thresholds)
+    results = run_breakout_tests(df, hold_periods=hold_periods)
+    test_score, test_events = fold_score(df, results, objective, hold_period, min_events=1)
+
+    row.update({key: best[key] for key in PARAM_COLUMNS}, train_score=best_score, train_events=best_events,
+               test_score=test_score, test_events=test_events)
+    if not results.empty:
+        results.insert(0, 'fold', fold)
+    return row, results
+
+def run_walk_forward(df: pd.DataFrame, grid: List[Dict[str, float]], train_bars: int, test_bars: int,
+                     step: Optional[int] = None, anchored: bool = False, hold_periods=[1, 4, 12, 24, 168],
+                     threshold_mode: str = "global", threshold_window: int = 720, objective: str = "edge",
+                     hold_period: int = 24, min_events: int = 5, workers=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Walk-forward optimization: for every fold, pick the grid combination with
+    the best train score and backtest it on the following test fold.
+    Indicators/ranks are computed once over the full series and placed in
+    shared memory; folds run in parallel and only slice them.
+    Returns (folds, out-of-sample breakout results with a 'fold' column).
+    """
+    folds = make_folds(len(df), train_bars, test_bars, step, anchored)
+    if df.empty or not grid or not folds:
+        return pd.DataFrame(), pd.DataFrame()
+
+    workers = workers or os.cpu_count() or 1
+    columns = full_series_columns(df, grid, threshold_mode, threshold_window, workers)
+    names = list(columns)
+    index = pd.DatetimeIndex(df.index)
+    settings = (threshold_mode, threshold_window, objective, hold_period, min_events)
+    tasks = [(i, fold, grid, list(hold_periods), settings) for i, fold in enumerate(folds)]
+
+    shm = _to_shared(columns)
+    del columns
+    try:
+        if workers == 1:
+            _init_worker(shm.name, names, index)
+            try:
+                outputs = [_run_fold(t) for t in tasks]
+            finally:
+                _release_worker()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, names, index)) as pool:
+                outputs = list(pool.map(_run_fold, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    fold_df = pd.DataFrame([row for row, _ in outputs])
+    frames = [results for _, results in outputs if not results.empty]
+    return fold_df, pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward optimization of the squeeze parameters")
+    parser.add_argument("--file", type=str, default="data/BTCUSDT_1h.csv", help="Path to CSV data file")
+    parser.add_argument("--symbol", type=str, default="BTCUSDT", help="Symbol to fetch if file missing")
+    parser.add_argument("--interval", type=str, default="1h", help="Timeframe interval")
+    parser.add_argument("--bb_window", type=int, nargs="+", default=[14, 20, 30])
+    parser.add_argument("--bb_std", type=float, nargs="+", default=[1.5, 2.0])
+    parser.add_argument("--atr_window", type=int, nargs="+", default=[14])
+    parser.add_argument("--bw_quantile", type=float, nargs="+", default=[0.05, 0.10, 0.20])
+    parser.add_argument("--atr_quantile", type=float, nargs="+", default=[0.10, 0.20])
+    parser.add_argument("--train_bars", type=int, default=4320, help="Bars per train fold (default: 180 days of 1h)")
+    parser.add_argument("--test_bars", type=int, default=720, help="Bars per test fold (default: 30 days of 1h)")
+    parser.add_argument("--step", type=int, default=None, help="Bars between folds (default: test_bars)")
+    parser.add_argument("--anchored", action="store_true", help="Train folds always start at the first bar")
+    parser.add_argument("--threshold_mode", type=str, choices=["global", "rolling", "expanding"], default="global",
+                        help="global = quantiles fitted on the train fold and reused on the test fold")
+    parser.add_argument("--threshold_window", type=int, default=720)
+    parser.add_argument("--objective", type=str, choices=["edge", "sim_return"], default="edge",
+                        help="Train score: signed mean breakout return, or simulated trade return")
+    parser.add_argument("--hold_period", type=int, default=24, help="Hold period scored by the objective")
+    parser.add_argument("--min_events", type=int, default=5, help="Directional breakouts a train fold needs to be scored")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    df = load_data(args.file, symbol=args.symbol, interval=args.interval)
+    if df.empty:
+        print("No data loaded. Exiting.")
+        return
+
+    grid = build_grid(args.bb_window, args.bb_std, args.atr_window, args.bw_quantile, args.atr_quantile)
+    print(f"Walk-forward over {len(df)} bars: {len(grid)} combinations per train fold")
+    folds, results = run_walk_forward(df, grid, args.train_bars, args.test_bars, args.step, args.anchored,
+                                      threshold_mode=args.threshold_mode, threshold_window=args.threshold_window,
+                                      objective=args.objective, hold_period=args.hold_period,
+                                      min_events=args.min_events, workers=args.workers)
+    if folds.empty:
+        print("Not enough bars for one train + test fold.")
+        return
+
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+    print("\n--- Folds (best train parameters -> test) ---")
+    print(folds.to_string(index=False))
+    print(f"\nMean train score {folds['train_score'].mean():.4f} vs mean test score {folds['test_score'].mean():.4f}")
+    folds.to_csv("walk_forward_folds.csv", index=False)
+
+    if results.empty:
+        print("No out-of-sample breakouts.")
+        return
+    print("\n--- Out-of-Sample Results Summary ---")
+    print(summarize_results(results))
+    results.to_csv("walk_forward_results.csv", index=False)
+    print("\nFolds saved to walk_forward_folds.csv, out-of-sample results to walk_forward_results.csv")
+
+if __name__ == "__main__":
+    main()